@@ -1,31 +1,34 @@
-import re, io, json, zipfile, logging
+import re, json, time, random, zipfile, logging, argparse
 from pathlib import Path
-from typing import Dict, Any, Iterable, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from tqdm import tqdm
-from huggingface_hub import hf_hub_download
 import pandas as pd
 import orjson
+from instrument import RunReport
+from sources import Source, get_source
+from paths import PROC
+from regex_profile import profiled
+from sketches import StratifiedReservoir
 
 # --- resolve project dirs relative to this file ---
 BASE_DIR = Path(__file__).resolve().parents[1]           # cc-banking-intents/
-DATA_DIR = BASE_DIR / "data"
-PROCESSED_DIR = DATA_DIR / "processed"
+PROCESSED_DIR = PROC                                     # data/processed (or the CCBI_PROFILE dir)
 LOG_DIR = BASE_DIR / "logs"
 
-# ensure directories exist
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-
 # --- logging ---
 LOG_FILE = LOG_DIR / "zip_load.log"
-logging.basicConfig(
-    filename=str(LOG_FILE),
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s"
-)
+
+def setup_dirs_and_logging():
+    # ensure directories exist
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        filename=str(LOG_FILE),
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
 
 # --- config ---
-REPO_ID = "AIxBlock/92k-real-world-call-center-scripts-english"
 ZIP_FILES = [
     "customer_service_general_inbound.zip",
     # Uncomment more if needed:
@@ -34,12 +37,12 @@ ZIP_FILES = [
     # "auto_insurance_customer_service_inbound.zip",
 ]
 
-BANKING_PAT = re.compile(
+BANKING_PAT = profiled("BANKING_PAT", re.compile(
     r"\b(bank|banking|account|balance|statement|transfer|wire|zelle|ach|"
     r"routing|checking|savings|deposit|overdraft|card|credit|debit|chargeback|"
     r"fraud|dispute|pin|atm|mortgage|loan|password|passcode|online banking)\b",
     flags=re.I
-)
+))
 
 def read_json_safe(raw: bytes) -> Optional[Dict[str, Any]]:
     try:
@@ -77,11 +80,20 @@ def extract_plain_text(example: Dict[str, Any]) -> str:
             strings.append(v)
     return "\n".join(strings)
 
-def iter_zip_json_records(zip_path: Path):
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        for name in zf.namelist():
-            if not name.endswith(".json"):
-                continue
+def interleaved_members(src: Source, znames: List[str], seed: int) -> List[Tuple[str, str]]:
+    """Every JSON member of every ZIP, in one shuffled order (ZIPs interleaved, no archive-order bias)."""
+    members = []
+    for zn in znames:
+        with zipfile.ZipFile(src.open(zn), "r") as zf:
+            members.extend((zn, n) for n in zf.namelist() if n.endswith(".json"))
+    random.Random(seed).shuffle(members)
+    return members
+
+def iter_member_records(src: Source, members: List[Tuple[str, str]]):
+    handles = {}
+    try:
+        for zn, name in members:
+            zf = handles.get(zn) or handles.setdefault(zn, zipfile.ZipFile(src.open(zn), "r"))
             try:
                 with zf.open(name) as f:
                     raw = f.read()
@@ -89,58 +101,106 @@ def iter_zip_json_records(zip_path: Path):
                 if not obj:
                     logging.warning(f"SKIP malformed JSON: {name}")
                     continue
-                yield obj
+                yield zn, obj
             except Exception as e:
                 logging.warning(f"SKIP error reading {name}: {e}")
                 continue
+    finally:
+        for zf in handles.values():
+            zf.close()
 
-def main():
-    rows = []
-    total_skipped = 0
-
-    for zname in ZIP_FILES:
-        print(f"Downloading {zname} ...")
-        local = hf_hub_download(REPO_ID, filename=zname, repo_type="dataset")
-        zpath = Path(local)
-        print(f"Scanning {zpath.name} ...")
-
-        for rec in tqdm(iter_zip_json_records(zpath), desc=f"scan {zpath.name}"):
-            domain = rec.get("domain") or rec.get("industry") or rec.get("category")
-            topic  = rec.get("topic") or rec.get("subtopic")
+def is_banking(text: str, domain, topic) -> bool:
+    return bool(
+        BANKING_PAT.search(text)
+        or (domain and re.search(r"bank|finance|credit", str(domain), re.I))
+        or (topic and re.search(r"bank|finance|credit", str(topic), re.I))
+    )
 
+def main():
+    ap = argparse.ArgumentParser(description="Representative banking dev sample across all configured ZIPs.")
+    ap.add_argument("--size", type=int, default=1000, help="rows in the dev sample")
+    ap.add_argument("--time-budget", type=float, default=None,
+                    help="stop scanning after this many seconds (the shuffled order keeps the sample representative)")
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    setup_dirs_and_logging()
+    with RunReport("02_safe_zip_loader") as run:
+        sample(run, args.size, args.time_budget, args.seed)
+
+def sample(run: RunReport, size: int = 1000, time_budget: Optional[float] = None, seed: int = 42):
+    """
+    One pass over the JSON members of all ZIPs in a shuffled, interleaved order, keeping a
+    reservoir per (source_zip, domain) stratum. With a time budget the scan stops early; since
+    the order is random, the rows seen so far are still a uniform draw from every ZIP.
+    """
+    src = get_source(ZIP_FILES)
+    znames = src.files()
+    for zname in znames:
+        print(f"Fetching {zname} ({src.backend}) ...")
+        with run.step("load"):
+            run.read(src.fetch(zname))
+
+    members = interleaved_members(src, znames, seed)
+    res = StratifiedReservoir(size, seed=seed)
+    total_skipped, scanned, matched = 0, 0, 0
+    t0 = time.perf_counter()
+    budget_hit = False
+
+    for source_zip, rec in tqdm(run.iter("parse", iter_member_records(src, members)), total=len(members), desc="scan"):
+        scanned += 1
+        domain = rec.get("domain") or rec.get("industry") or rec.get("category")
+        topic  = rec.get("topic") or rec.get("subtopic")
+
+        with run.step("extract") as st:
             text = extract_plain_text(rec)
-            if not text:
-                total_skipped += 1
-                continue
-
-            if (
-                BANKING_PAT.search(text)
-                or (domain and re.search(r"bank|finance|credit", str(domain), re.I))
-                or (topic and re.search(r"bank|finance|credit", str(topic), re.I))
-            ):
-                rows.append({
-                    "source_zip": zpath.name,
+            st.add(rows_in=1, rows_out=1 if text else 0)
+        if not text:
+            total_skipped += 1
+            continue
+
+        with run.step("filter") as st:
+            st.add(rows_in=1)
+            if is_banking(text, domain, topic):
+                st.add(rows_out=1)
+                matched += 1
+                res.add((source_zip, str(domain)), {
+                    "source_zip": source_zip,
                     "domain": domain,
                     "topic": topic,
                     "text": text[:50000]
                 })
 
-            if len(rows) >= 1000:
-                break
-
-        if len(rows) >= 1000:
+        if time_budget is not None and time.perf_counter() - t0 > time_budget:
+            budget_hit = True
             break
 
+    elapsed = time.perf_counter() - t0
+    rows = [r for _, r in res.sample()]
+    run.note(members=len(members), scanned=scanned, matched=matched, skipped=total_skipped,
+             strata=len(res.strata), budget_hit=budget_hit, scan_s=round(elapsed, 2),
+             source=src.summary())
+    src.print_summary()
+    print(f"Scanned {scanned:,} / {len(members):,} members in {elapsed:.1f}s"
+          + (" (time budget reached)" if budget_hit else "") + f" | banking matches: {matched:,}")
+
     if not rows:
-        print("No matches yet — uncomment more ZIPS in ZIP_FILES or widen keywords.")
-    else:
-        out_path = PROCESSED_DIR / "banking_dev_sample.parquet"
+        print("No matches yet — add more ZIPs to ZIP_FILES or widen keywords.")
+        return
+    out_path = PROCESSED_DIR / "banking_dev_sample.parquet"
+    with run.step("write") as st:
         pd.DataFrame(rows).to_parquet(out_path, index=False)
-        print(f"Saved {len(rows)} rows -> {out_path}")
-        print("\nTop domains:")
-        print(pd.Series([r.get("domain") for r in rows]).value_counts(dropna=False).head(10))
-        print("\nTop topics:")
-        print(pd.Series([r.get("topic") for r in rows]).value_counts(dropna=False).head(10))
+        run.wrote(out_path)
+        st.rows_out = len(rows)
+    print(f"Saved {len(rows)} rows -> {out_path}")
+    print("\nRows per stratum (source_zip, domain): sampled / matched")
+    alloc = res.allocation()
+    for k in sorted(res.strata, key=lambda k: -res.strata[k].n)[:15]:
+        print(f"  {' / '.join(k)[:60]:60s} {alloc[k]:6d} / {res.strata[k].n:,}")
+    print("\nTop domains:")
+    print(pd.Series([r.get("domain") for r in rows]).value_counts(dropna=False).head(10))
+    print("\nTop topics:")
+    print(pd.Series([r.get("topic") for r in rows]).value_counts(dropna=False).head(10))
 
 if __name__ == "__main__":
     main()
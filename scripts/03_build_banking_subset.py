@@ -1,47 +1,49 @@
-import re, io, json, zipfile, logging, hashlib, textwrap
+import re, io, os, json, time, zipfile, logging, hashlib, textwrap
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Iterable, Optional, List, Tuple
 import yaml
 from tqdm import tqdm
-from huggingface_hub import hf_hub_download
 import pandas as pd
 import orjson
+from instrument import RunReport
+from sources import Source, get_source
+from overlap import Chain
+from paths import PROC, PROFILE, DEV_SOURCE, FULL_PROC, SHARD
+from tables import arrow_strings, write_parquet, read_parquet, call_filter
+from regex_profile import profiled
+from features import BANKING_PAT, FEATURES, FeatureColumns, call_features, may_match_banking
+from calls import TURNS, TurnColumns, resolve_turns, join_turns
+from dedupe_index import DedupeIndex, INDEX_DIR
+from shards import SHARD_POS, SHARD_STATS, member_shard, scan_pos
 
 # --- resolve project dirs ---
 BASE_DIR = Path(__file__).resolve().parents[1]           # cc-banking-intents/
-DATA_DIR = BASE_DIR / "data"
-PROCESSED_DIR = DATA_DIR / "processed"
+PROCESSED_DIR = PROC                                     # data/processed (or the CCBI_PROFILE dir)
 LOG_DIR = BASE_DIR / "logs"
 CONFIG_DIR = BASE_DIR / "configs"
-PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 # --- logging ---
 LOG_FILE = LOG_DIR / "build_banking_subset.log"
-logging.basicConfig(
-    filename=str(LOG_FILE),
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s"
-)
 
-# --- config ---
-REPO_ID = "AIxBlock/92k-real-world-call-center-scripts-english"
+def setup_dirs_and_logging():
+    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        filename=str(LOG_FILE),
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s"
+    )
 
-# Start with a reasonable spread; you can add more as needed.
+# --- config ---
+# Start with a reasonable spread; you can add more as needed (a mirror serves what its manifest lists).
 ZIP_FILES = [
     "customer_service_general_inbound.zip",
     "home_service_inbound.zip",
     "home_ervice_inbound&telecom _outbound.zip",   # (sic) filename includes a space & ampersand
 ]
 
-# conservative banking keyword list (for any text, esp. customer turns)
-BANKING_PAT = re.compile(
-    r"\b(bank|banking|account|balance|statement|transfer|wire|zelle|ach|"
-    r"routing|checking|savings|deposit|overdraft|card|credit|debit|chargeback|"
-    r"fraud|dispute|pin|atm|mortgage|loan|password|passcode|online banking|"
-    r"payment|autopay|direct deposit|interest|fee|late fee|billing)\b",
-    flags=re.I
-)
+# BANKING_PAT (conservative banking keyword list) lives in features.py with the other keep rules
 
 # --- helper: robust JSON parsing ---
 def read_json_safe(raw: bytes) -> Optional[Dict[str, Any]]:
@@ -53,7 +55,8 @@ def read_json_safe(raw: bytes) -> Optional[Dict[str, Any]]:
         except Exception:
             return None
 
-# --- load speaker aliases ---
+# --- load speaker aliases (read once, on first use) ---
+@lru_cache(maxsize=None)
 def load_aliases() -> Tuple[List[str], List[str]]:
     path = CONFIG_DIR / "speaker_aliases.yaml"
     with open(path, "r") as f:
@@ -62,25 +65,24 @@ def load_aliases() -> Tuple[List[str], List[str]]:
     agent = [s.lower() for s in y.get("agent", [])]
     return cust, agent
 
-CUSTOMER_ALIASES, AGENT_ALIASES = load_aliases()
-
 def label_is_customer(val: Optional[str]) -> Optional[bool]:
     if not val:
         return None
     v = str(val).strip().lower()
+    cust_aliases, agent_aliases = load_aliases()
     # raw exact match
-    if v in CUSTOMER_ALIASES: return True
-    if v in AGENT_ALIASES: return False
+    if v in cust_aliases: return True
+    if v in agent_aliases: return False
     # fuzzy contains
-    if any(a in v for a in CUSTOMER_ALIASES): return True
-    if any(a in v for a in AGENT_ALIASES): return False
+    if any(a in v for a in cust_aliases): return True
+    if any(a in v for a in agent_aliases): return False
     # common roles
     if v in {"customer", "user", "caller", "client", "member"}: return True
     if v in {"agent", "rep", "csr", "advisor", "associate", "operator"}: return False
     return None
 
 # --- normalize whitespace ---
-WS_PAT = re.compile(r"[ \t\u00A0]+")
+WS_PAT = profiled("WS_PAT", re.compile(r"[ \t\u00A0]+"))
 def clean_text(s: str) -> str:
     s = s.replace("\r", "\n")
     s = re.sub(r"\n{3,}", "\n\n", s)           # collapse excessive newlines
@@ -136,90 +138,309 @@ def extract_turns(example: Dict[str, Any]) -> Tuple[List[Dict[str, str]], str, s
     agent_text = clean_text("\n".join(agent_lines))
     return turns, customer_text, agent_text
 
-def iter_zip_json_records(zip_path: Path) -> Iterable[Tuple[str, Dict[str, Any]]]:
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        for name in zf.namelist():
-            if not name.endswith(".json"):
-                continue
-            try:
-                with zf.open(name) as f:
-                    raw = f.read()
-                obj = read_json_safe(raw)
-                if not obj:
-                    logging.warning(f"SKIP malformed JSON: {name}")
+# --- ingest: fetch -> inflate -> parse, overlapped in threads (overlap.py) ---
+OVERLAP = os.environ.get("CCBI_OVERLAP", "1") != "0"
+PREFETCH_ZIPS = int(os.environ.get("CCBI_PREFETCH_ZIPS", "1"))      # fetched ZIPs queued ahead of the inflater
+MEMBER_QUEUE = int(os.environ.get("CCBI_MEMBER_QUEUE", "512"))      # inflated JSON members queued for the parser
+MEMBER_BATCH = 64                                                   # members per hand-off (queue ops are per batch)
+# raw-bytes prefilter: members with no possible BANKING_PAT match skip the JSON parse and extract_turns;
+# every AUDIT-th rejected member is parsed anyway, to time the work saved and re-check the rejection
+PREFILTER = os.environ.get("CCBI_PREFILTER", "1") != "0"
+PREFILTER_AUDIT = int(os.environ.get("CCBI_PREFILTER_AUDIT", "64"))
+PREFILTER_CHECK = 4096          # members between checks that the prefilter still pays for itself
+# persistent dedupe index (dedupe_index.py): calls already kept from other ZIPs by earlier runs are dropped
+DEDUPE_INDEX = os.environ.get("CCBI_DEDUPE_INDEX", "1") != "0"
+
+def fetch_zips(src: Source) -> Iterable[str]:
+    """Download / verify each ZIP; yields its name once the file is local."""
+    for zname in src.files():
+        logging.info(f"fetch {zname} ({src.backend})")
+        src.fetch(zname)
+        yield zname
+
+def inflate_members(src: Source, znames: Iterable[str]) -> Iterable[List[Tuple[str, str, bytes, int]]]:
+    """
+    Batches of (zip, member, raw JSON bytes, scan position) for every .json member, in archive
+    order. A sharded run (CCBI_SHARD=i/N) only inflates the members of its shard.
+    """
+    zindex = {z: k for k, z in enumerate(src.files())}
+    batch = []
+    for zname in znames:
+        with zipfile.ZipFile(src.open(zname), "r") as zf:
+            for m, name in enumerate(zf.namelist()):
+                if not name.endswith(".json"):
+                    continue
+                if SHARD and member_shard(zname, name, SHARD[1]) != SHARD[0]:
                     continue
-                yield name, obj
-            except Exception as e:
-                logging.warning(f"SKIP error reading {name}: {e}")
+                try:
+                    batch.append((zname, name, zf.read(name), scan_pos(zindex[zname], m)))
+                except Exception as e:
+                    logging.warning(f"SKIP error reading {name}: {e}")
+                if len(batch) >= MEMBER_BATCH:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+class Prefilter:
+    def __init__(self, enabled: bool = PREFILTER, audit_every: int = PREFILTER_AUDIT):
+        self.enabled = enabled
+        self.audit_every = audit_every
+        self.scanned = 0
+        self.rejected = 0
+        self.scan_s = 0.0
+        self.audited = 0
+        self.audit_s = 0.0            # full parse + extract + filter time of the audited rejects
+        self.false_negatives = 0
+        self.switched_off_at = None   # members scanned when it stopped paying off (corpus rarely rejected)
+
+    def rejects(self, raw: bytes) -> bool:
+        if not self.enabled:
+            return False
+        t0 = time.perf_counter()
+        keep = may_match_banking(raw)
+        self.scan_s += time.perf_counter() - t0
+        self.scanned += 1
+        if self.scanned % PREFILTER_CHECK == 0 and self.audit_every and self.est_saved() < 0:
+            self.enabled = False
+            self.switched_off_at = self.scanned
+            logging.info(f"prefilter off after {self.scanned:,} members: it cost more than it saved")
+        if keep:
+            return False
+        self.rejected += 1
+        if self.audit_every and (self.rejected - 1) % self.audit_every == 0:
+            self.audit(raw)
+        return True
+
+    def audit(self, raw: bytes):
+        t0 = time.perf_counter()
+        rec = read_json_safe(raw)
+        kept = False
+        if rec:
+            turns, customer_text, _ = extract_turns(rec)
+            full_text = clean_text("\n".join(t["text"] for t in turns))
+            kept = bool(full_text) and bool(BANKING_PAT.search(customer_text or full_text))
+        self.audit_s += time.perf_counter() - t0
+        self.audited += 1
+        if kept:
+            self.false_negatives += 1
+            logging.error("prefilter rejected a member the full filter keeps")
+
+    def est_saved(self) -> float:
+        """Rejected members x the audited cost of processing one, minus the scanning time."""
+        per_reject = self.audit_s / self.audited if self.audited else 0.0
+        return self.rejected * per_reject - self.scan_s
+
+    def summary(self) -> dict:
+        return {"enabled": self.enabled or self.switched_off_at is not None, "scanned": self.scanned,
+                "rejected": self.rejected, "scan_s": round(self.scan_s, 3), "audited": self.audited,
+                "false_negatives": self.false_negatives, "est_saved_s": round(self.est_saved(), 3),
+                "switched_off_at": self.switched_off_at}
+
+def parse_members(batches: Iterable[List[Tuple[str, str, bytes, int]]],
+                  prefilter: Prefilter) -> Iterable[Tuple[str, str, Optional[Dict[str, Any]], int]]:
+    """(zip, member, record, scan position); record is None for members the prefilter rejected."""
+    for batch in batches:
+        for zname, name, raw, pos in batch:
+            if prefilter.rejects(raw):
+                yield zname, name, None, pos
+                continue
+            obj = read_json_safe(raw)
+            if not obj:
+                logging.warning(f"SKIP malformed JSON: {name}")
                 continue
+            yield zname, name, obj, pos
 
 def main():
-    rows = []
-    seen_hashes = set()
-    total_checked, total_kept = 0, 0
+    setup_dirs_and_logging()
+    with RunReport("03_build_banking_subset") as run:
+        if PROFILE == "full":
+            build(run)
+        else:
+            seed_profile(run)
 
-    for zname in ZIP_FILES:
-        print(f"Downloading {zname} ...")
-        local = hf_hub_download(REPO_ID, filename=zname, repo_type="dataset")
-        zpath = Path(local)
-        print(f"Scanning {zpath.name} ...")
+def seed_profile(run: RunReport):
+    """
+    Non-full profiles (CCBI_PROFILE=dev) are not rebuilt from the ZIPs: the full build's 1k
+    sample becomes the profile's call table, with the matching rows of the full feature table.
+    """
+    if not DEV_SOURCE.exists():
+        raise SystemExit(f"{DEV_SOURCE} not found; run the full build (03) once before using the {PROFILE} profile.")
+    with run.step("load") as st:
+        df = read_parquet(run.read(DEV_SOURCE))
+        st.rows_out = len(df)
+
+    with run.step("write") as st:
+        out_full = PROCESSED_DIR / "banking_calls.parquet"
+        out_sample = PROCESSED_DIR / "banking_calls_sample_1k.parquet"
+        write_parquet(df, out_full)
+        write_parquet(df, out_sample, row_group_size=None)
+        run.wrote(out_full)
+        run.wrote(out_sample)
+        full_features = FULL_PROC / FEATURES.name
+        if full_features.exists():
+            import pyarrow.dataset as ds
+            feats = ds.dataset(run.read(full_features), format="parquet").to_table(
+                filter=call_filter(hashes=df["hash"].tolist()))
+            write_parquet(arrow_strings(feats.to_pandas()), FEATURES)
+            run.wrote(FEATURES)
+        else:
+            # 04/05 fall back to scanning the transcripts
+            FEATURES.unlink(missing_ok=True)
+        st.rows_out = len(df)
 
-        for fname, rec in tqdm(iter_zip_json_records(zpath), desc=f"scan {zpath.name}"):
-            total_checked += 1
+    run.note(profile=PROFILE, seeded_from=str(DEV_SOURCE))
+    print(f"[{PROFILE}] seeded {len(df):,} calls from {DEV_SOURCE} -> {out_full}")
 
-            # optional metadata
-            domain = rec.get("domain") or rec.get("industry") or rec.get("category")
-            topic  = rec.get("topic") or rec.get("subtopic")
+def write_outputs(df: pd.DataFrame, feats: pd.DataFrame, run: RunReport, out_dir: Path = PROCESSED_DIR,
+                  features: Path = FEATURES) -> Tuple[Path, Path]:
+    """Call table, its 1k dev sample and the feature table (also used by shards.py reduce)."""
+    # Save full subset
+    out_full = out_dir / "banking_calls.parquet"
+    write_parquet(df, out_full)
 
-            turns, customer_text, agent_text = extract_turns(rec)
-            full_text = clean_text("\n".join(t["text"] for t in turns))
+    # Make a quick 1k dev sample (or all if fewer)
+    sample_n = min(1000, len(df))
+    out_sample = out_dir / "banking_calls_sample_1k.parquet"
+    write_parquet(df.sample(sample_n, random_state=42), out_sample, row_group_size=None)
+    write_parquet(feats, features)
+    run.wrote(out_full)
+    run.wrote(out_sample)
+    run.wrote(features)
+    return out_full, out_sample
+
+def build_call(run: RunReport, index: DedupeIndex, source_zip: str, fname: str,
+               rec: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Optional[str]]], dict]]:
+    """
+    One parsed call record -> (row, resolved turns, feature row), or None when it is dropped
+    (empty, not banking, or a duplicate under `index`). Also used by stream_ingest.py.
+    """
+    # optional metadata
+    domain = rec.get("domain") or rec.get("industry") or rec.get("category")
+    topic  = rec.get("topic") or rec.get("subtopic")
 
-            if not full_text:
-                continue
+    with run.step("extract") as st:
+        turns, customer_text, agent_text = extract_turns(rec)
+        full_text = clean_text("\n".join(t["text"] for t in turns))
+        st.add(rows_in=1, rows_out=1 if full_text else 0)
+
+    if not full_text:
+        return None
 
-            # Filtering: prefer customer text for banking detection; fallback to full text
-            hay = customer_text if customer_text else full_text
-            if not BANKING_PAT.search(hay):
+    # Filtering: prefer customer text for banking detection; fallback to full text
+    with run.step("filter") as st:
+        st.add(rows_in=1)
+        hay = customer_text if customer_text else full_text
+        if not BANKING_PAT.search(hay):
+            return None
+        st.add(rows_out=1)
+
+    # Basic dedupe by hash of customer text (or full text if empty): this run's calls + the index
+    with run.step("dedupe") as st:
+        st.add(rows_in=1)
+        basis = customer_text if customer_text else full_text
+        digest = hashlib.sha256(basis.encode("utf-8", errors="ignore")).digest()
+        if index.seen(digest, source_zip):
+            return None
+        h = digest.hex()
+        st.add(rows_out=1)
+
+    # roles resolved once (speaker labels, else line prefixes); stored as the nested `turns` column
+    with run.step("roles"):
+        roles = [label_is_customer(t.get("speaker")) for t in turns]
+        resolved = resolve_turns(turns, roles)
+
+    # per-call features (lengths, turn roles, keyword hits) for 04/05
+    with run.step("features"):
+        feat = call_features(h, roles, customer_text, agent_text, full_text, join_turns(resolved, "customer"))
+
+    row = {
+        "source_zip": source_zip,
+        "file_name": fname,
+        "domain": domain,
+        "topic": topic,
+        "n_turns": len(turns),
+        "n_customer_turns": sum(1 for r in roles if r is True),
+        "full_chars": len(full_text),     # for CCBI_MIN_CHARS / CCBI_MAX_CHARS pushdown
+        "hash": h
+    }
+    return row, resolved, feat
+
+def build(run: RunReport):
+    rows, feats, turn_cols = [], FeatureColumns(), TurnColumns()
+    total_checked, total_kept = 0, 0
+    src = get_source(ZIP_FILES)
+    prefilter = Prefilter()
+    # the ZIPs this run reads are rebuilt, so only the other ZIPs' segments are checked
+    index = DedupeIndex(INDEX_DIR if DEDUPE_INDEX else None, exclude=src.files())
+    shard = f" (shard {SHARD[0]}/{SHARD[1]})" if SHARD else ""
+    print(f"Scanning {len(src.files())} ZIP(s) from {src.backend}{shard} ...")
+
+    with Chain(enabled=OVERLAP) as chain:
+        zips = chain.stage("fetch", fetch_zips(src), maxsize=PREFETCH_ZIPS)
+        members = chain.stage("inflate", inflate_members(src, zips), maxsize=max(1, MEMBER_QUEUE // MEMBER_BATCH))
+        records = parse_members(chain.consume("parse", members), prefilter)
+        for source_zip, fname, rec, pos in tqdm(run.iter("parse", records), desc="scan"):
+            total_checked += 1
+            if rec is None:
                 continue
 
-            # Basic dedupe by hash of customer text (or full text if empty)
-            basis = customer_text if customer_text else full_text
-            h = hashlib.sha256(basis.encode("utf-8", errors="ignore")).hexdigest()
-            if h in seen_hashes:
+            call = build_call(run, index, source_zip, fname, rec)
+            if call is None:
                 continue
-            seen_hashes.add(h)
-
-            rows.append({
-                "source_zip": zpath.name,
-                "file_name": fname,
-                "domain": domain,
-                "topic": topic,
-                "n_turns": len(turns),
-                "n_customer_turns": sum(1 for t in turns if label_is_customer(t.get("speaker")) is True),
-                "customer_text": customer_text,
-                "agent_text": agent_text,
-                "full_text": full_text,
-                "hash": h
-            })
+            row, resolved, feat = call
+            if SHARD:
+                row[SHARD_POS] = pos              # single-node scan order, for shards.py reduce
+            rows.append(row)
+            turn_cols.append(resolved)
+            feats.append(feat)
             total_kept += 1
 
+    for zname in src.files():
+        run.read(src.fetch(zname))
+    overlap = chain.report()
+    for name, d in overlap.items():
+        msg = (f"[{name}] wall {d['wall_s']:.2f}s | busy {d['busy_s']:.2f}s | "
+               f"idle: waiting for input {d['starved_s']:.2f}s, blocked on full queue {d['blocked_s']:.2f}s")
+        logging.info(msg)
+        print(msg)
+
+    pf = prefilter.summary()
+    if pf["enabled"]:
+        msg = (f"[prefilter] rejected {pf['rejected']:,} / {pf['scanned']:,} members before parsing "
+               f"(scan {pf['scan_s']:.2f}s, est. saved {pf['est_saved_s']:.2f}s; "
+               f"audit {pf['audited']:,} rejects, {pf['false_negatives']} false negatives)"
+               + (f"; switched off after {pf['switched_off_at']:,} members" if pf["switched_off_at"] else ""))
+        logging.info(msg)
+        print(msg)
+    dd = index.summary()
+    msg = (f"[dedupe] {dd['dup_in_run']:,} duplicates within this run, {dd['dup_in_index']:,} already in the "
+           f"index ({dd['index_keys']:,} keys from {dd['segments']} other ZIP(s))")
+    logging.info(msg)
+    print(msg)
+    run.note(checked=total_checked, kept=total_kept, source=src.summary(), overlap=overlap, prefilter=pf, dedupe=dd)
+    src.print_summary()
+    if SHARD:
+        with open(PROCESSED_DIR / SHARD_STATS, "w") as f:
+            json.dump({"shard": list(SHARD), "zips": src.files(), "checked": total_checked, "kept": total_kept,
+                       "prefilter": pf, "dedupe": dd}, f, indent=2)
     if not rows:
         print("No banking rows found. Consider adding more ZIPs or broadening keywords.")
         return
 
-    df = pd.DataFrame(rows)
-
-    # Save full subset
-    out_full = PROCESSED_DIR / "banking_calls.parquet"
-    df.to_parquet(out_full, index=False)
-
-    # Make a quick 1k dev sample (or all if fewer)
-    sample_n = min(1000, len(df))
-    df.sample(sample_n, random_state=42).to_parquet(PROCESSED_DIR / "banking_calls_sample_1k.parquet", index=False)
+    with run.step("write") as st:
+        df = arrow_strings(pd.DataFrame(rows))
+        df.insert(df.columns.get_loc("hash"), TURNS, pd.arrays.ArrowExtensionArray(turn_cols.to_arrow()))
+        out_full, out_sample = write_outputs(df, arrow_strings(feats.to_frame()), run)
+        if not SHARD:                     # a sharded run's segments are written by the reduce step
+            for path in index.commit(src.files()):
+                run.wrote(path)
+        st.rows_out = len(df)
 
     print(f"Checked: {total_checked:,} | Kept: {total_kept:,}")
     print(f"Saved full subset -> {out_full} ({len(df)} rows)")
-    print("Saved fast dev slice ->", PROCESSED_DIR / "banking_calls_sample_1k.parquet")
+    print("Saved fast dev slice ->", out_sample)
+    print("Saved call features ->", FEATURES)
 
     # Quick peek
     print("\nTop source_zip:")
@@ -227,7 +448,7 @@ def main():
     print("\nExample row (truncated):")
     ex = df.iloc[0]
     print("domain:", ex["domain"], "topic:", ex["topic"], "n_turns:", ex["n_turns"])
-    print(textwrap.shorten(ex["customer_text"] or ex["full_text"], width=300, placeholder=" ..."))
+    print(textwrap.shorten(join_turns(ex[TURNS], "customer") or join_turns(ex[TURNS]), width=300, placeholder=" ..."))
 
 if __name__ == "__main__":
     main()
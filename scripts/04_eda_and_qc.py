@@ -1,24 +1,21 @@
 import pandas as pd
-import re, textwrap
+import re, json, argparse, textwrap
 from pathlib import Path
 from collections import Counter
-from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS
+from instrument import RunReport
+from paths import PROC, STREAM_DIR
+from tables import load_calls, iter_calls, projected_bytes, as_text, text_or_fallback, dataset_files
+from features import read_features
+from sketches import HeavyHitters, KLL, Reservoir
 
-BASE = Path(__file__).resolve().parents[1]
-P = BASE / "data" / "processed" / "banking_calls.parquet"
-
-df = pd.read_parquet(P)
-print("Rows:", len(df))
-print(df[["n_turns","n_customer_turns"]].describe())
-
-# How many have explicit customer_text?
-has_cust = (df["customer_text"].str.len().fillna(0) > 0)
-print("Has customer_text:", has_cust.mean())
-
-# Length stats (chars)
-for col in ["customer_text","full_text"]:
-    L = df[col].fillna("").str.len()
-    print(f"{col} mean={L.mean():.1f}, median={L.median():.0f}, p90={L.quantile(0.9):.0f}")
+P = PROC / "banking_calls.parquet"     # read together with the streamed calls (stream_ingest.py)
+OUT = PROC / "banking_spotcheck_200.csv"
+SKETCH_DIR = PROC / "eda_sketches"     # per-shard sketches (--shard / --merge)
+COLUMNS = ["hash", "n_turns", "n_customer_turns", "customer_text", "full_text"]
+# length / turn / placeholder stats come from 03's feature table (features.py) when present
+STAT_COLUMNS = ["hash", "n_turns", "n_customer_turns", "n_agent_turns", "n_unknown_turns",
+                "cust_chars", "full_chars", "cust_tokens", "full_tokens", "prefix_format", "n_placeholders"]
 
 # Top unigrams/bigrams to sniff noise
 def top_terms(series, n=30, ngram=(1,2), min_df=5, stop_words="english"):
@@ -29,13 +26,195 @@ def top_terms(series, n=30, ngram=(1,2), min_df=5, stop_words="english"):
     tops = sorted(zip(vocab, counts), key=lambda x: x[1], reverse=True)[:n]
     return tops
 
-text = df["customer_text"].where(has_cust, df["full_text"])
-tops = top_terms(text, n=50)
-print("\nTop tokens/phrases:")
-for t,c in tops:
-    print(f"{t:30s} {int(c)}")
+def exact(run: RunReport):
+    with run.step("load") as st:
+        src = dataset_files(P, STREAM_DIR / "calls")
+        df = load_calls(run.read(src, projected_bytes(src, COLUMNS)), COLUMNS)
+        st.rows_out = len(df)
+    print("Rows:", len(df))
+
+    with run.step("stats") as st:
+        st.rows_in = len(df)
+        feats = read_features(columns=STAT_COLUMNS)
+        if feats is not None and df["hash"].isin(feats["hash"]).all():
+            feats = feats[feats["hash"].isin(df["hash"])]
+        else:
+            # no feature table (older 03 build): derive the basic columns from the text
+            feats = pd.DataFrame({"n_turns": df["n_turns"], "n_customer_turns": df["n_customer_turns"],
+                                  "cust_chars": as_text(df["customer_text"]).str.len(),
+                                  "full_chars": as_text(df["full_text"]).str.len()})
+        turn_cols = [c for c in ["n_turns", "n_customer_turns", "n_agent_turns", "n_unknown_turns"] if c in feats]
+        print(feats[turn_cols].describe())
+
+        # How many have explicit customer_text?
+        print("Has customer_text:", (feats["cust_chars"] > 0).mean())
+
+        # Length stats (chars)
+        for col, lcol in [("customer_text", "cust_chars"), ("full_text", "full_chars")]:
+            L = feats[lcol]
+            print(f"{col} mean={L.mean():.1f}, median={L.median():.0f}, p90={L.quantile(0.9):.0f}")
+        if "full_tokens" in feats:
+            print(f"full_text tokens mean={feats['full_tokens'].mean():.1f}, "
+                  f"prefix-format calls={feats['prefix_format'].mean():.3f}, "
+                  f"placeholders/call={feats['n_placeholders'].mean():.2f}")
+
+    with run.step("ngrams") as st:
+        text = text_or_fallback(df)
+        st.rows_in = len(text)
+        tops = top_terms(text, n=50)
+    print("\nTop tokens/phrases:")
+    for t,c in tops:
+        print(f"{t:30s} {int(c)}")
+
+    # Dump a small sample CSV for manual spot-check
+    with run.step("write") as st:
+        text.sample(200, random_state=42).to_csv(OUT, index=False, header=["text"])
+        run.wrote(OUT)
+        st.rows_out = 200
+    print("\nWrote spot-check sample ->", OUT)
+
+# -----------------------------
+# Streaming mode: one row-group batch at a time into mergeable sketches
+# -----------------------------
+TOKEN = re.compile(r"(?u)\b\w\w+\b")            # CountVectorizer's default token_pattern
+STREAM_COLUMNS = ["n_turns", "n_customer_turns", "customer_text", "full_text"]
+LENGTHS = ["customer_text", "full_text", "n_turns", "n_customer_turns"]
+
+def ngrams(text: str):
+    """Lowercased unigrams + bigrams after English stop-word removal (as top_terms counts them)."""
+    toks = [t for t in TOKEN.findall(text.lower()) if t not in ENGLISH_STOP_WORDS]
+    return toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+
+def new_sketch(capacity: int = 5000) -> dict:
+    return {"rows": 0, "has_customer_text": 0, "ngrams": HeavyHitters(capacity),
+            "lengths": {c: KLL(200) for c in LENGTHS}, "sample": Reservoir(200)}
+
+def sketch_batch(sk: dict, df: pd.DataFrame):
+    cust_len = as_text(df["customer_text"]).str.len()
+    sk["rows"] += len(df)
+    sk["has_customer_text"] += int((cust_len > 0).sum())
+    sk["lengths"]["customer_text"].update_many(cust_len.tolist())
+    sk["lengths"]["full_text"].update_many(as_text(df["full_text"]).str.len().tolist())
+    sk["lengths"]["n_turns"].update_many(df["n_turns"].tolist())
+    sk["lengths"]["n_customer_turns"].update_many(df["n_customer_turns"].tolist())
+    text = text_or_fallback(df)
+    counts = Counter()
+    for t in text:
+        counts.update(ngrams(t))
+    sk["ngrams"].update_counts(counts)
+    sk["sample"].update(text.tolist())
+
+def merge_sketch(a: dict, b: dict) -> dict:
+    a["rows"] += b["rows"]
+    a["has_customer_text"] += b["has_customer_text"]
+    a["ngrams"].merge(b["ngrams"])
+    for c in LENGTHS:
+        a["lengths"][c].merge(b["lengths"][c])
+    a["sample"].merge(b["sample"])
+    return a
+
+def sketch_to_dict(sk: dict) -> dict:
+    return {"rows": sk["rows"], "has_customer_text": sk["has_customer_text"],
+            "ngrams": sk["ngrams"].to_dict(), "sample": sk["sample"].to_dict(),
+            "lengths": {c: k.to_dict() for c, k in sk["lengths"].items()}}
+
+def sketch_from_dict(d: dict) -> dict:
+    return {"rows": d["rows"], "has_customer_text": d["has_customer_text"],
+            "ngrams": HeavyHitters.from_dict(d["ngrams"]), "sample": Reservoir.from_dict(d["sample"]),
+            "lengths": {c: KLL.from_dict(k) for c, k in d["lengths"].items()}}
+
+def sketch_calls(run: RunReport, shard=None) -> dict:
+    sk = new_sketch()
+    src = dataset_files(P, STREAM_DIR / "calls")
+    batches = iter_calls(run.read(src, projected_bytes(src, STREAM_COLUMNS)), STREAM_COLUMNS, shard=shard)
+    for df in run.iter("load", batches, rows=len):
+        with run.step("sketch") as st:
+            st.add(rows_in=len(df))
+            sketch_batch(sk, df)
+    return sk
+
+def report(sk: dict, run: RunReport):
+    print("Rows:", sk["rows"])
+    if not sk["rows"]:
+        return
+    print(f"{'column':18s} {'mean':>8s} {'min':>6s} {'p25':>6s} {'p50':>6s} {'p75':>6s} {'p90':>6s} {'max':>6s}")
+    for c in LENGTHS:
+        k = sk["lengths"][c]
+        qs = [k.quantile(q) for q in (0.25, 0.5, 0.75, 0.9)]
+        print(f"{c:18s} {k.mean():8.1f} {k.min:6.0f} " + " ".join(f"{q:6.0f}" for q in qs) + f" {k.max:6.0f}")
+    print("Has customer_text:", sk["has_customer_text"] / sk["rows"])
+
+    hh = sk["ngrams"]
+    print("\nTop tokens/phrases (approximate; count is an upper bound, min is guaranteed):")
+    for t, c, lo in hh.top(50):
+        print(f"{t:30s} {c:8d} {lo:8d}")
+
+    with run.step("write") as st:
+        pd.Series(sk["sample"].items, name="text").to_csv(OUT, index=False, header=["text"])
+        run.wrote(OUT)
+        st.rows_out = len(sk["sample"].items)
+    print("\nWrote spot-check sample ->", OUT)
+    run.note(mode="stream", rows=sk["rows"], ngram_items=len(hh.counts), ngram_weight=hh.n)
+
+def shard_path(i: int, n: int) -> Path:
+    return SKETCH_DIR / f"eda_{i:03d}of{n:03d}.json"
+
+def clear_other_shards(n: int):
+    """Drop sketches written for another shard count, so a later --merge cannot pick them up."""
+    for path in SKETCH_DIR.glob("eda_*of*.json"):
+        if not path.name.endswith(f"of{n:03d}.json"):
+            path.unlink(missing_ok=True)
+
+def merge_shards(run: RunReport, n: int) -> dict:
+    paths = sorted(SKETCH_DIR.glob(f"eda_*of{n:03d}.json"))
+    if not paths:
+        raise SystemExit(f"No shard sketches of {n} in {SKETCH_DIR}; run with --shard i/{n} first.")
+    missing = sorted(set(range(n)) - {int(p.stem[4:].split("of")[0]) for p in paths})
+    if missing:
+        print(f"WARNING: shards {missing} of {n} are missing; the report covers the others only.")
+    sk = None
+    with run.step("merge") as st:
+        for path in paths:
+            with open(run.read(path)) as f:
+                part = sketch_from_dict(json.load(f))
+            sk = part if sk is None else merge_sketch(sk, part)
+        st.rows_in = len(paths)
+    return sk
+
+def parse_shard(s: str):
+    i, n = (int(x) for x in s.split("/"))
+    if not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"shard must be i/N with 0 <= i < N, got {s}")
+    return i, n
+
+def main():
+    ap = argparse.ArgumentParser(description="EDA + QC over the banking call subset.")
+    ap.add_argument("--stream", action="store_true",
+                    help="bounded-memory report from mergeable sketches, one row group at a time")
+    ap.add_argument("--shard", type=parse_shard, metavar="I/N",
+                    help="sketch every N-th row group starting at I and write it to eda_sketches/ (implies --stream)")
+    ap.add_argument("--merge", type=int, metavar="N",
+                    help="merge the N shard sketches (--shard i/N) in eda_sketches/ and report")
+    args = ap.parse_args()
+
+    with RunReport("04_eda_and_qc") as run:
+        if args.merge:
+            report(merge_shards(run, args.merge), run)
+        elif args.shard:
+            sk = sketch_calls(run, shard=args.shard)
+            SKETCH_DIR.mkdir(parents=True, exist_ok=True)
+            clear_other_shards(args.shard[1])
+            out = shard_path(*args.shard)
+            with run.step("write"):
+                with open(out, "w") as f:
+                    json.dump(sketch_to_dict(sk), f)
+                run.wrote(out)
+            run.note(mode="shard", shard="/".join(map(str, args.shard)), rows=sk["rows"])
+            print(f"Shard {args.shard[0]}/{args.shard[1]}: {sk['rows']} rows -> {out}")
+        elif args.stream:
+            report(sketch_calls(run), run)
+        else:
+            exact(run)
 
-# Dump a small sample CSV for manual spot-check
-out = BASE / "data" / "processed" / "banking_spotcheck_200.csv"
-text.sample(200, random_state=42).to_csv(out, index=False, header=["text"])
-print("\nWrote spot-check sample ->", out)
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,91 @@
-import re, io, json, zipfile, logging, hashlib
 from pathlib import Path
-from typing import Dict, Any, Iterable, Optional, List, Tuple
 from tqdm import tqdm
-from huggingface_hub import hf_hub_download
 import pandas as pd
-import orjson
+from instrument import RunReport
+from paths import PROC, SHARD, STREAM_DIR
+from tables import iter_calls, count_calls, env_filter, projected_bytes, write_parquet, text_or_fallback, dataset_files
+from features import POS, NEG, read_features
+from calls import TURNS
+from shards import SHARD_POS
 
 BASE = Path(__file__).resolve().parents[1]
-DATA_DIR = BASE / "data"
-PROC = DATA_DIR / "processed"
 LOGS = BASE / "logs"
-PROC.mkdir(parents=True, exist_ok=True)
-LOGS.mkdir(parents=True, exist_ok=True)
 
 # Source we already built
 SRC = PROC / "banking_calls.parquet"
-DF = pd.read_parquet(SRC)
+OUT_COLUMNS = ["source_zip", "file_name", TURNS] + ([SHARD_POS] if SHARD else [])   # shards.py reduce orders by it
+# customer_text / full_text are views of `turns` (calls.py): 03 already resolved the roles,
+# including the "Customer:"-prefixed lines of single-blob transcripts
+COLUMNS = OUT_COLUMNS + ["customer_text", "full_text"]
 
-# Positive banking signals (stricter)
-POS = re.compile(
-    r"\b(bank|banking|debit|credit|card|chargeback|dispute|fraud|"
-    r"balance|statement|account|checking|savings|routing|"
-    r"wire|zelle|ach|overdraft|atm|pin|mortgage|loan|"
-    r"direct deposit|autopay|interest|fee|late fee|bill pay|"
-    r"password|passcode|online banking|mobile banking)\b",
-    re.I
-)
+def sources() -> list:
+    """03's call table plus the streamed calls (stream_ingest.py), read as one dataset."""
+    return dataset_files(SRC, STREAM_DIR / "calls")
 
-# Negative domain terms (non-banking services)
-NEG = re.compile(
-    r"\b(router|modem|internet|cable|tv service|technician|installation|"
-    r"outage|wifi|wi-fi|bandwidth|plumbing|hvac|gas line|appliance|"
-    r"water heater|faucet|drain|leak|maintenance|electricity|utility)\b",
-    re.I
-)
-
-# Heuristic split for single-blob transcripts with prefixes
-LINE_SPLIT = re.compile(r"(?:^|\n)\s*(agent|rep|representative|advisor|associate|operator|support|specialist|staff|csr|customer|user|caller|client|member)\s*[:\-]\s*", re.I)
-
-def improve_customer_text(txt: str) -> Tuple[str, str]:
-    """
-    If prefixes like 'Agent:'/'Customer:' are present, split and bucket.
-    Return (customer_text, agent_text).
-    """
-    if not txt or not isinstance(txt, str):
-        return "", ""
-
-    parts = LINE_SPLIT.split(txt)
-    # parts like: [pre, role1, text1, role2, text2, ...]
-    if len(parts) < 3:
-        return "", ""  # no prefixes found; we'll keep original later
-
-    cust_lines, agent_lines = [], []
-    role = None
-    buf = ""
-
-    # Rebuild role->text mapping
-    it = iter(parts)
-    pre = next(it, "")
-    while True:
-        role = next(it, None)
-        seg  = next(it, None)
-        if role is None or seg is None:
-            break
-        r = role.strip().lower()
-        if re.search(r"customer|user|caller|client|member", r):
-            cust_lines.append(seg.strip())
-        else:
-            agent_lines.append(seg.strip())
-
-    return ("\n".join(cust_lines).strip(), "\n".join(agent_lines).strip())
+# POS / NEG live in features.py, so 03 can precompute the keep rule per call
+# (pos_hits / neg_hits in the feature table).
 
 def is_banking_text(s: str) -> bool:
     return bool(POS.search(s)) and not bool(NEG.search(s))
 
-def main():
-    rows = []
-    kept = 0
-
-    for i, r in tqdm(DF.iterrows(), total=len(DF), desc="refine"):
-        cust = (r.get("customer_text") or "").strip()
-        full = (r.get("full_text") or "").strip()
-
-        # Try to improve extraction if no customer_text but full has prefixes
-        if not cust and full:
-            c2, a2 = improve_customer_text(full)
-            if c2:
-                cust = c2
-
-        hay = cust if cust else full
-        if not hay:
-            continue
-
-        if not is_banking_text(hay):
-            continue
+def refine_from_features(feats: pd.DataFrame, run: RunReport):
+    """Keep rule as a column predicate over 03's feature table; only kept calls are read."""
+    with run.step("filter") as st:
+        keep = feats.loc[(feats["pos_hits"] > 0) & (feats["neg_hits"] == 0), "hash"]
+        src = sources()
+        n_in = count_calls(src)
+        st.add(rows_in=n_in)
+
+    kept = []
+    batches = iter_calls(run.read(src, projected_bytes(src, COLUMNS)), COLUMNS, filter=env_filter(hashes=keep))
+    for batch in run.iter("load", tqdm(batches, desc="refine"), rows=len):
+        kept.append(batch)
+    with run.step("filter") as st:
+        st.add(rows_out=sum(len(b) for b in kept))
+    return kept, n_in
+
+def refine_scan(run: RunReport):
+    kept = []
+    n_in = 0
+
+    # stream the projected table in row-group batches (filters from CCBI_SOURCE_ZIPS etc.)
+    src = sources()
+    batches = iter_calls(run.read(src, projected_bytes(src, COLUMNS)), COLUMNS)
+    pbar = tqdm(desc="refine")
+    for batch in run.iter("load", batches, rows=len):
+        n_in += len(batch)
+        pbar.update(len(batch))
+        hay = text_or_fallback(batch).str.strip()
+        with run.step("filter") as st:
+            st.add(rows_in=int((hay.str.len() > 0).sum()))
+            mask = [bool(h) and is_banking_text(h) for h in hay]
+            kept.append(batch[mask])
+            st.add(rows_out=sum(mask))
+    pbar.close()
+    return kept, n_in
 
-        rows.append({
-            "source_zip": r["source_zip"],
-            "file_name": r["file_name"],
-            "customer_text": cust if cust else None,
-            "full_text": full if full else None,
-        })
-        kept += 1
-
-    df2 = pd.DataFrame(rows)
-    out = PROC / "banking_calls_refined.parquet"
-    df2.to_parquet(out, index=False)
-    print(f"Refined kept: {len(df2)} / {len(DF)}")
-    print("Saved ->", out)
-
-    # quick length sanity
-    lens = df2["customer_text"].fillna(df2["full_text"]).str.len()
-    print("Length median:", lens.median(), "p90:", lens.quantile(0.9))
+def main():
+    PROC.mkdir(parents=True, exist_ok=True)
+    LOGS.mkdir(parents=True, exist_ok=True)
+    with RunReport("05_refine_banking_filter") as run:
+        feats = read_features(columns=["hash", "pos_hits", "neg_hits"])
+        # no (or stale) feature table from 03: evaluate the regexes on every call instead
+        use_features = feats is not None and len(feats) == count_calls(sources(), filter=None)
+        kept, n_in = refine_from_features(feats, run) if use_features else refine_scan(run)
+        run.note(features=use_features)
+
+        out = PROC / "banking_calls_refined.parquet"
+        with run.step("write") as st:
+            df2 = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=COLUMNS)
+            write_parquet(df2[OUT_COLUMNS], out)
+            run.wrote(out)
+            st.rows_out = len(df2)
+        print(f"Refined kept: {len(df2)} / {n_in}")
+        print("Saved ->", out)
+
+        # quick length sanity
+        lens = text_or_fallback(df2).str.len()
+        print("Length median:", lens.median(), "p90:", lens.quantile(0.9))
 
 if __name__ == "__main__":
     main()
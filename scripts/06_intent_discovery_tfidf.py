@@ -1,38 +1,58 @@
 # cc-banking-intents/scripts/06_intent_discovery_tfidf.py
 
 import re, json, textwrap
-from pathlib import Path
 from typing import List, Tuple
 import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
 from sklearn.cluster import KMeans
 from sklearn.metrics import silhouette_score
+from instrument import RunReport
+from tables import iter_calls, projected_bytes, as_text
+from regex_profile import profiled, profiled_rules
+from paths import PROC
 
 # -----------------------------
 # Paths
 # -----------------------------
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
 SRC = PROC / "banking_calls_refined.parquet"
+COLUMNS = ["customer_text", "full_text"]
 OUT_DIR = PROC
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # -----------------------------
 # Heuristics for picking "customer-like" lines
 # -----------------------------
-FIRST_PERSON = re.compile(r"\b(i|i'm|i’ve|i’d|i’ll|my|me|mine|can’t|couldn’t|don’t|won’t)\b", re.I)
-BANK_TERMS = re.compile(
+FIRST_PERSON = profiled("FIRST_PERSON", re.compile(r"\b(i|i'm|i’ve|i’d|i’ll|my|me|mine|can’t|couldn’t|don’t|won’t)\b", re.I))
+BANK_TERMS = profiled("BANK_TERMS", re.compile(
     r"\b(account|balance|statement|card|credit|debit|charge|dispute|fraud|pin|atm|"
     r"transfer|wire|ach|zelle|routing|checking|savings|overdraft|fee|interest|loan|mortgage|"
     r"password|login|online banking|mobile app|bill pay|direct deposit)\b", re.I
-)
+))
+SENT_SPLIT = profiled("SENT_SPLIT", re.compile(r"(?<=[\.\?\!])\s+|\n+"))
+
+# Cluster -> draft intent name rules, applied to the top terms of each cluster (first match wins)
+INTENT_RULES = profiled_rules("INTENT_RULES", [(re.compile(pat, re.I), name) for pat, name in [
+    (r"lost|stolen.*card|freeze|lock", "card_lost_or_stolen"),
+    (r"charge|dispute|fraud|unauthor", "card_charge_dispute_or_fraud"),
+    (r"balance|available|limit", "balance_or_credit_limit"),
+    (r"statement|document|monthly", "request_statement_or_document"),
+    (r"transfer|wire|ach|zelle", "money_transfer_wire_ach_zelle"),
+    (r"password|login|reset|locked", "online_banking_login_reset"),
+    (r"overdraft|fee|charge", "fees_or_overdraft"),
+    (r"mortgage|loan|interest|refinance", "loan_or_mortgage_info"),
+    (r"open.*account|new account", "open_new_account"),
+    (r"close.*account", "close_account"),
+    (r"pin|atm", "card_pin_or_atm_issue"),
+    (r"direct deposit|payroll", "direct_deposit_setup_or_issue"),
+    (r"bill pay|autopay|payment", "bill_pay_or_autopay_issue"),
+    (r"address|update.*info|change.*phone", "profile_or_contact_update"),
+]])
 
 def split_sentences(s: str) -> List[str]:
     if not s:
         return []
     # Simple sentence split (., ?, !) and newlines
-    parts = re.split(r"(?<=[\.\?\!])\s+|\n+", s)
+    parts = SENT_SPLIT.split(s)
     out = []
     for p in parts:
         p = p.strip()
@@ -54,16 +74,17 @@ def pick_customer_like(full_text: str, customer_text: str) -> List[str]:
         kept = sorted(kept, key=len)[:20]
     return kept
 
-def build_corpus(df: pd.DataFrame) -> List[str]:
-    corpus = []
-    for _, r in df.iterrows():
-        cust = (r.get("customer_text") or "").strip()
-        full = (r.get("full_text") or "").strip()
-        lines = pick_customer_like(full, cust)
-        corpus.extend(lines)
+def customer_lines(df: pd.DataFrame) -> List[str]:
+    lines = []
+    for cust, full in zip(as_text(df["customer_text"]), as_text(df["full_text"])):
+        cust = cust.strip()
+        full = full.strip()
+        lines.extend(pick_customer_like(full, cust))
+    return lines
+
+def dedupe_corpus(corpus: List[str]) -> List[str]:
     # Deduplicate near-identical lines; also drop very short 1–2 word lines
-    corpus = list(dict.fromkeys([c for c in corpus if len(c.split()) >= 3]))
-    return corpus
+    return list(dict.fromkeys([c for c in corpus if len(c.split()) >= 3]))
 
 def choose_k(X, k_min=10, k_max=28) -> Tuple[int, float]:
     best_k, best_s = None, -1.0
@@ -95,11 +116,32 @@ def top_terms_per_cluster(tfidf: TfidfVectorizer, X, labels, topn=12):
         out.append([terms[i] for i in top_idx])
     return out
 
-def main():
-    df = pd.read_parquet(SRC)
-    print("Loaded refined rows:", len(df))
+def suggest_intent(terms: List[str]) -> str:
+    t = " ".join(terms[:5])
+    for pat, name in INTENT_RULES:
+        if pat.search(t):
+            return name
+    return terms[0:2] and "_".join(terms[0:2]) or "misc"
 
-    corpus = build_corpus(df)
+def main():
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    with RunReport("06_intent_discovery_tfidf") as run:
+        discover(run)
+
+def discover(run: RunReport):
+    # stream the projected table; only the extracted lines are kept in memory
+    n_rows, corpus = 0, []
+    batches = iter_calls(run.read(SRC, projected_bytes(SRC, COLUMNS)), COLUMNS)
+    for batch in run.iter("load", batches, rows=len):
+        n_rows += len(batch)
+        with run.step("extract") as st:
+            st.add(rows_in=len(batch))
+            corpus.extend(customer_lines(batch))
+    print("Loaded refined rows:", n_rows)
+
+    with run.step("extract") as st:
+        corpus = dedupe_corpus(corpus)
+        st.rows_out = len(corpus)
     print("Candidate customer utterances:", len(corpus))
     if len(corpus) < 50:
         print("Too few utterances—consider broadening filters or adding ZIPs.")
@@ -117,19 +159,26 @@ def main():
         stop_words=custom_stops,   # <-- list (valid)
         max_features=50000
     )
-    X = tfidf.fit_transform(corpus)
+    with run.step("vectorize") as st:
+        st.rows_in = len(corpus)
+        X = tfidf.fit_transform(corpus)
+        st.rows_out = X.shape[0]
     print("TF-IDF shape:", X.shape)
 
     # -----------------------------
     # Choose K and cluster
     # -----------------------------
-    k, sil = choose_k(X, k_min=10, k_max=28)
-    if not k:
-        k = 18
-    print(f"Chosen k={k} (silhouette≈{sil:.3f})")
+    with run.step("cluster") as st:
+        st.rows_in = X.shape[0]
+        k, sil = choose_k(X, k_min=10, k_max=28)
+        if not k:
+            k = 18
+        print(f"Chosen k={k} (silhouette≈{sil:.3f})")
 
-    km = KMeans(n_clusters=k, n_init=10, random_state=42)
-    labels = km.fit_predict(X)
+        km = KMeans(n_clusters=k, n_init=10, random_state=42)
+        labels = km.fit_predict(X)
+        st.rows_out = k
+    run.note(k=k, silhouette=round(float(sil), 4))
 
     # -----------------------------
     # Inspect clusters
@@ -149,42 +198,23 @@ def main():
 
     df_out = pd.DataFrame(rows).sort_values("size", ascending=False)
     out_csv = OUT_DIR / "intent_clusters_tfidf.csv"
-    df_out.to_csv(out_csv, index=False)
+    with run.step("write"):
+        df_out.to_csv(out_csv, index=False)
+        run.wrote(out_csv)
     print("Wrote clusters ->", out_csv)
 
     # -----------------------------
     # Draft intent names (auto-suggest)
     # -----------------------------
-    def suggest_intent(terms: List[str]) -> str:
-        t = " ".join(terms[:5])
-        rules = [
-            (r"lost|stolen.*card|freeze|lock", "card_lost_or_stolen"),
-            (r"charge|dispute|fraud|unauthor", "card_charge_dispute_or_fraud"),
-            (r"balance|available|limit", "balance_or_credit_limit"),
-            (r"statement|document|monthly", "request_statement_or_document"),
-            (r"transfer|wire|ach|zelle", "money_transfer_wire_ach_zelle"),
-            (r"password|login|reset|locked", "online_banking_login_reset"),
-            (r"overdraft|fee|charge", "fees_or_overdraft"),
-            (r"mortgage|loan|interest|refinance", "loan_or_mortgage_info"),
-            (r"open.*account|new account", "open_new_account"),
-            (r"close.*account", "close_account"),
-            (r"pin|atm", "card_pin_or_atm_issue"),
-            (r"direct deposit|payroll", "direct_deposit_setup_or_issue"),
-            (r"bill pay|autopay|payment", "bill_pay_or_autopay_issue"),
-            (r"address|update.*info|change.*phone", "profile_or_contact_update"),
-        ]
-        for pat, name in rules:
-            if re.search(pat, t, re.I):
-                return name
-        return terms[0:2] and "_".join(terms[0:2]) or "misc"
-
     intents = []
     for cid, terms in enumerate(cluster_terms):
         intents.append({"cluster_id": cid, "suggested_intent": suggest_intent(terms), "top_terms": terms})
 
     out_json = OUT_DIR / "intent_clusters_tfidf.json"
-    with open(out_json, "w") as f:
-        json.dump(intents, f, indent=2)
+    with run.step("write"):
+        with open(out_json, "w") as f:
+            json.dump(intents, f, indent=2)
+        run.wrote(out_json)
     print("Wrote intent suggestions ->", out_json)
 
 if __name__ == "__main__":
@@ -1,12 +1,9 @@
-from pathlib import Path
 import pandas as pd
 import json, re, itertools, yaml
+from instrument import RunReport
+from paths import PROC, CONF, GEN_CONF
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
-CONF = BASE / "configs"
 OUT = PROC
-CONF.mkdir(parents=True, exist_ok=True)
 
 CLUSTERS_CSV = PROC / "intent_clusters_tfidf.csv"
 CLUSTERS_JSON = PROC / "intent_clusters_tfidf.json"
@@ -15,7 +12,7 @@ CLUSTERS_JSON = PROC / "intent_clusters_tfidf.json"
 OVERRIDE_YAML = CONF / "intent_mapping_overrides.yaml"  # you will edit this (starts empty)
 
 # Draft the first time here; you can diff/edit later
-DRAFT_YAML = CONF / "intent_mapping_draft.yaml"
+DRAFT_YAML = GEN_CONF / "intent_mapping_draft.yaml"      # configs/ (profile configs/ outside full)
 CATALOG_JSONL = PROC / "intent_catalog.jsonl"
 
 # Some normalization helpers for nicer, stable intent ids
@@ -27,9 +24,17 @@ def slugify(name: str) -> str:
     return name
 
 def main():
-    df = pd.read_csv(CLUSTERS_CSV)
-    with open(CLUSTERS_JSON, "r") as f:
-        intents = {int(x["cluster_id"]): x for x in json.load(f)}
+    CONF.mkdir(parents=True, exist_ok=True)
+    GEN_CONF.mkdir(parents=True, exist_ok=True)
+    with RunReport("07_curate_intents") as run:
+        curate(run)
+
+def curate(run: RunReport):
+    with run.step("load") as st:
+        df = pd.read_csv(run.read(CLUSTERS_CSV))
+        with open(run.read(CLUSTERS_JSON), "r") as f:
+            intents = {int(x["cluster_id"]): x for x in json.load(f)}
+        st.rows_out = len(df)
 
     # Build draft rows
     rows = []
@@ -70,12 +75,14 @@ def main():
             for r in sorted(rows, key=lambda x: -x["size"])
         ]
     }
-    with open(DRAFT_YAML, "w") as f:
-        yaml.safe_dump(draft, f, sort_keys=False, width=120)
+    with run.step("write"):
+        with open(DRAFT_YAML, "w") as f:
+            yaml.safe_dump(draft, f, sort_keys=False, width=120)
+        run.wrote(DRAFT_YAML)
 
     # Merge overrides if present
     if OVERRIDE_YAML.exists():
-        with open(OVERRIDE_YAML, "r") as f:
+        with open(run.read(OVERRIDE_YAML), "r") as f:
             overrides = yaml.safe_load(f) or {}
         override_map = {}
         for item in overrides.get("clusters", []):
@@ -94,7 +101,8 @@ def main():
                     r["handoff_reason"] = ov["handoff_reason"]
 
     # Emit a compact catalog for downstream steps
-    with open(CATALOG_JSONL, "w") as f:
+    with run.step("write") as st, open(CATALOG_JSONL, "w") as f:
+        st.rows_out = len(rows)
         for r in sorted(rows, key=lambda x: -x["size"]):
             rec = {
                 "intent_id": r["intent_id"],
@@ -107,6 +115,7 @@ def main():
                 "examples": r["examples"],
             }
             f.write(json.dumps(rec) + "\n")
+    run.wrote(CATALOG_JSONL)
 
     print(f"Wrote draft -> {DRAFT_YAML}")
     print(f"Wrote intent catalog -> {CATALOG_JSONL}")
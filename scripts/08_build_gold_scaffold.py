@@ -1,19 +1,22 @@
-from pathlib import Path
 import json
 import pandas as pd
-
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
+from instrument import RunReport
+from paths import PROC
 
 CATALOG_JSONL = PROC / "intent_catalog.jsonl"
 OUT_GOLD = PROC / "gold_answers_todo.csv"
 OUT_HANDOFF = PROC / "handoff_intents.csv"
 
 def main():
+    with RunReport("08_build_gold_scaffold") as run:
+        build(run)
+
+def build(run: RunReport):
     intents = []
-    with open(CATALOG_JSONL, "r") as f:
+    with run.step("load") as st, open(run.read(CATALOG_JSONL), "r") as f:
         for line in f:
             intents.append(json.loads(line))
+        st.rows_out = len(intents)
 
     # Expand examples to a few sample questions per intent
     gold_rows = []
@@ -42,12 +45,16 @@ def main():
                 })
                 handoff_rows.append(row)
 
-    if gold_rows:
-        pd.DataFrame(gold_rows).to_csv(OUT_GOLD, index=False)
-        print("Wrote gold-answer scaffold ->", OUT_GOLD)
-    if handoff_rows:
-        pd.DataFrame(handoff_rows).to_csv(OUT_HANDOFF, index=False)
-        print("Wrote handoff list ->", OUT_HANDOFF)
+    with run.step("write") as st:
+        st.rows_out = len(gold_rows) + len(handoff_rows)
+        if gold_rows:
+            pd.DataFrame(gold_rows).to_csv(OUT_GOLD, index=False)
+            run.wrote(OUT_GOLD)
+            print("Wrote gold-answer scaffold ->", OUT_GOLD)
+        if handoff_rows:
+            pd.DataFrame(handoff_rows).to_csv(OUT_HANDOFF, index=False)
+            run.wrote(OUT_HANDOFF)
+            print("Wrote handoff list ->", OUT_HANDOFF)
 
     print("Next: Fill gold_answer & source_refs for answerable intents.")
 
@@ -1,36 +1,55 @@
 from pathlib import Path
-import pandas as pd, json, sys
-
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
+import csv, json, sys
+from instrument import RunReport
+from paths import PROC
 
 gold = PROC / "gold_answers_todo.csv"
 handoff = PROC / "handoff_intents.csv"
 catalog = PROC / "intent_catalog.jsonl"
 
-gold_df = pd.read_csv(gold)
-handoff_df = pd.read_csv(handoff)
-cat = [json.loads(l) for l in open(catalog)]
-ans = {c["intent_id"] for c in cat if c.get("answerable", True)}
-non = {c["intent_id"] for c in cat if not c.get("answerable", True)}
-
-ok = True
-
-if {"gold_answer","source_refs","policy_notes"}.issubset(gold_df.columns):
-    if not set(gold_df["intent_id"]).issubset(ans):
-        print("❌ gold_answers_todo.csv includes non-answerable intents")
-        ok = False
-else:
-    print("❌ gold_answers_todo.csv missing gold-answer columns")
-    ok = False
-
-if {"handoff_reason","handoff_destination"}.issubset(handoff_df.columns):
-    if not set(handoff_df["intent_id"]).issubset(non):
-        print("❌ handoff_intents.csv includes answerable intents")
-        ok = False
-else:
-    print("❌ handoff_intents.csv missing handoff columns")
-    ok = False
-
-print("✅ intent count:", len(cat), "| answerable:", len(ans), "| non-answerable:", len(non))
-sys.exit(0 if ok else 1)
+def read_csv_rows(path: Path):
+    # stdlib csv keeps this check cheap to start (no pandas import)
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames or [], list(reader)
+
+def validate(run: RunReport) -> bool:
+    with run.step("load") as st:
+        gold_cols, gold_rows = read_csv_rows(run.read(gold))
+        handoff_cols, handoff_rows = read_csv_rows(run.read(handoff))
+        with open(run.read(catalog)) as f:
+            cat = [json.loads(l) for l in f if l.strip()]
+        st.rows_out = len(gold_rows) + len(handoff_rows) + len(cat)
+    ans = {c["intent_id"] for c in cat if c.get("answerable", True)}
+    non = {c["intent_id"] for c in cat if not c.get("answerable", True)}
+
+    ok = True
+
+    with run.step("validate"):
+        if {"gold_answer","source_refs","policy_notes"}.issubset(gold_cols):
+            if not {r["intent_id"] for r in gold_rows}.issubset(ans):
+                print("❌ gold_answers_todo.csv includes non-answerable intents")
+                ok = False
+        else:
+            print("❌ gold_answers_todo.csv missing gold-answer columns")
+            ok = False
+
+        if {"handoff_reason","handoff_destination"}.issubset(handoff_cols):
+            if not {r["intent_id"] for r in handoff_rows}.issubset(non):
+                print("❌ handoff_intents.csv includes answerable intents")
+                ok = False
+        else:
+            print("❌ handoff_intents.csv missing handoff columns")
+            ok = False
+
+    print("✅ intent count:", len(cat), "| answerable:", len(ans), "| non-answerable:", len(non))
+    run.note(valid=ok, intents=len(cat), answerable=len(ans), non_answerable=len(non))
+    return ok
+
+def main():
+    with RunReport("09_validate_outputs") as run:
+        ok = validate(run)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
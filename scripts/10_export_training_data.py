@@ -1,62 +1,71 @@
 from pathlib import Path
-import json, csv, re
+import json, csv
 import pandas as pd
+from instrument import RunReport, NullReport
+from training import write_table
+from textnorm import normalize
+from tables import with_key
+from paths import PROC
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
 CATALOG = PROC / "intent_catalog.jsonl"         # from step 7 (after overrides)
 GOLD = PROC / "gold_answers_todo.csv"           # answerable only
 OUT_DIR = PROC / "training"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# Minimal cleanup for examples
-REDACS = re.compile(r"\[(PERSON_NAME|LOCATION|PHONE_NUMBER|EMAIL_ADDRESS|MONEY_AMOUNT|DATE|TIME|OCCUPATION)\]", re.I)
-
-def clean_text(s: str) -> str:
-    s = (s or "").strip()
-    s = REDACS.sub(lambda m: "{" + m.group(1).lower() + "}", s)  # turn placeholders into slot-like braces
-    s = re.sub(r"\s+", " ", s)
-    return s
+OUT_UTTERANCES = OUT_DIR / "utterances_answerable.parquet"
+OUT_HANDOFF = OUT_DIR / "handoff_intents.json"
 
 def main():
-    # Load catalog
-    intents = [json.loads(l) for l in open(CATALOG, "r")]
-    # restrict to answerable intents (we’ll still export a separate file listing handoff)
-    answerable = [i for i in intents if i.get("answerable", True)]
-    handoff =   [i for i in intents if not i.get("answerable", True)]
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    with RunReport("10_export_training_data") as run:
+        export(run)
 
-    # CSV (generic) — utterances per intent
+def export_utterances(intents: list, run: RunReport = None) -> pd.DataFrame:
+    """Answerable intents -> utterance table (intent_id, intent_name, utterance, row_id key)."""
+    run = run or NullReport()
     rows = []
-    for it in answerable:
-        exs = it.get("examples", [])[:25] or []
-        for ex in exs:
-            rows.append({
-                "intent_id": it["intent_id"],
-                "intent_name": it["intent_name"],
-                "utterance": clean_text(ex)
-            })
-    out_csv = OUT_DIR / "utterances_answerable.csv"
-    pd.DataFrame(rows).to_csv(out_csv, index=False)
-
-    # JSON (Lex-friendly-ish): {name, samples:[]}
-    pack = []
-    for it in answerable:
-        exs = [clean_text(x) for x in it.get("examples", [])[:25] if clean_text(x)]
-        pack.append({"intent_id": it["intent_id"], "name": it["intent_name"], "samples": exs})
-    out_json = OUT_DIR / "utterances_answerable.json"
-    json.dump(pack, open(out_json, "w"), indent=2)
+    with run.step("extract") as st:
+        for it in intents:
+            if not it.get("answerable", True):
+                continue
+            exs = it.get("examples", [])[:25] or []
+            for ex in exs:
+                rows.append({
+                    "intent_id": it["intent_id"],
+                    "intent_name": it["intent_name"],
+                    "utterance": ex
+                })
+        df = pd.DataFrame(rows, columns=["intent_id", "intent_name", "utterance"])
+        df["utterance"] = normalize(df["utterance"])   # minimal cleanup: placeholders -> slot-like braces
+        df = with_key(df)
+        st.rows_in = len(intents)
+        st.rows_out = len(df)
+    return df
 
+def handoff_list(intents: list) -> list:
     # Handoff/non-answerable list (for routing rules)
-    out_handoff = OUT_DIR / "handoff_intents.json"
-    json.dump(
-        [{"intent_id": i["intent_id"], "name": i["intent_name"], "reason": i.get("handoff_reason","")} for i in handoff],
-        open(out_handoff, "w"),
-        indent=2
-    )
-
-    print("Wrote:", out_csv)
-    print("Wrote:", out_json)
-    print("Wrote:", out_handoff)
+    return [{"intent_id": i["intent_id"], "name": i["intent_name"], "reason": i.get("handoff_reason","")}
+            for i in intents if not i.get("answerable", True)]
+
+def load_catalog(path: Path = CATALOG) -> list:
+    with open(path, "r") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+def export(run: RunReport):
+    # Load catalog
+    with run.step("load") as st:
+        intents = load_catalog(run.read(CATALOG))
+        st.rows_out = len(intents)
+
+    # Utterances per intent (Parquet; CSV/JSON copies via `training.py --export`)
+    df = export_utterances(intents, run)
+    with run.step("write") as st:
+        run.wrote(write_table(df, OUT_UTTERANCES))
+        st.rows_out = len(df)
+        with open(OUT_HANDOFF, "w") as f:
+            json.dump(handoff_list(intents), f, indent=2)
+        run.wrote(OUT_HANDOFF)
+
+    print("Wrote:", OUT_UTTERANCES)
+    print("Wrote:", OUT_HANDOFF)
 
 if __name__ == "__main__":
     main()
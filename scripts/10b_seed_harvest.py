@@ -1,12 +1,18 @@
-from pathlib import Path
-import re, json
+import re
 import pandas as pd
+from instrument import RunReport, NullReport
+from training import write_table
+from tables import iter_calls, projected_bytes, frames, call_lines, as_text, with_key, KEY, TURN_INDEX, PROVENANCE
+from calls import TURNS
+from regex_profile import profiled, profiled_table
+from paths import PROC, SHARD
+from workers import ArrowPool, WORKERS
+from shards import SHARD_POS
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
 SRC = PROC / "banking_calls_refined.parquet"
-OUT = PROC / "training" / "seed_harvest.jsonl"
-OUT.parent.mkdir(parents=True, exist_ok=True)
+OUT = PROC / "training" / "seed_harvest.parquet"
+COLUMNS = ["source_zip", "file_name", TURNS, "customer_text", "full_text"] + ([SHARD_POS] if SHARD else [])
+LINE = "line"        # with shard_pos: a seed's place in the single-node harvest (shards.py reduce)
 
 SEEDS = {
   "card_lost_or_stolen": r"\b(lost|stolen)\s+card|\bfreeze\b|\block\b",
@@ -23,35 +29,78 @@ SEEDS = {
   "direct_deposit_setup_or_issue": r"\b(direct deposit|payroll)\b",
   "bill_pay_or_autopay_issue": r"\b(bill\s?pay|autopay|auto pay|payment)\b"
 }
-COMPILED = {k: re.compile(v, re.I) for k,v in SEEDS.items()}
+COMPILED = profiled_table("SEEDS", {k: re.compile(v, re.I) for k,v in SEEDS.items()})
+SENT_SPLIT = profiled("SENT_SPLIT", re.compile(r"(?<=[\.\?\!])\s+|\n+"))
 
 def pick_lines(text: str):
-    lines = re.split(r"(?<=[\.\?\!])\s+|\n+", text or "")
+    lines = SENT_SPLIT.split(text or "")
     return [l.strip() for l in lines if 5 <= len(l.strip()) <= 300]
 
 def main():
-    df = pd.read_parquet(SRC)
+    OUT.parent.mkdir(parents=True, exist_ok=True)
+    with RunReport("10b_seed_harvest") as run:
+        harvest(run)
+
+def extract_seeds(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One batch of calls -> candidate seeds (intent_id, utterance, source_zip, file_name,
+    turn_index[, shard_pos, line]), in call order.
+    """
     out = []
-    for _, r in df.iterrows():
-        src = r.get("customer_text") or r.get("full_text") or ""
-        for line in pick_lines(src):
-            for intent, pat in COMPILED.items():
-                if pat.search(line):
-                    out.append({"intent_id": intent, "utterance": line[:500]})
-                    break  # one intent per line
-    # dedupe
-    seen = set()
-    uniq = []
-    for x in out:
-        key = (x["intent_id"], x["utterance"].lower())
-        if key in seen: continue
-        seen.add(key)
-        uniq.append(x)
-
-    with open(OUT, "w") as f:
-        for x in uniq:
-            f.write(json.dumps(x) + "\n")
-    print("Wrote:", OUT, "| rows:", len(uniq))
+    columns = ["intent_id", "utterance"] + PROVENANCE
+    zips, names = (as_text(df[c]).tolist() if c in df else [None] * len(df) for c in ("source_zip", "file_name"))
+    positions = df[SHARD_POS] if SHARD_POS in df else None
+    if positions is not None:
+        columns += [SHARD_POS, LINE]
+    prev, j = -1, 0
+    for k, turn, line in call_lines(df, pick_lines):
+        j, prev = (j + 1 if k == prev else 0), k
+        for intent, pat in COMPILED.items():
+            if pat.search(line):
+                x = {"intent_id": intent, "utterance": line[:500],
+                     "source_zip": zips[k], "file_name": names[k], TURN_INDEX: turn}
+                if positions is not None:
+                    x[SHARD_POS], x[LINE] = int(positions.iat[k]), j
+                out.append(x)
+                break  # one intent per line
+    seeds = pd.DataFrame(out, columns=columns)
+    seeds[TURN_INDEX] = seeds[TURN_INDEX].astype("Int64")
+    return seeds
+
+def harvest_seeds(calls, run: RunReport = None, workers: int = WORKERS) -> pd.DataFrame:
+    """
+    Refined calls -> deduped seed utterances (row_id key, intent_id, utterance and the call /
+    turn each came from). `calls` is a DataFrame or an iterable of DataFrame batches
+    (iter_calls). workers > 1 (CCBI_WORKERS) extracts the batches in a process pool that
+    passes them through shared memory (workers.py).
+    """
+    run = run or NullReport()
+    parts = []
+    with ArrowPool(workers) as pool:
+        batches = run.iter("load", frames(calls), rows=len)
+        for part in run.iter("extract", pool.imap(extract_seeds, batches), rows=len):
+            parts.append(part)
+        if workers > 1:
+            run.note(workers=pool.report())
+    seeds = pd.concat(parts, ignore_index=True) if parts else extract_seeds(pd.DataFrame(columns=COLUMNS))
+    with run.step("dedupe") as st:
+        st.rows_in = len(seeds)
+        uniq = dedupe_seeds(seeds)
+        st.rows_out = len(uniq)
+    return uniq
+
+def dedupe_seeds(seeds: pd.DataFrame) -> pd.DataFrame:
+    """First occurrence of each utterance key (intent_id, casefolded utterance), in order."""
+    seeds = with_key(seeds)
+    return seeds[~seeds[KEY].duplicated()].reset_index(drop=True)
+
+def harvest(run: RunReport):
+    seeds = harvest_seeds(iter_calls(run.read(SRC, projected_bytes(SRC, COLUMNS)), COLUMNS), run)
+
+    with run.step("write") as st:
+        run.wrote(write_table(seeds, OUT))
+        st.rows_out = len(seeds)
+    print("Wrote:", OUT, "| rows:", len(seeds))
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,21 @@
-from pathlib import Path
-import re, json, csv
+import re
 import pandas as pd
-from collections import defaultdict, Counter
+from collections import defaultdict
+from instrument import RunReport, NullReport
+from training import read_table, write_table
+from regex_profile import profiled_table
+from textnorm import normalize
+from tables import with_key, KEY, TURN_INDEX, PROVENANCE
+from paths import PROC
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
 TRAIN = PROC / "training"
-TRAIN.mkdir(parents=True, exist_ok=True)
 
-SEED_PATH = TRAIN / "seed_harvest.jsonl"  # <- inside data/processed/training/
+SEED_PATH = TRAIN / "seed_harvest.parquet"  # <- inside data/processed/training/
 # If you ran 10b in a different place, point SEED_PATH to it:
-# SEED_PATH = Path("<ABSOLUTE_PATH_TO>/fdf6a531-d69c-4ad0-be9f-472a91f6a201.jsonl")
+# SEED_PATH = Path("<ABSOLUTE_PATH_TO>/seed_harvest.parquet")
 
-IN_CSV  = TRAIN / "utterances_answerable.csv"     # from Step 10
-IN_JSON = TRAIN / "utterances_answerable.json"
-OUT_CSV = TRAIN / "utterances_answerable.merged.csv"
-OUT_JSON = TRAIN / "utterances_answerable.merged.json"
+IN_TABLE  = TRAIN / "utterances_answerable.parquet"        # from Step 10
+OUT_TABLE = TRAIN / "utterances_answerable.merged.parquet"
 
 # --- Tight, intent-specific relevance filters to trim false positives ---
 STRICT = {
@@ -34,15 +34,7 @@ STRICT = {
     "bill_pay_or_autopay_issue": r"\b(bill\s*pay|auto\s*pay|autopay|payment|pay\s+bill|schedule\s+payment)\b",
 }
 
-COMPILED = {k: re.compile(v, re.I) for k, v in STRICT.items()}
-
-# Normalize placeholders to slot-like braces
-REDACS = re.compile(r"\[(PERSON_NAME|LOCATION|PHONE_NUMBER|EMAIL_ADDRESS|MONEY_AMOUNT|DATE|TIME|OCCUPATION)\]", re.I)
-def normalize_text(s: str) -> str:
-    s = (s or "").strip()
-    s = REDACS.sub(lambda m: "{" + m.group(1).lower() + "}", s)
-    s = re.sub(r"\s+", " ", s)
-    return s
+COMPILED = profiled_table("STRICT", {k: re.compile(v, re.I) for k, v in STRICT.items()})
 
 def pass_strict(intent: str, text: str) -> bool:
     pat = COMPILED.get(intent)
@@ -51,107 +43,120 @@ def pass_strict(intent: str, text: str) -> bool:
     return bool(pat.search(text))
 
 def main():
-    # Load existing answerable utterances (if present)
-    if IN_CSV.exists():
-        base_df = pd.read_csv(IN_CSV)
-    else:
-        base_df = pd.DataFrame(columns=["intent_id", "intent_name", "utterance"])
-
-    # Load seeds
-    harvested = []
-    if SEED_PATH.exists():
-        with open(SEED_PATH, "r") as f:
-            for line in f:
-                rec = json.loads(line)
-                harvested.append(rec)
-    else:
-        print("No seed file found:", SEED_PATH)
-        return
-
-    # Normalize and filter seeds
-    cleaned = defaultdict(list)
-    for rec in harvested:
-        iid = rec.get("intent_id")
-        utt = normalize_text(rec.get("utterance", ""))
-        if not iid or len(utt.split()) < 3:
-            continue
-        if pass_strict(iid, utt):
-            cleaned[iid].append(utt)
-
-    # Deduplicate per intent (case-insensitive)
-    for iid in list(cleaned.keys()):
-        seen = set()
-        unique = []
-        for u in cleaned[iid]:
-            key = u.lower()
-            if key not in seen:
-                seen.add(key)
-                unique.append(u)
-        cleaned[iid] = unique
-
-    # Build combined set (existing + seeds), with balancing
-    combined = defaultdict(set)
+    TRAIN.mkdir(parents=True, exist_ok=True)
+    with RunReport("10c_merge_seeded") as run:
+        merge(run)
+
+def keyed(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalized utterances (placeholders to slot-like braces) and their keys, with provenance."""
+    df = df.assign(utterance=normalize(df["utterance"])).drop(columns=[KEY], errors="ignore")
+    for c in PROVENANCE:
+        if c not in df:
+            df[c] = None
+    return with_key(df)
+
+def candidates(df: pd.DataFrame) -> list:
+    """(key, utterance, source_zip, file_name, turn_index) per row."""
+    return list(zip(df[KEY].tolist(), df["utterance"].tolist(), *(df[c].tolist() for c in PROVENANCE)))
+
+def merge_seeded(base_df: pd.DataFrame, seeds: pd.DataFrame, run: RunReport = None) -> pd.DataFrame:
+    """Step-10 utterances + harvested seeds -> filtered, balanced merged table."""
+    run = run or NullReport()
+    seeds = keyed(seeds.dropna(subset=["intent_id"]))
+
+    # Filter seeds
+    with run.step("filter") as st:
+        st.rows_in = len(seeds)
+        ok = [bool(iid) and len(utt.split()) >= 3 and pass_strict(iid, utt)
+              for iid, utt in zip(seeds["intent_id"].astype(str), seeds["utterance"])]
+        seeds = seeds[ok]
+        st.rows_out = len(seeds)
+
+    # Deduplicate per intent (case-insensitive): first occurrence of each key
+    with run.step("dedupe") as st:
+        st.rows_in = len(seeds)
+        seeds = seeds[~seeds[KEY].duplicated()]
+        cleaned = {iid: candidates(g) for iid, g in seeds.groupby("intent_id", sort=False, observed=True)}
+        st.rows_out = len(seeds)
+
+    # Build combined set (existing + seeds), with balancing: intent -> {key: candidate}
+    combined = defaultdict(dict)
     intent_names = {r.intent_id: r.intent_name for r in base_df.itertuples(index=False)} if len(base_df) else {}
 
-    for r in base_df.itertuples(index=False):
-        combined[r.intent_id].add(normalize_text(r.utterance))
+    if len(base_df):
+        base = keyed(base_df)
+        for iid, c in zip(base["intent_id"], candidates(base)):
+            combined[iid].setdefault(c[0], c)
 
     # target counts per intent
     MIN_PER_INTENT = 50
     MAX_PER_INTENT = 150
 
     # Pull in seeds up to cap
-    for iid, utterances in cleaned.items():
+    for iid, cands in cleaned.items():
         current = len(combined[iid])
         room = max(0, MAX_PER_INTENT - current)
         if room > 0:
             # prefer more diverse mix: keep questions, commands, statements
-            qs = [u for u in utterances if u.endswith("?")]
-            st = [u for u in utterances if not u.endswith("?")]
+            qs = [c for c in cands if c[1].endswith("?")]
+            st = [c for c in cands if not c[1].endswith("?")]
             take = []
 
             # ensure at least ~30% questions if available
-            q_take = min(len(qs), max(0, int(0.3 * MAX_PER_INTENT) - sum(u.endswith("?") for u in combined[iid])))
+            q_take = min(len(qs), max(0, int(0.3 * MAX_PER_INTENT) - sum(c[1].endswith("?") for c in combined[iid].values())))
             take.extend(qs[:q_take])
             # fill rest with statements
             rest = room - len(take)
             if rest > 0:
                 take.extend(st[:rest])
 
-            for u in take:
-                combined[iid].add(u)
+            for c in take:
+                combined[iid].setdefault(c[0], c)
 
     # Flatten to rows
     rows = []
-    for iid, utts in combined.items():
-        if not utts:
+    for iid, cands in combined.items():
+        if not cands:
             continue
         name = intent_names.get(iid, iid)
         # trim to min/max
-        keep = list(utts)[:MAX_PER_INTENT]
+        keep = list(cands.values())[:MAX_PER_INTENT]
         # if below minimum and we have more seeds, top up
         if len(keep) < MIN_PER_INTENT and iid in cleaned:
-            extra = [u for u in cleaned[iid] if u not in keep]
+            extra = [c for c in cleaned[iid] if c[0] not in cands]
             keep.extend(extra[:(MIN_PER_INTENT - len(keep))])
-        for u in keep:
-            rows.append({"intent_id": iid, "intent_name": name, "utterance": u})
+        for key, u, *origin in keep:
+            rows.append({"intent_id": iid, "intent_name": name, "utterance": u, KEY: key, **dict(zip(PROVENANCE, origin))})
 
-    out_df = pd.DataFrame(rows).sort_values(["intent_id", "utterance"])
-    out_df.to_csv(OUT_CSV, index=False)
+    out = pd.DataFrame(rows, columns=["intent_id", "intent_name", "utterance", KEY] + PROVENANCE)
+    out[TURN_INDEX] = out[TURN_INDEX].astype("Int64")
+    return out.sort_values(["intent_id", "utterance"])
 
-    # Write JSON pack grouped by intent
-    pack = []
-    for iid, g in out_df.groupby("intent_id"):
-        name = g["intent_name"].iloc[0]
-        samples = g["utterance"].tolist()
-        pack.append({"intent_id": iid, "name": name, "samples": samples})
-    with open(OUT_JSON, "w") as f:
-        json.dump(pack, f, indent=2)
+def merge(run: RunReport):
+    # Load existing answerable utterances (if present)
+    with run.step("load") as st:
+        if IN_TABLE.exists():
+            base_df = read_table(run.read(IN_TABLE))
+        else:
+            base_df = pd.DataFrame(columns=["intent_id", "intent_name", "utterance"])
+
+        # Load seeds
+        if SEED_PATH.exists():
+            seeds = read_table(run.read(SEED_PATH))
+        else:
+            print("No seed file found:", SEED_PATH)
+            return
+        st.rows_out = len(base_df) + len(seeds)
+
+    out_df = merge_seeded(base_df, seeds, run)
+
+    with run.step("write") as st:
+        run.wrote(write_table(out_df, OUT_TABLE))
+        st.rows_out = len(out_df)
 
     # Print per-intent counts
     counts = out_df.groupby("intent_id")["utterance"].count().sort_values(ascending=False)
-    print("Saved:", OUT_CSV)
-    print("Saved:", OUT_JSON)
+    print("Saved:", OUT_TABLE)
     print("\nPer-intent counts after merge:")
     print(counts.to_string())
 
@@ -1,17 +1,19 @@
 # cc-banking-intents/scripts/10d_topup_targets.py
 
-from pathlib import Path
-import re, json
+import re
 import pandas as pd
+from instrument import RunReport, NullReport
+from training import read_table, write_table
+from tables import iter_calls, projected_bytes, frames, call_lines, as_text, dedupe_key, utterance_key, KEY, TURN_INDEX
+from calls import TURNS
+from regex_profile import profiled, profiled_table
+from textnorm import normalize
+from paths import PROC, TRAIN_DIR
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
 SRC  = PROC / "banking_calls_refined.parquet"           # from step 5
-TRAIN_DIR = PROC / "training"
-TRAIN_DIR.mkdir(parents=True, exist_ok=True)
+COLUMNS = ["source_zip", "file_name", TURNS, "customer_text", "full_text"]
 
-MERGED_CSV  = TRAIN_DIR / "utterances_answerable.merged.csv"
-MERGED_JSON = TRAIN_DIR / "utterances_answerable.merged.json"
+MERGED = TRAIN_DIR / "utterances_answerable.merged.parquet"
 
 TARGETS = {
     # raise these to at least 50 examples
@@ -22,7 +24,7 @@ TARGETS = {
 }
 
 # Intent-specific strict patterns (customer-like phrasings favored)
-PATS = {
+PATS = profiled_table("PATS", {
     "billing_zip_verification": re.compile(
         r"\b(billing\s+zip|postal\s+code|zip\s+code\s+(?:on|for)\s+(?:the\s+)?card|verify\s+(?:my\s+)?zip)\b",
         re.I),
@@ -35,98 +37,118 @@ PATS = {
     "direct_deposit_setup_or_issue": re.compile(
         r"\b(direct\s+deposit|payroll\s+deposit|routing\s+number|account\s+number\s+for\s+deposit|set\s+up\s+direct\s+deposit)\b",
         re.I),
-}
+})
 
-# Normalize placeholders to slot-like braces
-REDACS = re.compile(r"\[(PERSON_NAME|LOCATION|PHONE_NUMBER|EMAIL_ADDRESS|MONEY_AMOUNT|DATE|TIME|OCCUPATION)\]", re.I)
-def normalize_text(s: str) -> str:
-    s = (s or "").strip()
-    s = REDACS.sub(lambda m: "{" + m.group(1).lower() + "}", s)
-    s = re.sub(r"\s+", " ", s)
-    return s
+SENT_SPLIT = profiled("SENT_SPLIT", re.compile(r"(?<=[\.\?\!])\s+|\n+"))
 
 def sentence_split(s: str):
-    for part in re.split(r"(?<=[\.\?\!])\s+|\n+", s or ""):
+    for part in SENT_SPLIT.split(s or ""):
         part = part.strip()
         if 5 <= len(part) <= 300:
             yield part
 
 def main():
-    if not MERGED_CSV.exists():
-        print("Merged training CSV not found:", MERGED_CSV)
-        return
-
-    base_df = pd.read_csv(MERGED_CSV)
+    TRAIN_DIR.mkdir(parents=True, exist_ok=True)
+    with RunReport("10d_topup_targets") as run:
+        topup(run)
+
+def topup_targets(base_df: pd.DataFrame, calls, run: RunReport = None) -> pd.DataFrame:
+    """
+    Raise the TARGETS intents toward their minimums with strict-pattern matches from the
+    refined calls. `calls` is a DataFrame, an iterable of DataFrame batches, or a zero-arg
+    callable returning either (only called when a top-up is needed); batches stop being read
+    once every target is met. Returns `base_df` itself when nothing was added.
+    """
+    run = run or NullReport()
     # Current counts
-    counts = base_df.groupby("intent_id")["utterance"].count().to_dict()
+    counts = base_df.groupby("intent_id", observed=True)["utterance"].count().to_dict()
 
     # Which intents actually need topup
     need = {iid: tgt for iid, tgt in TARGETS.items() if counts.get(iid, 0) < tgt}
     if not need:
         print("All target intents already meet minimums. Nothing to do.")
-        return
+        return base_df
 
-    df = pd.read_parquet(SRC)
+    if callable(calls):
+        calls = calls()
 
-    # Build a set of existing utterances (casefolded) per intent
-    existing = {}
-    for iid, g in base_df.groupby("intent_id"):
-        existing[iid] = set(u.strip().lower() for u in g["utterance"].astype(str))
+    # Keys of the existing utterances (intent_id + casefolded utterance)
+    keys = dedupe_key(base_df)
+    existing = set(keys.tolist())
 
     # Harvest more lines
     adds = []
-    for _, row in df.iterrows():
-        # Prefer customer_text if present; else fallback to full_text
-        text = (row.get("customer_text") or row.get("full_text") or "")
-        for sent in sentence_split(text):
-            norm = normalize_text(sent)
-            low = norm.lower()
-            # Try each target
-            for iid, min_needed in need.items():
-                if len([a for a in adds if a["intent_id"] == iid]) + counts.get(iid, 0) >= min_needed:
-                    continue  # already satisfied
-                pat = PATS[iid]
-                if pat.search(norm):
-                    if low not in existing.get(iid, set()):
-                        # Keep some diversity: avoid purely agent-like prompts
-                        if not norm.lower().startswith(("i'll ", "let me ", "i can ", "we can ")):
-                            adds.append({"intent_id": iid, "intent_name": iid, "utterance": norm})
-                            existing.setdefault(iid, set()).add(low)
+    added = dict.fromkeys(need, 0)
+    for df in run.iter("load", frames(calls), rows=len):
+        with run.step("extract") as st:
+            st.add(rows_in=len(df))
+            zips, names = (as_text(df[c]).tolist() if c in df else [None] * len(df) for c in ("source_zip", "file_name"))
+            # Prefer customer_text if present; else fallback to full_text. Placeholders become
+            # slot-like braces, for the whole batch's sentences at once.
+            lines = list(call_lines(df, sentence_split))
+            for (k, turn, _), norm in zip(lines, normalize([line for _, _, line in lines])):
+                # Try each target
+                for iid, min_needed in need.items():
+                    if added[iid] + counts.get(iid, 0) >= min_needed:
+                        continue  # already satisfied
+                    pat = PATS[iid]
+                    if pat.search(norm):
+                        key = utterance_key(iid, norm)
+                        if key not in existing:
+                            # Keep some diversity: avoid purely agent-like prompts
+                            if not norm.lower().startswith(("i'll ", "let me ", "i can ", "we can ")):
+                                adds.append({"intent_id": iid, "intent_name": iid, "utterance": norm, KEY: key,
+                                             "source_zip": zips[k], "file_name": names[k], TURN_INDEX: turn})
+                                added[iid] += 1
+                                existing.add(key)
+            st.rows_out = len(adds)
+        if all(added[iid] + counts.get(iid, 0) >= tgt for iid, tgt in need.items()):
+            break  # every target met: the remaining batches are never read
 
     if not adds:
         print("No additional lines matched strict patterns. You can relax patterns in PATS.")
-        return
+        return base_df
 
-    # Append and save
-    out_df = pd.concat([base_df, pd.DataFrame(adds)], ignore_index=True)
+    # Append
+    adds = pd.DataFrame(adds)
+    adds[TURN_INDEX] = adds[TURN_INDEX].astype("Int64")
+    out_df = pd.concat([base_df.assign(**{KEY: keys}), adds], ignore_index=True)
     # Re-trim to max 150 per intent, keep first occurrences
     MAX_PER_INTENT = 150
-    out_df["key"] = out_df["intent_id"].astype(str) + "||" + out_df["utterance"].astype(str).str.lower().str.strip()
-    out_df = out_df.drop_duplicates("key")
-
-    # enforce cap
-    out_df["row_ix"] = range(len(out_df))
-    capped = []
-    for iid, g in out_df.sort_values("row_ix").groupby("intent_id", sort=False):
-        capped.append(g.head(MAX_PER_INTENT))
-    out_df = pd.concat(capped).drop(columns=["key","row_ix"])
-
-    out_df.to_csv(MERGED_CSV, index=False)
-
-    # Update JSON pack
-    pack = []
-    for iid, g in out_df.groupby("intent_id"):
-        name = g["intent_name"].iloc[0]
-        samples = g["utterance"].tolist()
-        pack.append({"intent_id": iid, "name": name, "samples": samples})
-    with open(MERGED_JSON, "w") as f:
-        json.dump(pack, f, indent=2)
+    with run.step("dedupe") as st:
+        st.rows_in = len(out_df)
+        out_df = out_df[~out_df[KEY].duplicated()]
+
+        # enforce cap
+        capped = []
+        for iid, g in out_df.groupby("intent_id", sort=False, observed=True):
+            capped.append(g.head(MAX_PER_INTENT))
+        out_df = pd.concat(capped)
+        st.rows_out = len(out_df)
 
     # Print before/after for targets
-    after_counts = out_df.groupby("intent_id")["utterance"].count()
+    after_counts = out_df.groupby("intent_id", observed=True)["utterance"].count()
     print("Top-up complete. Counts (targets):")
     for iid, tgt in TARGETS.items():
         print(f"- {iid}: {counts.get(iid,0)} -> {int(after_counts.get(iid,0))} (target {tgt})")
+    return out_df
+
+def topup(run: RunReport):
+    if not MERGED.exists():
+        print("Merged training table not found:", MERGED)
+        return
+
+    with run.step("load") as st:
+        base_df = read_table(run.read(MERGED))
+        st.rows_out = len(base_df)
+
+    out_df = topup_targets(base_df, lambda: iter_calls(run.read(SRC, projected_bytes(SRC, COLUMNS)), COLUMNS), run)
+    if out_df is base_df:
+        return
+
+    with run.step("write") as st:
+        run.wrote(write_table(out_df, MERGED))
+        st.rows_out = len(out_df)
 
 if __name__ == "__main__":
     main()
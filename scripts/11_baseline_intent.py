@@ -1,32 +1,310 @@
 from pathlib import Path
+import argparse, itertools, json, platform, tempfile, time
+from datetime import datetime, timezone
+import joblib
+import sklearn
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+import pyarrow.parquet as pq
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import SGDClassifier
 from sklearn.svm import LinearSVC
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, accuracy_score
+from instrument import RunReport, peak_rss_mb
+from paths import PROC, TRAIN_DIR
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
-TRAIN_DIR = PROC / "training"
+TRAIN = TRAIN_DIR / "intent_train.parquet"
+DEV   = TRAIN_DIR / "intent_dev.parquet"
+BENCH_DIR = PROC / "benchmarks"
 
-TRAIN = TRAIN_DIR / "intent_train.csv"
-DEV   = TRAIN_DIR / "intent_dev.csv"
+# Streaming (hashed) mode: fixed-size feature space, rows read from disk in chunks
+CHUNKSIZE = 5000
+N_FEATURES = 2 ** 20
+EPOCHS = 5
+SHUFFLE_CHUNKS = 20   # rows are reshuffled within windows of this many chunks (the whole file when it fits)
+SEED = 42
 
-def main():
-    tr = pd.read_csv(TRAIN)
-    dv = pd.read_csv(DEV)
+# Benchmark mode
+BATCH_SIZES = [1, 8, 32, 128, 512]
+LATENCY_SAMPLES = 500
+
+def iter_chunks(path: Path, chunksize: int, usecols=("intent_id", "utterance"), rng=None):
+    """Yield DataFrame chunks from a Parquet, CSV or JSONL file (e.g. seed_harvest.parquet).
+    With `rng`, Parquet row groups are read in random order."""
+    usecols = list(usecols)
+    if path.suffix == ".parquet":
+        pf = pq.ParquetFile(path)
+        groups = rng.permutation(pf.num_row_groups).tolist() if rng is not None else None
+        reader = (b.to_pandas() for b in pf.iter_batches(batch_size=chunksize, row_groups=groups, columns=usecols))
+    elif path.suffix == ".jsonl":
+        reader = pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        reader = pd.read_csv(path, chunksize=chunksize, usecols=usecols)
+    for chunk in reader:
+        chunk = chunk.dropna(subset=usecols)
+        if len(chunk):
+            yield chunk[usecols].astype(str)
+
+def iter_shuffled(path: Path, chunksize: int, rng, window: int = SHUFFLE_CHUNKS):
+    """
+    Training chunks for one epoch, rows shuffled within and across chunks.
+    The merged tables are sorted by intent, so unshuffled chunks hold one or two intents
+    each; rows are pooled `window` chunks at a time to keep memory bounded.
+    """
+    chunks = iter_chunks(path, chunksize, rng=rng)
+    while pool := list(itertools.islice(chunks, window)):
+        pool = pd.concat(pool, ignore_index=True)
+        pool = pool.iloc[rng.permutation(len(pool))]
+        for i in range(0, len(pool), chunksize):
+            yield pool.iloc[i:i + chunksize]
+
+def read_split(path: Path) -> pd.DataFrame:
+    """Whole train/dev table (Parquet canonical; CSV/JSONL exports also accepted)."""
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=["intent_id", "utterance"]).dropna().astype(str)
+    return pd.concat(iter_chunks(path, CHUNKSIZE), ignore_index=True)
+
+def run_baseline(train_path: Path, dev_path: Path) -> dict:
+    tr = read_split(train_path)
+    dv = read_split(dev_path)
 
     # Simple baseline
     pipe = Pipeline([
         ("tfidf", TfidfVectorizer(ngram_range=(1,2), min_df=2, max_df=0.9)),
         ("clf", LinearSVC(random_state=42))
     ])
+    t0 = time.perf_counter()
     pipe.fit(tr["utterance"], tr["intent_id"])
+    fit_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
     preds = pipe.predict(dv["utterance"])
+    pred_s = time.perf_counter() - t0
+
+    return {
+        "mode": "baseline",
+        "model": pipe,
+        "y_true": dv["intent_id"].tolist(),
+        "y_pred": list(preds),
+        "train_rows": len(tr),
+        "fit_s": fit_s,
+        "pred_s": pred_s,
+    }
+
+def run_hashed(train_path: Path, dev_path: Path, chunksize: int = CHUNKSIZE,
+               n_features: int = N_FEATURES, epochs: int = EPOCHS) -> dict:
+    """
+    Out-of-core variant: HashingVectorizer has no vocabulary to fit, so every chunk
+    can be featurized independently and fed to SGDClassifier.partial_fit.
+    Memory is bounded by `chunksize`, not by the size of the training file.
+    """
+    vec = HashingVectorizer(ngram_range=(1,2), n_features=n_features,
+                            alternate_sign=False, norm="l2")
+    clf = SGDClassifier(loss="hinge", alpha=1e-5, random_state=SEED)
+    rng = np.random.default_rng(SEED)
+
+    # partial_fit needs the full label set up front: cheap pass over the label column only
+    classes = set()
+    for chunk in iter_chunks(train_path, chunksize, usecols=("intent_id",)):
+        classes.update(chunk["intent_id"].unique())
+    classes = np.array(sorted(classes))
+
+    rows = 0
+    t0 = time.perf_counter()
+    for epoch in range(epochs):
+        for chunk in iter_shuffled(train_path, chunksize, rng):
+            X = vec.transform(chunk["utterance"])
+            clf.partial_fit(X, chunk["intent_id"], classes=classes)
+            if epoch == 0:
+                rows += len(chunk)
+    fit_s = time.perf_counter() - t0
+
+    y_true, y_pred = [], []
+    t0 = time.perf_counter()
+    for chunk in iter_chunks(dev_path, chunksize):
+        y_true.extend(chunk["intent_id"].tolist())
+        y_pred.extend(clf.predict(vec.transform(chunk["utterance"])))
+    pred_s = time.perf_counter() - t0
+
+    return {
+        "mode": "hashed",
+        "model": Pipeline([("hash", vec), ("clf", clf)]),
+        "y_true": y_true,
+        "y_pred": y_pred,
+        "train_rows": rows,
+        "fit_s": fit_s,
+        "pred_s": pred_s,
+    }
+
+def export_model(res: dict, path: Path):
+    if not path:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    joblib.dump(res["model"], path)
+    print("Exported model ->", path)
+
+def summarize(res: dict) -> dict:
+    n_dev = len(res["y_true"])
+    return {
+        "mode": res["mode"],
+        "accuracy": round(accuracy_score(res["y_true"], res["y_pred"]), 4),
+        "train_rows": res["train_rows"],
+        "fit_s": round(res["fit_s"], 3),
+        "train_rows_per_s": round(res["train_rows"] / res["fit_s"], 1) if res["fit_s"] else None,
+        "predict_rows_per_s": round(n_dev / res["pred_s"], 1) if res["pred_s"] else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def percentiles_ms(samples) -> dict:
+    arr = np.asarray(samples) * 1000.0
+    return {f"p{q}": round(float(np.percentile(arr, q)), 4) for q in (50, 95, 99)}
+
+def bench_model(model, utterances: list, batch_sizes=BATCH_SIZES, n_latency=LATENCY_SAMPLES) -> dict:
+    """Single-utterance latency percentiles and batched throughput for a fitted pipeline."""
+    # warm-up so lazy allocations do not land in the first sample
+    model.predict(utterances[:1])
+
+    lat = []
+    for i in range(n_latency):
+        u = utterances[i % len(utterances)]
+        t0 = time.perf_counter()
+        model.predict([u])
+        lat.append(time.perf_counter() - t0)
+
+    throughput = {}
+    for bs in batch_sizes:
+        # repeat the dev set until every batch size sees at least a few full batches
+        reps = max(1, (bs * 5) // len(utterances) + 1)
+        pool = (utterances * reps)
+        n_batches = max(1, len(pool) // bs)
+        t0 = time.perf_counter()
+        for b in range(n_batches):
+            model.predict(pool[b * bs:(b + 1) * bs])
+        el = time.perf_counter() - t0
+        throughput[str(bs)] = round(n_batches * bs / el, 1) if el else None
+
+    return {
+        "single_latency_ms": percentiles_ms(lat),
+        "latency_samples": n_latency,
+        "throughput_rows_per_s": throughput,
+    }
+
+def run_benchmark(args) -> dict:
+    dv = read_split(args.dev)
+    utterances = dv["utterance"].astype(str).tolist()
+    results = []
+
+    # In-process pipelines: trained here (fit_s), then cold-loaded from a joblib round trip
+    # like the exported artifacts below, so cold_load_s is deserialization only
+    for mode in args.bench_modes:
+        res = run_baseline(args.train, args.dev) if mode == "baseline" else \
+            run_hashed(args.train, args.dev, args.chunksize, args.n_features, args.epochs)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / f"{mode}.joblib"
+            joblib.dump(res["model"], path)
+            t0 = time.perf_counter()
+            model = joblib.load(path)
+            cold = time.perf_counter() - t0
+            size = path.stat().st_size
+        entry = {"model": mode, "format": "in_process", "cold_load_s": round(cold, 4), "size_bytes": size,
+                 "fit_s": round(res["fit_s"], 4),
+                 "accuracy": round(accuracy_score(res["y_true"], res["y_pred"]), 4)}
+        entry.update(bench_model(model, utterances, args.batch_sizes, args.latency_samples))
+        results.append(entry)
+
+    # Exported artifacts: cold load is deserialization only
+    for path in args.model:
+        t0 = time.perf_counter()
+        model = joblib.load(path)
+        cold = time.perf_counter() - t0
+        entry = {"model": str(path), "format": path.suffix.lstrip(".") or "joblib",
+                 "cold_load_s": round(cold, 4), "size_bytes": path.stat().st_size,
+                 "accuracy": round(accuracy_score(dv["intent_id"].astype(str), model.predict(utterances)), 4)}
+        entry.update(bench_model(model, utterances, args.batch_sizes, args.latency_samples))
+        results.append(entry)
+
+    return {
+        "created_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "train": str(args.train),
+        "dev": str(args.dev),
+        "dev_rows": len(utterances),
+        "env": {"python": platform.python_version(), "sklearn": sklearn.__version__,
+                "machine": platform.machine(), "processor": platform.processor()},
+        "results": results,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Baseline intent classifier.")
+    ap.add_argument("--mode", choices=["baseline", "hashed", "compare"], default="baseline",
+                    help="baseline: TF-IDF + LinearSVC in memory; hashed: streaming HashingVectorizer + "
+                         "SGD partial_fit; compare: run both and print a side-by-side table")
+    ap.add_argument("--train", type=Path, default=TRAIN, help="training Parquet/CSV/JSONL (hashed mode streams it)")
+    ap.add_argument("--dev", type=Path, default=DEV)
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    ap.add_argument("--n-features", type=int, default=N_FEATURES)
+    ap.add_argument("--epochs", type=int, default=EPOCHS)
+    ap.add_argument("--export", type=Path, help="save the fitted pipeline with joblib (baseline/hashed modes)")
+    ap.add_argument("--benchmark", action="store_true",
+                    help="measure cold-load time, single-utterance latency and batched throughput")
+    ap.add_argument("--bench-modes", nargs="*", choices=["baseline", "hashed"], default=["baseline"],
+                    help="in-process pipelines to benchmark")
+    ap.add_argument("--model", type=Path, nargs="*", default=[], help="exported model files to benchmark")
+    ap.add_argument("--batch-sizes", type=int, nargs="*", default=BATCH_SIZES)
+    ap.add_argument("--latency-samples", type=int, default=LATENCY_SAMPLES)
+    ap.add_argument("--bench-out", type=Path, help="JSON output (default: data/processed/benchmarks/...)")
+    args = ap.parse_args()
+
+    with RunReport("11_baseline_intent") as run:
+        dispatch(args, run)
+
+def dispatch(args, run: RunReport):
+    run.read(args.train)
+    run.read(args.dev)
+
+    if args.benchmark:
+        with run.step("benchmark"):
+            report = run_benchmark(args)
+        out = args.bench_out or BENCH_DIR / f"intent_inference_{datetime.now():%Y%m%d_%H%M%S}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        for r in report["results"]:
+            print(f"{r['model']:>24s} [{r['format']}] cold={r['cold_load_s']}s "
+                  f"p50/p95/p99={r['single_latency_ms']} ms throughput={r['throughput_rows_per_s']}")
+        print("Wrote:", out)
+        return
+
+    if args.mode == "baseline":
+        with run.step("train") as st:
+            res = run_baseline(args.train, args.dev)
+            st.rows_in = res["train_rows"]
+        run.note(**{k: v for k, v in summarize(res).items() if k != "mode"})
+        export_model(res, args.export)
+        print("Accuracy:", round(accuracy_score(res["y_true"], res["y_pred"]), 4))
+        print("\nPer-class report:")
+        print(classification_report(res["y_true"], res["y_pred"], digits=3))
+        return
+
+    if args.mode == "hashed":
+        with run.step("train") as st:
+            res = run_hashed(args.train, args.dev, args.chunksize, args.n_features, args.epochs)
+            st.rows_in = res["train_rows"]
+        run.note(**{k: v for k, v in summarize(res).items() if k != "mode"})
+        export_model(res, args.export)
+        print("Accuracy:", round(accuracy_score(res["y_true"], res["y_pred"]), 4))
+        print("\nPer-class report:")
+        print(classification_report(res["y_true"], res["y_pred"], digits=3, zero_division=0))
+        print(pd.Series(summarize(res)).to_string())
+        return
 
-    print("Accuracy:", round(accuracy_score(dv["intent_id"], preds), 4))
-    print("\nPer-class report:")
-    print(classification_report(dv["intent_id"], preds, digits=3))
+    # compare: hashed first so its peak RSS is not inflated by the in-memory baseline
+    with run.step("train_hashed"):
+        summary = [summarize(run_hashed(args.train, args.dev, args.chunksize, args.n_features, args.epochs))]
+    with run.step("train_baseline"):
+        summary.append(summarize(run_baseline(args.train, args.dev)))
+    run.note(compare=summary)
+    print(pd.DataFrame(summary).set_index("mode").T.to_string())
 
 if __name__ == "__main__":
     main()
@@ -1,49 +1,65 @@
-from pathlib import Path
 import pandas as pd
 import json
 from sklearn.model_selection import train_test_split
+from instrument import RunReport, NullReport
+from training import read_table, write_table
+from tables import as_text
+from paths import PROC, TRAIN_DIR
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
-TRAIN_DIR = PROC / "training"
-TRAIN_DIR.mkdir(parents=True, exist_ok=True)
-
-MERGED = TRAIN_DIR / "utterances_answerable.merged.csv"
+MERGED = TRAIN_DIR / "utterances_answerable.merged.parquet"
 GOLD = PROC / "gold_answers_todo.csv"
 
-OUT_INTENT_TRAIN = TRAIN_DIR / "intent_train.csv"
-OUT_INTENT_DEV   = TRAIN_DIR / "intent_dev.csv"
+OUT_INTENT_TRAIN = TRAIN_DIR / "intent_train.parquet"
+OUT_INTENT_DEV   = TRAIN_DIR / "intent_dev.parquet"
 OUT_FAQ_EVAL     = TRAIN_DIR / "faq_eval.jsonl"
 
 def main():
-    df = pd.read_csv(MERGED)  # columns: intent_id, intent_name, utterance
+    TRAIN_DIR.mkdir(parents=True, exist_ok=True)
+    with RunReport("11_build_eval_sets") as run:
+        build(run)
+
+def split_eval(df: pd.DataFrame, run: RunReport = None):
+    """Merged utterances -> stratified (train_df, dev_df)."""
+    run = run or NullReport()
     # drop empties
-    df = df.dropna(subset=["intent_id","utterance"])
-    df["intent_id"] = df["intent_id"].astype(str).str.strip()
-    df["utterance"] = df["utterance"].astype(str).str.strip()
-    df = df[df["utterance"].str.len() > 2]
+    with run.step("filter") as st:
+        st.rows_in = len(df)
+        df = df.dropna(subset=["intent_id","utterance"])
+        df["intent_id"] = as_text(df["intent_id"]).str.strip()
+        df["utterance"] = as_text(df["utterance"]).str.strip()
+        df = df[df["utterance"].str.len() > 2]
+        st.rows_out = len(df)
 
     # stratified split
-    train_df, dev_df = train_test_split(
-        df, test_size=0.2, random_state=42, stratify=df["intent_id"]
-    )
-    train_df.to_csv(OUT_INTENT_TRAIN, index=False)
-    dev_df.to_csv(OUT_INTENT_DEV, index=False)
-
-    # FAQ eval pack from gold answers
-    gold = pd.read_csv(GOLD)
+    with run.step("split"):
+        train_df, dev_df = train_test_split(
+            df, test_size=0.2, random_state=42, stratify=df["intent_id"]
+        )
+    return train_df, dev_df
+
+def faq_eval_records(gold: pd.DataFrame) -> list:
+    """FAQ eval pack from gold answers (rows with a filled-in answer only)."""
     gold = gold.fillna("")
     keep = gold[gold["gold_answer"].str.strip() != ""]
-    with open(OUT_FAQ_EVAL, "w") as f:
-        for r in keep.itertuples(index=False):
-            rec = {
-                "intent_id": r.intent_id,
-                "question": str(r.sample_question).strip(),
-                "gold_answer": str(r.gold_answer).strip(),
-                "source_refs": str(r.source_refs).strip(),
-                "policy_notes": str(r.policy_notes).strip()
-            }
-            f.write(json.dumps(rec) + "\n")
+    return [{
+        "intent_id": r.intent_id,
+        "question": str(r.sample_question).strip(),
+        "gold_answer": str(r.gold_answer).strip(),
+        "source_refs": str(r.source_refs).strip(),
+        "policy_notes": str(r.policy_notes).strip()
+    } for r in keep.itertuples(index=False)]
+
+def write_eval_sets(train_df: pd.DataFrame, dev_df: pd.DataFrame, faq: list, run: RunReport):
+    with run.step("write") as st:
+        write_table(train_df, OUT_INTENT_TRAIN)
+        write_table(dev_df, OUT_INTENT_DEV)
+        with open(OUT_FAQ_EVAL, "w") as f:
+            for rec in faq:
+                f.write(json.dumps(rec) + "\n")
+        run.wrote(OUT_INTENT_TRAIN)
+        run.wrote(OUT_INTENT_DEV)
+        run.wrote(OUT_FAQ_EVAL)
+        st.rows_out = len(train_df) + len(dev_df)
 
     print("Wrote:", OUT_INTENT_TRAIN)
     print("Wrote:", OUT_INTENT_DEV)
@@ -53,5 +69,13 @@ def main():
     print("\nPer-intent counts (dev):")
     print(dev_df.groupby("intent_id").size().sort_values(ascending=False).to_string())
 
+def build(run: RunReport):
+    with run.step("load") as st:
+        df = read_table(run.read(MERGED))  # columns: row_id, intent_id, intent_name, utterance, source_zip, file_name, turn_index
+        gold = pd.read_csv(run.read(GOLD))
+        st.rows_out = len(df)
+    train_df, dev_df = split_eval(df, run)
+    write_eval_sets(train_df, dev_df, faq_eval_records(gold), run)
+
 if __name__ == "__main__":
     main()
@@ -1,48 +1,55 @@
-from pathlib import Path
 import pandas as pd
-import re
+from instrument import RunReport
+from training import read_table
+from tables import as_text, with_key, KEY
+from textnorm import placeholder_counts
+from paths import TRAIN_DIR
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
-TRAIN_DIR = PROC / "training"
-
-TRAIN = TRAIN_DIR / "intent_train.csv"
-DEV   = TRAIN_DIR / "intent_dev.csv"
+TRAIN = TRAIN_DIR / "intent_train.parquet"
+DEV   = TRAIN_DIR / "intent_dev.parquet"
 
 def main():
-    tr = pd.read_csv(TRAIN)
-    dv = pd.read_csv(DEV)
+    with RunReport("11_quality_report") as run:
+        report(run)
+
+def report(run: RunReport):
+    with run.step("load") as st:
+        tr = read_table(run.read(TRAIN))
+        dv = read_table(run.read(DEV))
+        st.rows_out = len(tr) + len(dv)
 
     # Basic counts
     print("Train rows:", len(tr), "Dev rows:", len(dv))
     print("\nPer-intent counts (train):")
-    print(tr.groupby("intent_id").size().sort_values(ascending=False).to_string())
+    print(tr.groupby("intent_id", observed=True).size().sort_values(ascending=False).to_string())
     print("\nPer-intent counts (dev):")
-    print(dv.groupby("intent_id").size().sort_values(ascending=False).to_string())
+    print(dv.groupby("intent_id", observed=True).size().sort_values(ascending=False).to_string())
 
     # Question/statement mix
     for df, name in [(tr,"train"),(dv,"dev")]:
-        df["is_q"] = df["utterance"].astype(str).str.strip().str.endswith("?")
-        mix = df.groupby("intent_id")["is_q"].mean().round(3)
+        df["is_q"] = as_text(df["utterance"]).str.strip().str.endswith("?")
+        mix = df.groupby("intent_id", observed=True)["is_q"].mean().round(3)
         print(f"\nQuestion ratio by intent ({name}):")
         print(mix.to_string())
 
     # Placeholder check: ensure {} style, no [] leftovers
-    square = (tr["utterance"].str.contains(r"\[.+\]", regex=True).sum()
-              + dv["utterance"].str.contains(r"\[.+\]", regex=True).sum())
-    braces = (tr["utterance"].str.contains(r"\{(person_name|location|phone_number|email_address|money_amount|date|time|occupation)\}", case=False).sum()
-              + dv["utterance"].str.contains(r"\{(person_name|location|phone_number|email_address|money_amount|date|time|occupation)\}", case=False).sum())
+    counts = placeholder_counts(pd.concat([tr["utterance"], dv["utterance"]], ignore_index=True))
+    square, braces = counts["square"], counts["braces"]
     print(f"\nPlaceholders — square brackets left: {square}, brace placeholders found: {braces}")
 
-    # Leakage: identical utterance appearing in both train and dev for same intent
-    tr["key"] = tr["intent_id"].astype(str) + "||" + tr["utterance"].astype(str).str.lower().str.strip()
-    dv["key"] = dv["intent_id"].astype(str) + "||" + dv["utterance"].astype(str).str.lower().str.strip()
-    leaked = set(tr["key"]).intersection(set(dv["key"]))
+    # Leakage: identical utterance appearing in both train and dev for same intent (a join on the
+    # stored utterance keys)
+    with run.step("dedupe") as st:
+        st.rows_in = len(tr) + len(dv)
+        tr, dv = with_key(tr), with_key(dv)
+        leaked = dv[dv[KEY].isin(tr[KEY])].drop_duplicates(KEY)
+        st.rows_out = len(leaked)
+    run.note(square_placeholders=int(square), brace_placeholders=int(braces), leaked=len(leaked))
     print("\nLeakage (exact duplicates across splits):", len(leaked))
-    if leaked:
+    if len(leaked):
         print("Sample leaks:")
-        for k in list(leaked)[:10]:
-            print(" -", k)
+        for r in leaked.head(10).itertuples(index=False):
+            print(" -", f"{r.intent_id}||{str(r.utterance).lower().strip()}")
 
 if __name__ == "__main__":
     main()
@@ -1,13 +1,12 @@
-from pathlib import Path
+import argparse
 import pandas as pd
-import subprocess
 import sys
+from instrument import RunReport, NullReport
+from training import read_table, write_table, split_eval, stage
+from tables import dedupe_key, KEY
+from paths import TRAIN_DIR
 
-BASE = Path(__file__).resolve().parents[1]
-PROC = BASE / "data" / "processed"
-TRAIN_DIR = PROC / "training"
-
-MERGED = TRAIN_DIR / "utterances_answerable.merged.csv"
+MERGED = TRAIN_DIR / "utterances_answerable.merged.parquet"
 
 # ✅ Whitelist of answerable intents to KEEP
 WHITELIST = {
@@ -30,43 +29,75 @@ MIN_PER_INTENT = 50   # ensure coverage
 MAX_PER_INTENT = 150  # keep balance
 
 def main():
-    if not MERGED.exists():
-        print("Missing:", MERGED)
-        sys.exit(1)
-
-    df = pd.read_csv(MERGED)
-    before = len(df)
+    ap = argparse.ArgumentParser(description="Keep the whitelisted intents of the merged table (de-duplicated, "
+                                             "capped per intent), then rebuild the train/dev splits.")
+    ap.add_argument("--no-rebuild", action="store_true",
+                    help="leave the splits alone (the pipeline runner schedules 11_build_eval_sets itself)")
+    args = ap.parse_args()
+    with RunReport("11c_enforce_answerable_whitelist") as run:
+        df = enforce(run)
+    if not args.no_rebuild:
+        rebuild_splits(df)
 
+def enforce_whitelist(df: pd.DataFrame, run: RunReport = None) -> pd.DataFrame:
+    """Keep whitelisted intents only, de-dup and cap per intent."""
+    run = run or NullReport()
     # Filter to whitelist
-    df = df[df["intent_id"].isin(WHITELIST)].copy()
+    with run.step("filter") as st:
+        st.rows_in = len(df)
+        df = df[df["intent_id"].isin(WHITELIST)].copy()
+        st.rows_out = len(df)
     # De-dup
-    df["key"] = df["intent_id"].astype(str) + "||" + df["utterance"].astype(str).str.lower().str.strip()
-    df = df.drop_duplicates("key").drop(columns=["key"])
+    with run.step("dedupe") as st:
+        st.rows_in = len(df)
+        df[KEY] = dedupe_key(df)
+        df = df[~df[KEY].duplicated()]
 
-    # Enforce caps
-    capped = []
-    for iid, g in df.groupby("intent_id"):
-        g = g.head(MAX_PER_INTENT)
-        capped.append(g)
-    df = pd.concat(capped).reset_index(drop=True)
+        # Enforce caps
+        capped = []
+        for iid, g in df.groupby("intent_id", observed=True):
+            g = g.head(MAX_PER_INTENT)
+            capped.append(g)
+        df = pd.concat(capped).reset_index(drop=True)
+        st.rows_out = len(df)
 
     # Verify mins (warn if any fall short)
-    counts = df.groupby("intent_id")["utterance"].count().to_dict()
+    counts = df.groupby("intent_id", observed=True)["utterance"].count().to_dict()
     low = {iid:c for iid,c in counts.items() if c < MIN_PER_INTENT}
     if low:
         print("⚠️ These intents are below the minimum:", low)
         print("Run 10d_topup_targets.py to raise them, then re-run this script.")
     else:
         print("All intents meet the minimum of", MIN_PER_INTENT)
+    return df
+
+def enforce(run: RunReport) -> pd.DataFrame:
+    if not MERGED.exists():
+        print("Missing:", MERGED)
+        sys.exit(1)
+
+    with run.step("load") as st:
+        df = read_table(run.read(MERGED))
+        st.rows_out = len(df)
+    before = len(df)
+    df = enforce_whitelist(df, run)
 
-    df.to_csv(MERGED, index=False)
+    with run.step("write") as st:
+        run.wrote(write_table(df, MERGED))
+        st.rows_out = len(df)
     print(f"Saved filtered training set -> {MERGED} | rows {before} -> {len(df)}")
+    return df
 
-    # Rebuild splits
-    ret = subprocess.call([sys.executable, str(BASE / "scripts" / "11_build_eval_sets.py")])
-    if ret != 0:
-        print("Failed to rebuild eval sets.")
-        sys.exit(ret)
+def rebuild_splits(df: pd.DataFrame):
+    """11_build_eval_sets on the filtered table, in this process (its own run report, as in run_chain)."""
+    m11e = stage("11_build_eval_sets")
+    with RunReport("11_build_eval_sets") as run:
+        with run.step("load") as st:
+            gold = pd.read_csv(run.read(m11e.GOLD))
+            st.rows_out = len(df)
+        train_df, dev_df = split_eval(df, run)
+        m11e.write_eval_sets(train_df, dev_df, m11e.faq_eval_records(gold), run)
+        run.note(chained=True)
     print("Rebuilt train/dev sets.")
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+# cc-banking-intents/scripts/bench_stages.py
+#
+# End-to-end stage benchmark on a synthetic corpus.
+# Copies scripts/ + configs/ into a scratch workspace (every stage resolves paths relative
+# to its own file), generates the corpus there, runs the pipeline and records wall time,
+# peak RSS and rows/sec per stage. Results are compared against a stored baseline run.
+
+import argparse, json, os, platform, shutil, subprocess, sys, time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from bench_synth_corpus import generate
+
+BASE = Path(__file__).resolve().parents[1]
+BENCH_DIR = BASE / "data" / "bench"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# (label, script, rows-in artifact, rows-out artifact, reported)
+# Artifacts are relative to <workspace>/data/processed; "@corpus" = number of generated calls.
+# Unreported stages are run only because later stages need their outputs.
+STAGES = [
+    ("03",  "03_build_banking_subset.py",   "@corpus",                               "banking_calls.parquet",                          True),
+    ("04",  "04_eda_and_qc.py",             "banking_calls.parquet",                 "banking_spotcheck_200.csv",                      True),
+    ("05",  "05_refine_banking_filter.py",  "banking_calls.parquet",                 "banking_calls_refined.parquet",                  True),
+    ("06",  "06_intent_discovery_tfidf.py", "banking_calls_refined.parquet",         "intent_clusters_tfidf.csv",                      True),
+    ("07",  "07_curate_intents.py",         None,                                    None,                                             False),
+    ("08",  "08_build_gold_scaffold.py",    None,                                    None,                                             False),
+    ("10",  "10_export_training_data.py",   None,                                    None,                                             False),
+    ("10b", "10b_seed_harvest.py",          "banking_calls_refined.parquet",         "training/seed_harvest.parquet",                  True),
+    ("10c", "10c_merge_seeded.py",          "training/seed_harvest.parquet",         "training/utterances_answerable.merged.parquet",  True),
+    ("10d", "10d_topup_targets.py",         "banking_calls_refined.parquet",         "training/utterances_answerable.merged.parquet",  True),
+    ("11e", "11_build_eval_sets.py",        None,                                    None,                                             False),
+    ("11",  "11_baseline_intent.py",        "training/intent_train.parquet",         None,                                             True),
+]
+
+def count_rows(path: Path):
+    if not path.exists():
+        return None
+    if path.suffix == ".parquet":
+        return pq.read_metadata(path).num_rows
+    if path.suffix == ".jsonl":
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+    if path.suffix == ".csv":
+        return len(pd.read_csv(path))
+    return None
+
+def run_stage(ws: Path, script: str, env: dict, log_path: Path) -> dict:
+    """Run one stage in a child process; wait4 gives that child's own peak RSS."""
+    with open(log_path, "w") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, str(ws / "scripts" / script)],
+                                cwd=ws, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, ru = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "wall_s": round(wall, 3),
+        "cpu_s": round(ru.ru_utime + ru.ru_stime, 3),
+        "peak_rss_mb": round(ru.ru_maxrss / 1024.0, 1),
+        "exit_code": proc.returncode,
+    }
+
+def prepare_workspace(ws: Path, n_calls: int, calls_per_zip: int, seed: int) -> Path:
+    if ws.exists():
+        shutil.rmtree(ws)
+    shutil.copytree(BASE / "scripts", ws / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(BASE / "configs", ws / "configs")
+    raw = ws / "raw"
+    generate(raw, n_calls, calls_per_zip, seed)
+    return raw
+
+def run_suite(n_calls: int, ws: Path, calls_per_zip: int, seed: int, dtypes: str = "arrow") -> dict:
+    raw = prepare_workspace(ws, n_calls, calls_per_zip, seed)
+    proc_dir = ws / "data" / "processed"
+    (ws / "logs").mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, CCBI_ZIP_DIR=str(raw), CCBI_DTYPES=dtypes, PYTHONUNBUFFERED="1")
+
+    stages = {}
+    for label, script, src, dst, reported in STAGES:
+        print(f"[{label}] {script} ...", flush=True)
+        res = run_stage(ws, script, env, ws / "logs" / f"bench_{label}.log")
+        rows_in = n_calls if src == "@corpus" else (count_rows(proc_dir / src) if src else None)
+        rows_out = count_rows(proc_dir / dst) if dst else None
+        res.update({
+            "script": script,
+            "rows_in": rows_in,
+            "rows_out": rows_out,
+            "rows_per_s": round(rows_in / res["wall_s"], 1) if rows_in and res["wall_s"] else None,
+            "reported": reported,
+        })
+        stages[label] = res
+        if res["exit_code"] != 0:
+            print(f"  stage {label} failed (exit {res['exit_code']}); see {ws / 'logs'}/bench_{label}.log")
+            break
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "calls": n_calls,
+        "calls_per_zip": calls_per_zip,
+        "seed": seed,
+        "dtypes": dtypes,
+        "env": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "stages": stages,
+    }
+
+def compare(cur: dict, base: dict) -> pd.DataFrame:
+    rows = []
+    for label, r in cur["stages"].items():
+        if not r["reported"]:
+            continue
+        b = base.get("stages", {}).get(label, {}) if base else {}
+        row = {"stage": label, "wall_s": r["wall_s"], "peak_rss_mb": r["peak_rss_mb"],
+               "rows_in": r["rows_in"], "rows_per_s": r["rows_per_s"]}
+        for k in ("wall_s", "peak_rss_mb", "rows_per_s"):
+            if b.get(k) and r.get(k) is not None:
+                row[f"{k}_base"] = b[k]
+                row[f"{k}_delta%"] = round(100.0 * (r[k] - b[k]) / b[k], 1)
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("stage")
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark pipeline stages on a synthetic corpus.")
+    ap.add_argument("--calls", type=int, default=1000, help="corpus size (1k .. 1M calls)")
+    ap.add_argument("--calls-per-zip", type=int, default=10_000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workspace", type=Path, help="scratch dir (default: data/bench/ws_<calls>)")
+    ap.add_argument("--baseline", type=Path, help="baseline JSON to compare against "
+                                                  "(default: data/bench/baseline_<calls>.json if present)")
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    ap.add_argument("--dtypes", choices=["arrow", "object"], default="arrow",
+                    help="string dtype policy for the stages (object = Python-object strings, see tables.py)")
+    args = ap.parse_args()
+
+    ws = args.workspace or BENCH_DIR / f"ws_{args.calls}"
+    result = run_suite(args.calls, ws, args.calls_per_zip, args.seed, args.dtypes)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = RESULTS_DIR / f"stages_{args.calls}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print("Wrote:", out)
+
+    baseline_path = args.baseline or BENCH_DIR / f"baseline_{args.calls}.json"
+    base = None
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            base = json.load(f)
+        print("Comparing against baseline:", baseline_path,
+              f"({base.get('created')}, dtypes={base.get('dtypes', 'object')})")
+    print(compare(result, base).to_string())
+
+    if args.save_baseline:
+        shutil.copyfile(out, baseline_path)
+        print("Saved baseline ->", baseline_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# cc-banking-intents/scripts/bench_synth_corpus.py
+#
+# Synthetic call-center corpus for benchmarks: ZIPs of per-call JSON shaped like the
+# AIxBlock archives (speaker-labelled turns, [PERSON_NAME]-style placeholders), so every
+# stage can run without the Hugging Face download.
+
+import argparse, json, random, zipfile
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+OUT_DIR = BASE / "data" / "bench" / "raw"
+
+CALLS_PER_ZIP = 10_000
+BANKING_SHARE = 0.6        # remaining calls are telecom/home-service noise
+
+PLACEHOLDERS = ["[PERSON_NAME]", "[LOCATION]", "[PHONE_NUMBER]", "[EMAIL_ADDRESS]",
+                "[MONEY_AMOUNT]", "[DATE]", "[TIME]", "[OCCUPATION]"]
+
+# Customer phrasings per banking intent; {ph} is filled with a random placeholder
+BANKING_LINES = {
+    "card_lost_or_stolen": [
+        "I lost my debit card yesterday and need to freeze it.",
+        "My credit card was stolen at {ph}, can you block the card?",
+        "Can you lock my card, I think I lost it?",
+    ],
+    "card_charge_dispute_or_fraud": [
+        "There is a charge on my account I did not make, I want to dispute it.",
+        "I see an unauthorized transaction for {ph} on my card.",
+        "I think there is fraud on my credit card statement.",
+    ],
+    "balance_or_credit_limit": [
+        "What is my available balance on my checking account?",
+        "Can I get a credit limit increase on my card?",
+        "I need to know the balance on my savings account.",
+    ],
+    "request_statement_or_document": [
+        "Can you mail me my monthly statement from {ph}?",
+        "I need a PDF copy of my bank statement.",
+        "Where can I download my account statement?",
+    ],
+    "money_transfer_wire_ach_zelle": [
+        "I want to send a wire transfer of {ph} to my brother.",
+        "My Zelle transfer did not go through.",
+        "How long does an ACH transfer take to post to my account?",
+    ],
+    "online_banking_login_reset": [
+        "I forgot my online banking password and I'm locked out.",
+        "Can you reset my login, my passcode is not working?",
+        "I can't log in to the mobile banking app.",
+    ],
+    "fees_or_overdraft": [
+        "Why was I charged an overdraft fee on my checking account?",
+        "Can you waive the late fee on my account?",
+        "I got a maintenance fee I don't understand.",
+    ],
+    "loan_or_mortgage_info": [
+        "What is the interest rate on a mortgage refinance?",
+        "I'd like to apply for a personal loan.",
+        "When is my loan payment due, my name is {ph}?",
+    ],
+    "direct_deposit_setup_or_issue": [
+        "I need my routing number to set up direct deposit.",
+        "My payroll direct deposit from {ph} has not shown up.",
+        "How do I set up direct deposit for my paycheck?",
+    ],
+    "bill_pay_or_autopay_issue": [
+        "My autopay payment did not go through this month.",
+        "How do I schedule a bill pay payment for {ph}?",
+        "I want to cancel autopay on my credit card.",
+    ],
+    "profile_or_contact_update": [
+        "I need to update my address on my account to {ph}.",
+        "Can I change my phone number on file to {ph}?",
+        "How do I update my email address for my bank account?",
+    ],
+    "billing_zip_verification": [
+        "What billing zip code is on the card, I moved to {ph}?",
+        "I need to verify my zip for my debit card purchase.",
+    ],
+}
+
+NOISE_LINES = [
+    "My internet has been down since {ph} and the router keeps blinking.",
+    "The technician never showed up for the cable installation.",
+    "I have a leak under the kitchen faucet.",
+    "The water heater stopped working this morning.",
+    "My wifi bandwidth is really slow in the evenings.",
+]
+
+AGENT_LINES = [
+    "Thank you for calling, my name is {ph}, how can I help you today?",
+    "Can I have your full name and the phone number on the account?",
+    "Let me pull that up for you, one moment please.",
+    "I can help you with that.",
+    "Is there anything else I can help you with today?",
+]
+
+FILLER = ["Yes, that's right.", "Okay.", "Thank you so much.", "My name is {ph}.", "Sure, it's {ph}."]
+
+def fill(rng: random.Random, line: str) -> str:
+    return line.replace("{ph}", rng.choice(PLACEHOLDERS))
+
+def make_call(rng: random.Random, idx: int) -> dict:
+    banking = rng.random() < BANKING_SHARE
+    if banking:
+        intent = rng.choice(sorted(BANKING_LINES))
+        asks = BANKING_LINES[intent]
+        domain = rng.choice(["Banking", "Finance", "Customer Service"])
+    else:
+        intent = "noise"
+        asks = NOISE_LINES
+        domain = rng.choice(["Telecom", "Home Service"])
+
+    turns = [("agent", fill(rng, rng.choice(AGENT_LINES)))]
+    for _ in range(rng.randint(2, 6)):
+        turns.append(("customer", fill(rng, rng.choice(asks) if rng.random() < 0.6 else rng.choice(FILLER))))
+        turns.append(("agent", fill(rng, rng.choice(AGENT_LINES))))
+
+    cust_label = rng.choice(["Customer", "caller", "CLIENT"])
+    agent_label = rng.choice(["Agent", "rep", "Representative"])
+    rec = {"call_id": f"synth_{idx:08d}", "domain": domain, "topic": intent}
+
+    # Mix of layouts seen in the archives: labelled turn lists and prefixed single-blob transcripts
+    if rng.random() < 0.8:
+        rec["turns"] = [{"speaker": cust_label if r == "customer" else agent_label, "text": t} for r, t in turns]
+    else:
+        rec["transcript"] = "\n".join(f"{'Customer' if r == 'customer' else 'Agent'}: {t}" for r, t in turns)
+    return rec
+
+def generate(out_dir: Path, n_calls: int, calls_per_zip: int = CALLS_PER_ZIP, seed: int = 42,
+             dup_rate: float = 0.02) -> list:
+    """Write ceil(n_calls / calls_per_zip) ZIPs of per-call JSON; returns the ZIP paths."""
+    rng = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths, recent = [], []
+    for z in range(0, n_calls, calls_per_zip):
+        zpath = out_dir / f"synthetic_calls_{z // calls_per_zip:04d}.zip"
+        with zipfile.ZipFile(zpath, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for i in range(z, min(n_calls, z + calls_per_zip)):
+                # a few exact re-recordings so dedupe has something to do
+                if recent and rng.random() < dup_rate:
+                    rec = dict(rng.choice(recent), call_id=f"synth_{i:08d}")
+                else:
+                    rec = make_call(rng, i)
+                    recent = (recent + [rec])[-100:]
+                zf.writestr(f"calls/{rec['call_id']}.json", json.dumps(rec))
+        paths.append(zpath)
+    return paths
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic call-center corpus for benchmarks.")
+    ap.add_argument("--calls", type=int, default=1000, help="number of calls (1k .. 1M)")
+    ap.add_argument("--calls-per-zip", type=int, default=CALLS_PER_ZIP)
+    ap.add_argument("--out", type=Path, default=OUT_DIR)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    paths = generate(args.out, args.calls, args.calls_per_zip, args.seed)
+    print(f"Wrote {args.calls:,} calls into {len(paths)} ZIP(s) -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# cc-banking-intents/scripts/bench_training_io.py
+#
+# Size and load time of a training table as CSV, pretty-printed JSON pack and Parquet
+# (training.write_table: dictionary-encoded intent columns + row_id), at a synthetic scale.
+#
+#   python3 scripts/bench_training_io.py --rows 200000
+
+import argparse, json, random, tempfile, time
+from pathlib import Path
+
+import pandas as pd
+
+from bench_synth_corpus import BANKING_LINES, FILLER, PLACEHOLDERS
+from training import json_pack, read_table, write_table
+
+def synth_table(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    rng = random.Random(seed)
+    intents = sorted(BANKING_LINES)
+    rows = []
+    for _ in range(n_rows):
+        iid = rng.choice(intents)
+        line = rng.choice(BANKING_LINES[iid]).replace("{ph}", rng.choice(PLACEHOLDERS))
+        # vary the text so the table is not a handful of repeated strings
+        filler = rng.choice(FILLER).replace("{ph}", rng.choice(PLACEHOLDERS))
+        line = f"{filler} {line} ref {rng.randrange(10**6)}"
+        rows.append({"intent_id": iid, "intent_name": iid.replace("_", " "), "utterance": line})
+    return pd.DataFrame(rows)
+
+def write_pack(df: pd.DataFrame, path: Path):
+    with open(path, "w") as f:
+        json.dump(json_pack(df), f, indent=2)
+
+def load_pack(path: Path) -> pd.DataFrame:
+    # the pack is grouped by intent; flatten back to rows so all three loads yield a table
+    with open(path) as f:
+        pack = json.load(f)
+    return pd.DataFrame([{"intent_id": p["intent_id"], "intent_name": p["name"], "utterance": u}
+                         for p in pack for u in p["samples"]])
+
+def best_of(fn, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def main():
+    ap = argparse.ArgumentParser(description="CSV vs JSON vs Parquet for training tables.")
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    df = synth_table(args.rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        paths = {"csv": tmp / "t.csv", "json": tmp / "t.json", "parquet": tmp / "t.parquet"}
+        writers = {
+            "csv": lambda: df.to_csv(paths["csv"], index=False),
+            "json": lambda: write_pack(df, paths["json"]),
+            "parquet": lambda: write_table(df, paths["parquet"]),
+        }
+        readers = {
+            "csv": lambda: pd.read_csv(paths["csv"]),
+            "json": lambda: load_pack(paths["json"]),
+            "parquet": lambda: read_table(paths["parquet"]),
+        }
+        print(f"{args.rows:,} utterances")
+        print(f"{'format':8s} {'MB':>8s} {'write_s':>8s} {'load_s':>8s}")
+        for fmt in ("csv", "json", "parquet"):
+            w = best_of(writers[fmt], 1)
+            r = best_of(readers[fmt], args.repeat)
+            mb = paths[fmt].stat().st_size / (1024 * 1024)
+            print(f"{fmt:8s} {mb:8.2f} {w:8.3f} {r:8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# cc-banking-intents/scripts/calls.py
+#
+# Call tables (banking_calls.parquet, banking_calls_refined.parquet) store each transcript once,
+# as a nested column:
+#
+#   turns: list<struct<speaker: string, role: string, text: large_string, prefix: string>>
+#
+# `role` is "customer", "agent" or null. 03 resolves it once, at ingestion: from the speaker
+# label (configs/speaker_aliases.yaml), and for calls where no turn is labelled customer from
+# "Agent:" / "Customer:"-style line prefixes (LINE_PREFIX). A prefixed line becomes a turn whose
+# speaker is the label ("Agent"), whose `prefix` is the prefix as written ("Agent: ") and whose
+# text is the rest of the line. Unprefixed lines that follow keep the role of the last prefix.
+# This is the split 05 used to redo with LINE_SPLIT on every read.
+#
+# The flat texts the stages read are views computed from `turns` when the table is read:
+#
+#   customer_text   customer turns joined by "\n"
+#   agent_text      agent turns
+#   full_text       all turns, each behind its prefix: the transcript as it was written
+#
+# So customer_text of a prefix-format call holds its customer lines without the prefixes (what
+# 05 used to derive with LINE_SPLIT), while full_text still reads "Agent: ...\nCustomer: ...".
+#
+# tables.load_calls / iter_calls accept the view names as columns. They read `turns` in their
+# place and build the views in Arrow, without per-row Python. Tables written before the nested
+# column, which still have the flat text columns, are read as they are (a projection that also
+# names `turns` reads without it). view_turns() gives the turns behind a view with their index
+# in the call, for stages that record which turn a harvested line came from.
+#
+#   from calls import TurnColumns, resolve_turns, join_turns, VIEWS
+
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from features import LINE_PREFIX, LINE_SPLIT, CUSTOMER_ROLE
+
+TURNS = "turns"
+ROLES = ("customer", "agent")
+TURN_TYPE = pa.struct([("speaker", pa.string()), ("role", pa.string()), ("text", pa.large_string()),
+                       ("prefix", pa.string())])      # large: a part's texts may pass 2 GB
+TURNS_TYPE = pa.list_(pa.field("element", TURN_TYPE))      # the item name Parquet reads lists back with
+
+# view column -> role it keeps (None: every turn)
+VIEWS: Dict[str, Optional[str]] = {"customer_text": "customer", "agent_text": "agent", "full_text": None}
+
+# -----------------------------
+# Ingestion (03)
+# -----------------------------
+def prefix_role(label: str) -> str:
+    return "customer" if CUSTOMER_ROLE.search(label.strip().lower()) else "agent"
+
+def resolve_turns(turns: List[Dict[str, str]], roles: List[Optional[bool]]) -> List[Dict[str, Optional[str]]]:
+    """
+    [{"speaker", "role", "text", "prefix"}] for one call; `roles` is label_is_customer() per
+    turn. Without a customer-labelled turn, unlabelled turns are split into lines and take their
+    role from a line prefix (when the transcript has any); the prefix is kept for full_text.
+    """
+    out = [{"speaker": t.get("speaker") or None, "role": None if r is None else ROLES[0 if r else 1],
+            "text": t["text"], "prefix": None} for t, r in zip(turns, roles)]
+    if True in roles or not any(LINE_SPLIT.search(t["text"]) for t, r in zip(turns, roles) if r is None):
+        return out
+
+    resolved, role = [], None
+    for t, r in zip(out, roles):
+        if r is not None:
+            resolved.append(t)
+            continue
+        for line in t["text"].split("\n"):
+            speaker = prefix = None
+            m = LINE_PREFIX.match(line)
+            if m:
+                speaker, role = m.group(1), prefix_role(m.group(1))
+                prefix, line = line[:m.end()], line[m.end():]
+            line = line.strip()
+            if line or prefix:
+                resolved.append({"speaker": speaker, "role": role, "text": line, "prefix": prefix})
+    return resolved
+
+def join_turns(turns, role: Optional[str] = None) -> str:
+    """One call's view (customer_text / agent_text / full_text) from its resolved turns."""
+    if role is None:
+        return "\n".join((t.get("prefix") or "") + t["text"] for t in turns)
+    return "\n".join(t["text"] for t in turns if t["role"] == role and t["text"])
+
+class TurnColumns:
+    """
+    Column-wise accumulator for the `turns` column: turn texts packed into one UTF-8 buffer,
+    speakers and roles as small integer codes, and per-call offsets (not a dict per turn,
+    which would dominate 03's memory).
+    """
+
+    def __init__(self):
+        self.offsets = array("q", [0])      # call i has turns offsets[i]:offsets[i+1]
+        self.text = bytearray()
+        self.text_ends = array("q", [0])
+        self.speakers: Dict[Optional[str], int] = {None: -1}
+        self.speaker = array("i")           # -1 null, else index into the speakers seen
+        self.role = array("b")              # -1 null, else index into ROLES
+        self.prefixes: Dict[Optional[str], int] = {None: -1}
+        self.prefix = array("i")            # -1 null, else index into the prefixes seen
+
+    def append(self, turns: List[Dict[str, Optional[str]]]):
+        for t in turns:
+            code = self.speakers.setdefault(t["speaker"], len(self.speakers) - 1)
+            self.speaker.append(code)
+            self.role.append(-1 if t["role"] is None else ROLES.index(t["role"]))
+            self.prefix.append(self.prefixes.setdefault(t.get("prefix"), len(self.prefixes) - 1))
+            self.text += t["text"].encode("utf-8", errors="replace")
+            self.text_ends.append(len(self.text))
+        self.offsets.append(len(self.role))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def to_arrow(self) -> pa.Array:
+        def coded(codes: np.ndarray, values: list) -> pa.Array:
+            return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0),
+                                                  pa.array(values, pa.string())).cast(pa.string())
+        labels = [k for k in self.speakers if k is not None]
+        text = pa.LargeStringArray.from_buffers(len(self.role), pa.py_buffer(np.frombuffer(self.text_ends, dtype=np.int64)),
+                                                pa.py_buffer(self.text))
+        flat = pa.StructArray.from_arrays([coded(np.frombuffer(self.speaker, dtype=np.int32), labels),
+                                           coded(np.frombuffer(self.role, dtype=np.int8), list(ROLES)), text,
+                                           coded(np.frombuffer(self.prefix, dtype=np.int32),
+                                                 [k for k in self.prefixes if k is not None])],
+                                          fields=list(TURN_TYPE))
+        return pa.ListArray.from_arrays(pa.array(np.frombuffer(self.offsets, dtype=np.int64).astype(np.int32)), flat,
+                                        type=TURNS_TYPE)
+
+# -----------------------------
+# Views (read side)
+# -----------------------------
+def _texts(flat: pa.StructArray, role: Optional[str]) -> pa.Array:
+    """Turn texts as a view shows them: behind their prefix in full_text (role None)."""
+    text = pc.struct_field(flat, "text")
+    if role is None and flat.type.get_field_index("prefix") >= 0:      # older tables have no prefixes
+        text = pc.binary_join_element_wise(pc.fill_null(pc.struct_field(flat, "prefix").cast(text.type), ""), text,
+                                           pa.scalar("", text.type))
+    return text
+
+def _keeps(flat: pa.StructArray, role: Optional[str]) -> pa.Array:
+    """Turns of a role's view: that role's, minus a bare prefix's empty text (every turn for None)."""
+    if role is None:
+        return pa.array(np.ones(len(flat), dtype=bool))
+    return pc.and_(pc.fill_null(pc.equal(pc.struct_field(flat, "role"), role), False),
+                   pc.fill_null(pc.not_equal(pc.struct_field(flat, "text"), ""), False))
+
+def _view(lists: pa.ListArray, role: Optional[str]) -> pa.Array:
+    flat = pc.list_flatten(lists)
+    parents = pc.list_parent_indices(lists)
+    text = _texts(flat, role)
+    if role is not None:
+        keep = _keeps(flat, role)
+        text, parents = text.filter(keep), parents.filter(keep)
+    counts = np.bincount(parents.to_numpy(zero_copy_only=False), minlength=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return pc.binary_join(pa.ListArray.from_arrays(pa.array(offsets), text), pa.scalar("\n", text.type))
+
+def view_turns(turns, role: Optional[str], fallback: Optional[str] = None,
+               use: Optional[np.ndarray] = None) -> List[List[Tuple[int, str]]]:
+    """
+    Per call, [(turn index, text)] of the turns its view joins: the `role` turns, or the
+    `fallback` role's for calls where `use` is False (None: every turn). A view is these texts
+    joined by "\n", so lines split out of the view are the lines of these turns, in order.
+    """
+    lists = turns.combine_chunks() if isinstance(turns, pa.ChunkedArray) else turns
+    flat = pc.list_flatten(lists)
+    parents = pc.list_parent_indices(lists).to_numpy(zero_copy_only=False)
+    offsets = lists.offsets.to_numpy(zero_copy_only=False)
+    index = np.arange(len(flat)) + offsets[0] - offsets[parents]
+
+    keep = _keeps(flat, role).to_numpy(zero_copy_only=False)
+    texts = _texts(flat, role)
+    if use is not None:
+        keep = np.where(use[parents], keep, _keeps(flat, fallback).to_numpy(zero_copy_only=False))
+        if (role is None) != (fallback is None):
+            texts = pc.if_else(pa.array(use[parents]), texts, _texts(flat, fallback))
+
+    out: List[List[Tuple[int, str]]] = [[] for _ in range(len(lists))]
+    texts = texts.filter(pa.array(keep)).to_pylist()
+    for p, i, text in zip(parents[keep].tolist(), index[keep].tolist(), texts):
+        out[p].append((i, text or ""))
+    return out
+
+def view(turns, role: Optional[str] = None) -> pa.ChunkedArray:
+    """customer_text / agent_text / full_text for a whole `turns` column."""
+    chunks = turns.chunks if isinstance(turns, pa.ChunkedArray) else [turns]
+    return pa.chunked_array([_view(c, role).cast(pa.string()) for c in chunks], pa.string())
+
+def plan_columns(schema: pa.Schema, columns: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """(physical columns to read, view columns to build) for a projection that may name views."""
+    names = set(schema.names)
+    views = [c for c in columns if c in VIEWS and c not in names and TURNS in names]
+    read = [c for c in columns if c not in views and (c != TURNS or TURNS in names)]
+    if views and TURNS not in read:
+        read.append(TURNS)
+    return read, views
+
+def add_views(table: pa.Table, columns: Sequence[str], views: Sequence[str]) -> pa.Table:
+    """Append the planned views to a table read with plan_columns() and project to `columns`."""
+    if not views:
+        return table
+    turns = table.column(TURNS)
+    for v in views:
+        table = table.append_column(v, view(turns, VIEWS[v]))
+    return table.select(list(columns))
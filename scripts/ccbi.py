@@ -0,0 +1,127 @@
+# cc-banking-intents/scripts/ccbi.py
+#
+# One entry point for the whole pipeline:
+#
+#   python3 scripts/ccbi.py <command> [args...]
+#   python3 scripts/ccbi.py build                 # == 03_build_banking_subset.py
+#   python3 scripts/ccbi.py baseline --mode compare
+#   python3 scripts/ccbi.py validate              # cheap: no pandas/sklearn import
+#   python3 scripts/ccbi.py stats                 # artifact sizes and row counts
+#   python3 scripts/ccbi.py --profile dev refine  # any command on the 1k dev profile (paths.py)
+#   python3 scripts/ccbi.py --shard 2/8 build     # one shard of a sharded run (shards.py)
+#
+# Nothing heavy is imported here. A stage module (and whatever pandas/sklearn/hub stack it
+# pulls in) is imported only when its command runs, and the stage scripts do no I/O at
+# import time, so `--help`, `validate` and `stats` start in a fraction of a second.
+# Arguments after the command are passed through to the stage's own parser.
+
+import argparse, importlib, os, sys
+from pathlib import Path
+
+SCRIPTS = Path(__file__).resolve().parent
+BASE = SCRIPTS.parent
+
+# command -> (module in scripts/, one-line help)
+COMMANDS = {
+    "sniff":      ("01_sniff_schema", "inspect the dataset schema"),
+    "sample":     ("02_safe_zip_loader", "stratified banking dev sample across all ZIPs"),
+    "build":      ("03_build_banking_subset", "build the banking call subset"),
+    "eda":        ("04_eda_and_qc", "EDA + QC report"),
+    "refine":     ("05_refine_banking_filter", "refine the banking filter"),
+    "discover":   ("06_intent_discovery_tfidf", "TF-IDF intent discovery"),
+    "curate":     ("07_curate_intents", "curate intents into the catalog"),
+    "scaffold":   ("08_build_gold_scaffold", "gold-answer scaffold and handoff list"),
+    "validate":   ("09_validate_outputs", "validate catalog / gold / handoff files"),
+    "export":     ("10_export_training_data", "export training utterances"),
+    "harvest":    ("10b_seed_harvest", "seed-harvest utterances"),
+    "merge":      ("10c_merge_seeded", "merge seeded utterances"),
+    "topup":      ("10d_topup_targets", "top up thin intents"),
+    "whitelist":  ("11c_enforce_answerable_whitelist", "enforce the answerable whitelist"),
+    "eval-sets":  ("11_build_eval_sets", "build eval splits"),
+    "train-data": ("training", "10 -> 11_build_eval_sets chained in memory"),
+    "quality":    ("11_quality_report", "training-data quality report"),
+    "baseline":   ("11_baseline_intent", "baseline intent model / benchmark"),
+    "pipeline":   ("pipeline", "run stages as a cached DAG"),
+    "bench":      ("bench_stages", "synthetic-corpus stage benchmark"),
+    "regex-profile": ("regex_profile", "replay rule regexes and rank them by cost"),
+    "shards":     ("shards", "sharded 03 / 05 / 10b runs and their reduce step"),
+    "stream":     ("stream_ingest", "ingest per-call JSON files from a drop directory"),
+}
+
+STAT_SUFFIXES = (".parquet", ".csv", ".jsonl", ".json")
+
+def run_module(module: str, argv: list) -> int:
+    if str(SCRIPTS) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS))
+    sys.argv = [str(SCRIPTS / f"{module}.py"), *argv]
+    mod = importlib.import_module(module)
+    try:
+        mod.main()
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    return 0
+
+def count_rows(path: Path):
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.read_metadata(path).num_rows
+    if path.suffix == ".jsonl":
+        with open(path, "rb") as f:
+            return sum(1 for _ in f)
+    if path.suffix == ".csv":
+        import csv
+        with open(path, newline="") as f:
+            return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+    return None
+
+def stats(argv: list) -> int:
+    ap = argparse.ArgumentParser(prog="ccbi stats", description="Sizes and row counts of pipeline artifacts.")
+    ap.add_argument("--dir", type=Path, default=None, help="artifact directory (default: the profile's processed dir)")
+    args = ap.parse_args(argv)
+    if args.dir is None:
+        sys.path.insert(0, str(SCRIPTS))
+        from paths import PROC
+        args.dir = PROC
+    if not args.dir.exists():
+        print(f"No artifacts yet: {args.dir}")
+        return 1
+    files = sorted(p for p in args.dir.rglob("*") if p.is_file() and p.suffix in STAT_SUFFIXES)
+    print(f"{'artifact':58s} {'MB':>9s} {'rows':>10s}")
+    for p in files:
+        try:
+            rows = count_rows(p)
+        except Exception:
+            rows = None
+        mb = p.stat().st_size / (1024 * 1024)
+        print(f"{str(p.relative_to(args.dir))[:58]:58s} {mb:9.2f} {'' if rows is None else f'{rows:,}':>10s}")
+    return 0
+
+def main():
+    epilog = "\n".join(f"  {name:14s} {help_}" for name, (_, help_) in COMMANDS.items())
+    epilog += f"\n  {'stats':14s} artifact sizes and row counts"
+    ap = argparse.ArgumentParser(
+        prog="ccbi",
+        description="cc-banking-intents pipeline. Arguments after the command go to that stage.",
+        epilog="commands:\n" + epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    ap.add_argument("--profile", choices=("full", "dev"), default=None,
+                    help="data profile for this command (sets CCBI_PROFILE; default full)")
+    ap.add_argument("--shard", metavar="I/N", default=None,
+                    help="run the command as shard I of N (sets CCBI_SHARD; see shards.py)")
+    ap.add_argument("command", choices=[*COMMANDS, "stats"], metavar="command")
+    ap.add_argument("args", nargs=argparse.REMAINDER)
+    args = ap.parse_args()
+    if args.profile:
+        # before any stage (and paths.py) is imported
+        os.environ["CCBI_PROFILE"] = args.profile
+    if args.shard:
+        os.environ["CCBI_SHARD"] = args.shard
+
+    if args.command == "stats":
+        sys.exit(stats(args.args))
+    module, _ = COMMANDS[args.command]
+    sys.exit(run_module(module, args.args))
+
+if __name__ == "__main__":
+    main()
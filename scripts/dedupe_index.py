@@ -0,0 +1,280 @@
+# cc-banking-intents/scripts/dedupe_index.py
+#
+# Persistent dedupe index for 03. A call's key is the first 128 bits of its sha256 (the `hash`
+# column), stored as two uint64 words and kept sorted in .npy files that are opened with mmap:
+# a lookup is a binary search touching a few pages, and a million calls take 16 MB instead of
+# the ~150 MB a Python set of 64-character hex strings holds.
+#
+#   <processed dir>/dedupe_index/
+#       <zip>.npy            (2, n) uint64: row 0 high words (sorted), row 1 low words
+#       <zip>.<part>.npy     one worker's keys for that ZIP, folded into <zip>.npy by merge()
+#
+# There is one segment per source ZIP. 03 tests a kept call against the segments of the *other*
+# ZIPs and against the calls it already kept in this run. Afterwards it replaces the segments
+# of the ZIPs it read. Rebuilding the same ZIPs therefore gives the same table, while a call that
+# is also in a ZIP ingested by an earlier run is dropped as a duplicate.
+#
+#   index = DedupeIndex(exclude=src.files())     # the ZIPs this run rebuilds
+#   if index.seen(digest, zname): continue        # per call (digest = sha256(...).digest())
+#   index.commit()                                # write this run's segments
+#   index.contains(hi, lo)                        # batch membership (numpy arrays of words)
+#
+#   python3 scripts/dedupe_index.py stats [--dir DIR]     # segments, keys, cross-ZIP duplicates
+#   python3 scripts/dedupe_index.py merge [--dir DIR]     # fold worker parts into their segments
+#   python3 scripts/dedupe_index.py bench [--n 1000000]   # memory / lookup time vs a hex-string set
+
+import argparse, hashlib, os, re, sys, time, tracemalloc
+from bisect import bisect_left
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from paths import BASE_PROC
+
+INDEX_DIR = Path(os.environ.get("CCBI_DEDUPE_INDEX_DIR", BASE_PROC / "dedupe_index"))   # shared by shards
+SPILL = int(os.environ.get("CCBI_DEDUPE_SPILL", "65536"))      # this run's keys held in a Python set before sorting
+
+def split_digest(digest: bytes) -> Tuple[int, int]:
+    """(high, low) uint64 words of a sha256 digest's first 16 bytes."""
+    return int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:16], "big")
+
+def keys_from_hex(hashes: Iterable[str]) -> np.ndarray:
+    """(2, n) uint64 words of hex sha256 strings (e.g. a call table's `hash` column)."""
+    raw = np.frombuffer(b"".join(bytes.fromhex(h[:32]) for h in hashes), dtype=">u8").reshape(-1, 2)
+    return np.ascontiguousarray(raw.T.astype(np.uint64))
+
+def sort_keys(keys: np.ndarray) -> np.ndarray:
+    """Sorted by (high, low), without repeats."""
+    if not keys.shape[1]:
+        return np.empty((2, 0), dtype=np.uint64)
+    keys = keys[:, np.lexsort((keys[1], keys[0]))]
+    keep = np.ones(keys.shape[1], dtype=bool)
+    keep[1:] = (keys[0, 1:] != keys[0, :-1]) | (keys[1, 1:] != keys[1, :-1])
+    return np.ascontiguousarray(keys[:, keep])
+
+def sorted_contains(keys: np.ndarray, hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    """Membership of (hi, lo) pairs in a sort_keys() array."""
+    n = keys.shape[1]
+    if not n:
+        return np.zeros(len(hi), dtype=bool)
+    start = np.searchsorted(keys[0], hi)
+    at = np.minimum(start, n - 1)
+    found = (keys[0][at] == hi) & (keys[1][at] == lo)
+    # a high word shared by several keys (1 in 2**64 per pair): scan the rest of its run
+    nxt = np.minimum(at + 1, n - 1)
+    for i in np.flatnonzero(~found & (at + 1 < n) & (keys[0][nxt] == hi)):
+        found[i] = bool((keys[1][at[i]:np.searchsorted(keys[0], hi[i], "right")] == lo[i]).any())
+    return found
+
+def words(keys: np.ndarray) -> Tuple[memoryview, memoryview]:
+    """The two rows of a sort_keys() array as memoryviews, for sorted_has()."""
+    return memoryview(np.ascontiguousarray(keys[0])), memoryview(np.ascontiguousarray(keys[1]))
+
+def sorted_has(high: memoryview, low: memoryview, hi: int, lo: int) -> bool:
+    """
+    sorted_contains() for one pair (03 checks one call at a time). bisect over memoryviews stays
+    in the interpreter: np.searchsorted releases the GIL on every call and then waits behind
+    03's inflate thread to get it back.
+    """
+    i = bisect_left(high, hi)
+    while i < len(high) and high[i] == hi:
+        if low[i] == lo:
+            return True
+        i += 1
+    return False
+
+def segment_name(zname: str) -> str:
+    """File stem for a ZIP's segment (ZIP names carry spaces and '&')."""
+    safe = re.sub(r"[^A-Za-z0-9_-]+", "_", Path(zname).stem).strip("_")
+    return f"{safe}-{hashlib.sha1(zname.encode('utf-8')).hexdigest()[:8]}"
+
+def write_keys(keys: np.ndarray, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(keys, dtype=np.uint64))
+    os.replace(tmp, path)
+
+# -----------------------------
+# Index
+# -----------------------------
+class DedupeIndex:
+    def __init__(self, root: Optional[Path] = INDEX_DIR, exclude: Sequence[str] = (), part: Optional[str] = None):
+        """
+        Opens every segment under `root` except those of the `exclude` ZIPs (rebuilt by this run).
+        part= names this process's worker parts (<zip>.<part>.npy) instead of replacing <zip>.npy.
+        root=None keeps nothing on disk (a dedupe within this run only).
+        """
+        self.root = Path(root) if root else None
+        self.part = part
+        skip = {segment_name(z) for z in exclude}
+        self.segments: Dict[str, List[np.ndarray]] = {}
+        for path in sorted(self.root.glob("*.npy")) if self.root and self.root.exists() else []:
+            stem = path.name.split(".")[0]
+            if stem not in skip:
+                self.segments.setdefault(stem, []).append(np.load(path, mmap_mode="r"))
+        self.views = [words(keys) for segs in self.segments.values() for keys in segs]
+        self.pending: set = set()                            # this run's keys as 128-bit ints
+        self.spilled = np.empty((2, 0), dtype=np.uint64)     # ... and, past SPILL, sorted words
+        self.spilled_views = words(self.spilled)
+        self.by_zip: Dict[str, Tuple[array, array]] = {}     # kept keys per ZIP, for commit()
+        self.dup_run = 0
+        self.dup_index = 0
+
+    def __len__(self) -> int:
+        return sum(k.shape[1] for segs in self.segments.values() for k in segs)
+
+    def contains(self, hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+        """Batch membership of (hi, lo) word pairs in the on-disk segments."""
+        hi, lo = np.asarray(hi, dtype=np.uint64), np.asarray(lo, dtype=np.uint64)
+        found = np.zeros(len(hi), dtype=bool)
+        for segs in self.segments.values():
+            for keys in segs:
+                todo = ~found
+                if todo.any():
+                    found[todo] = sorted_contains(keys, hi[todo], lo[todo])
+        return found
+
+    def seen(self, digest: bytes, zname: str) -> bool:
+        """True if this call is a duplicate; otherwise records it under `zname` and returns False."""
+        hi, lo = split_digest(digest)
+        key = hi << 64 | lo
+        if key in self.pending or sorted_has(*self.spilled_views, hi, lo):
+            self.dup_run += 1
+            return True
+        if any(sorted_has(high, low, hi, lo) for high, low in self.views):
+            self.dup_index += 1
+            return True
+        self.pending.add(key)
+        if len(self.pending) >= SPILL:
+            self._spill()
+        his, los = self.by_zip.setdefault(zname, (array("Q"), array("Q")))
+        his.append(hi)
+        los.append(lo)
+        return False
+
+    def _spill(self):
+        new = np.array([[k >> 64 for k in self.pending], [k & 0xFFFFFFFFFFFFFFFF for k in self.pending]], dtype=np.uint64)
+        self.spilled = sort_keys(np.concatenate([self.spilled, new], axis=1))
+        self.spilled_views = words(self.spilled)
+        self.pending = set()
+
+    def add(self, keys: np.ndarray, zname: str):
+        """Record keys kept elsewhere (a reduced sharded build) under `zname`, for commit()."""
+        his, los = self.by_zip.setdefault(zname, (array("Q"), array("Q")))
+        his.frombytes(np.ascontiguousarray(keys[0], dtype=np.uint64).tobytes())
+        los.frombytes(np.ascontiguousarray(keys[1], dtype=np.uint64).tobytes())
+
+    def commit(self, znames: Iterable[str] = ()) -> List[Path]:
+        """Write this run's keys: one segment (or worker part) per ZIP, including `znames` with none kept."""
+        if self.root is None:
+            return []
+        self.root.mkdir(parents=True, exist_ok=True)
+        written = []
+        for zname in sorted(set(self.by_zip) | set(znames)):
+            his, los = self.by_zip.get(zname, (array("Q"), array("Q")))
+            keys = sort_keys(np.array([np.frombuffer(his, np.uint64), np.frombuffer(los, np.uint64)]).reshape(2, -1))
+            stem = segment_name(zname)
+            if self.part is None:
+                for stale in self.root.glob(f"{stem}.*.npy"):   # parts of an older sharded build
+                    stale.unlink()
+                path = self.root / f"{stem}.npy"
+            else:
+                path = self.root / f"{stem}.{self.part}.npy"
+            write_keys(keys, path)
+            written.append(path)
+        return written
+
+    def summary(self) -> dict:
+        return {"dir": str(self.root) if self.root else None, "segments": len(self.segments), "index_keys": len(self),
+                "kept": sum(len(h) for h, _ in self.by_zip.values()),
+                "dup_in_run": self.dup_run, "dup_in_index": self.dup_index}
+
+# -----------------------------
+# Maintenance
+# -----------------------------
+def merge(root: Path = INDEX_DIR) -> Dict[str, int]:
+    """Fold worker parts (<zip>.<part>.npy) into <zip>.npy; returns keys per merged segment."""
+    out = {}
+    stems = sorted({p.name.split(".")[0] for p in root.glob("*.*.npy")})
+    for stem in stems:
+        parts = sorted(root.glob(f"{stem}.*.npy"))
+        base = root / f"{stem}.npy"
+        arrays = [np.load(p) for p in ([base] if base.exists() else []) + parts]
+        keys = sort_keys(np.concatenate(arrays, axis=1))
+        write_keys(keys, base)
+        for p in parts:
+            p.unlink()
+        out[stem] = keys.shape[1]
+    return out
+
+def cross_duplicates(root: Path = INDEX_DIR) -> Dict[str, int]:
+    """Per segment: keys that also occur in another segment (batch checks, segment vs the rest)."""
+    out = {}
+    stems = sorted({p.name.split(".")[0] for p in root.glob("*.npy")})
+    for stem in stems:
+        mine = sort_keys(np.concatenate([np.load(p, mmap_mode="r") for p in root.glob(f"{stem}*.npy")], axis=1))
+        others = DedupeIndex(root)
+        others.segments.pop(stem, None)
+        out[stem] = int(others.contains(mine[0], mine[1]).sum())
+    return out
+
+def bench(n: int, seed: int = 0) -> dict:
+    """Memory and lookup time of n keys: Python set of hex strings vs a sorted (2, n) uint64 array."""
+    rng = np.random.default_rng(seed)
+    raw = rng.bytes(32 * n)
+    probes = [raw[i * 32:(i + 1) * 32] for i in range(0, n, max(1, n // 100_000))]
+
+    tracemalloc.start()
+    hexset = {raw[i * 32:(i + 1) * 32].hex() for i in range(n)}
+    set_mb = tracemalloc.get_traced_memory()[0] / 1e6
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    assert all(p.hex() in hexset for p in probes)
+    set_us = (time.perf_counter() - t0) / len(probes) * 1e6
+    del hexset
+
+    keys = sort_keys(np.frombuffer(raw, dtype=">u8").reshape(-1, 4)[:, :2].T.astype(np.uint64))
+    pairs = [split_digest(p) for p in probes]
+    high, low = words(keys)
+    t0 = time.perf_counter()
+    assert all(sorted_has(high, low, hi, lo) for hi, lo in pairs)
+    scalar_us = (time.perf_counter() - t0) / len(probes) * 1e6
+    batch = np.array(pairs, dtype=np.uint64).T
+    t0 = time.perf_counter()
+    assert sorted_contains(keys, batch[0], batch[1]).all()
+    batch_us = (time.perf_counter() - t0) / len(probes) * 1e6
+    return {"n": n, "hex_set_mb": round(set_mb, 1), "index_mb": round(keys.nbytes / 1e6, 1),
+            "hex_set_lookup_us": round(set_us, 2), "index_lookup_us": round(scalar_us, 2),
+            "index_batch_lookup_us": round(batch_us, 3)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Persistent dedupe index of 03's call hashes.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name in ("stats", "merge"):
+        p = sub.add_parser(name)
+        p.add_argument("--dir", type=Path, default=INDEX_DIR)
+    b = sub.add_parser("bench", help="memory / lookup time vs a set of hex strings")
+    b.add_argument("--n", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        for k, v in bench(args.n).items():
+            print(f"{k:24s} {v}")
+        return
+    if not args.dir.exists():
+        sys.exit(f"{args.dir} does not exist (03 writes it)")
+    if args.cmd == "merge":
+        for stem, n in merge(args.dir).items():
+            print(f"{stem}: {n:,} keys")
+        return
+    index = DedupeIndex(args.dir)
+    dups = cross_duplicates(args.dir)
+    print(f"{len(index):,} keys in {len(index.segments)} segment(s) under {args.dir}")
+    for stem, segs in sorted(index.segments.items()):
+        parts = f" ({len(segs)} files, run `merge`)" if len(segs) > 1 else ""
+        print(f"  {stem:48s} {sum(k.shape[1] for k in segs):>10,} keys, {dups.get(stem, 0):,} also in other ZIPs{parts}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# cc-banking-intents/scripts/features.py
+#
+# Per-call features computed once by 03 and stored next to the call table
+# (<processed dir>/banking_call_features.parquet, one row per call, keyed by `hash`):
+#
+#   cust_chars / agent_chars / full_chars, cust_tokens / full_tokens
+#   n_turns, n_customer_turns, n_agent_turns, n_unknown_turns
+#   prefix_format        full_text has "Agent:"/"Customer:"-style line prefixes (LINE_SPLIT)
+#   n_placeholders, ph_<type>          [PERSON_NAME]-style redaction counts
+#   bank_hits, bank__<term>            BANKING_PAT (03's keep rule) on customer_text or full_text
+#   pos_hits, pos__<term>, neg_hits, neg__<term>
+#                                      POS / NEG (05's keep rule) on the text 05 tests: the customer view of
+#                                      the resolved turns (calls.py, incl. prefixed customer lines), else full_text
+#
+# 05 keeps a call iff pos_hits > 0 and neg_hits == 0, and 04 reads its length and turn stats
+# from here, so neither has to re-scan the transcripts.
+#
+#   from features import call_features, read_features, BANKING_PAT, POS, NEG, LINE_SPLIT, LINE_PREFIX
+
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from regex_profile import profiled
+from paths import PROC, STREAM_DIR
+
+FEATURES = PROC / "banking_call_features.parquet"
+STREAM_FEATURES = STREAM_DIR / "features"        # rows of the streamed calls (stream_ingest.py)
+
+# conservative banking keyword list (for any text, esp. customer turns) — 03's keep rule
+BANKING_TERMS = (
+    "bank", "banking", "account", "balance", "statement", "transfer", "wire", "zelle", "ach",
+    "routing", "checking", "savings", "deposit", "overdraft", "card", "credit", "debit", "chargeback",
+    "fraud", "dispute", "pin", "atm", "mortgage", "loan", "password", "passcode", "online banking",
+    "payment", "autopay", "direct deposit", "interest", "fee", "late fee", "billing",
+)
+# Positive banking signals (stricter) — 05
+POS_TERMS = (
+    "bank", "banking", "debit", "credit", "card", "chargeback", "dispute", "fraud",
+    "balance", "statement", "account", "checking", "savings", "routing",
+    "wire", "zelle", "ach", "overdraft", "atm", "pin", "mortgage", "loan",
+    "direct deposit", "autopay", "interest", "fee", "late fee", "bill pay",
+    "password", "passcode", "online banking", "mobile banking",
+)
+# Negative domain terms (non-banking services) — 05
+NEG_TERMS = (
+    "router", "modem", "internet", "cable", "tv service", "technician", "installation",
+    "outage", "wifi", "wi-fi", "bandwidth", "plumbing", "hvac", "gas line", "appliance",
+    "water heater", "faucet", "drain", "leak", "maintenance", "electricity", "utility",
+)
+PLACEHOLDER_TYPES = ("PERSON_NAME", "LOCATION", "PHONE_NUMBER", "EMAIL_ADDRESS",
+                     "MONEY_AMOUNT", "DATE", "TIME", "OCCUPATION")
+
+def terms_pattern(terms) -> "re.Pattern":
+    # \b(t1|t2|...)\b; the first-letter lookahead only lets `re` skip positions that cannot
+    # start a term (same matches, roughly half the findall time on transcripts)
+    first = "".join(sorted({t[0] for t in terms}))
+    return re.compile(r"\b(?=[" + first + r"])(" + "|".join(terms) + r")\b", re.I)
+
+def raw_terms_pattern(terms, ascii_lower: bool = False) -> "re.Pattern":
+    """
+    terms_pattern for the undecoded JSON text of a record (03's prefilter). Multi-word terms are
+    dropped because each one contains a single-word term from the same list. The leading
+    boundary also accepts a JSON escape (`\\nbank` decodes to "\nbank"). ascii_lower=True gives a
+    case-sensitive bytes pattern for already-lowercased ASCII input, which `re` scans about twice
+    as fast as re.I. Callers send `\\u` escapes and non-UTF-8 bytes to the full parse.
+    """
+    words = sorted({t for t in terms if " " not in t and "-" not in t})
+    for t in terms:
+        if t not in words and not any(w in words for w in re.split(r"[ \-]", t)):
+            raise ValueError(f"multi-word term {t!r} has no single-word term covering it")
+    first = "".join(sorted({t[0] for t in words}))
+    pat = r"(?=[" + first + r"])(?:(?<=\\[bfnrt])|\b)(?:" + "|".join(words) + r")\b"
+    return re.compile(pat.encode()) if ascii_lower else re.compile(pat, re.I)
+
+BANKING_PAT = profiled("BANKING_PAT", terms_pattern(BANKING_TERMS))
+RAW_BANKING_PAT = profiled("RAW_BANKING_PAT", raw_terms_pattern(BANKING_TERMS))
+RAW_BANKING_ASCII = profiled("RAW_BANKING_ASCII", raw_terms_pattern(BANKING_TERMS, ascii_lower=True))
+POS = profiled("POS", terms_pattern(POS_TERMS))
+NEG = profiled("NEG", terms_pattern(NEG_TERMS))
+PLACEHOLDER = profiled("PLACEHOLDER", re.compile(r"\[(" + "|".join(PLACEHOLDER_TYPES) + r")\]", re.I))
+
+# Heuristic split for single-blob transcripts with prefixes
+LINE_SPLIT = profiled("LINE_SPLIT", re.compile(r"(?:^|\n)\s*(agent|rep|representative|advisor|associate|operator|support|specialist|staff|csr|customer|user|caller|client|member)\s*[:\-]\s*", re.I))
+# the same prefixes at the start of one line; 03 moves them into the turn's speaker (calls.py)
+LINE_PREFIX = profiled("LINE_PREFIX", re.compile(r"\s*(agent|rep|representative|advisor|associate|operator|support|specialist|staff|csr|customer|user|caller|client|member)\s*[:\-]\s*", re.I))
+CUSTOMER_ROLE = re.compile(r"customer|user|caller|client|member")
+
+def may_match_banking(raw: bytes) -> bool:
+    """
+    False only if BANKING_PAT cannot match any text 03 extracts from this JSON record, so the
+    parse can be skipped. Undecodable bytes or `\\u` escapes always return True; non-ASCII
+    records are decoded so that re.I case folding (e.g. the Kelvin sign) matches BANKING_PAT's.
+    """
+    if b"\\u" in raw:
+        return True
+    if raw.isascii():
+        return RAW_BANKING_ASCII.search(raw.lower()) is not None
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return True
+    return RAW_BANKING_PAT.search(text) is not None
+
+def column_name(prefix: str, term: str) -> str:
+    return f"{prefix}__{term.lower().replace(' ', '_').replace('-', '_')}"
+
+# prefix -> (pattern, {matched term: column}, zeroed row template)
+TERM_SETS = {}
+for _prefix, _pat, _terms in (("bank", BANKING_PAT, BANKING_TERMS), ("pos", POS, POS_TERMS), ("neg", NEG, NEG_TERMS)):
+    _cols = {t: column_name(_prefix, t) for t in _terms}
+    TERM_SETS[_prefix] = (_pat, _cols, dict.fromkeys(_cols.values(), 0))
+
+def term_counts(prefix: str, text: str) -> Dict[str, int]:
+    """Per-term hit counts (<prefix>__<term>) plus the total (<prefix>_hits) of one term set."""
+    pat, cols, template = TERM_SETS[prefix]
+    counts = template.copy()
+    hits = pat.findall(text) if text else []
+    for h in hits:
+        counts[cols[h.lower()]] += 1
+    counts[f"{prefix}_hits"] = len(hits)
+    return counts
+
+def call_features(h: str, turn_roles: List[Optional[bool]], customer_text: str, agent_text: str,
+                  full_text: str, resolved_customer: str) -> dict:
+    """
+    Feature row for one call; `turn_roles` is label_is_customer() per turn (True/False/None) and
+    `resolved_customer` the customer view of its resolved turns (calls.py), which also counts
+    customer lines that only a line prefix identifies.
+    """
+    hay = resolved_customer.strip() or full_text.strip()
+    ph = PLACEHOLDER.findall(full_text)
+    row = {
+        "hash": h,
+        "cust_chars": len(customer_text),
+        "agent_chars": len(agent_text),
+        "full_chars": len(full_text),
+        "cust_tokens": len(customer_text.split()),
+        "full_tokens": len(full_text.split()),
+        "n_turns": len(turn_roles),
+        "n_customer_turns": sum(r is True for r in turn_roles),
+        "n_agent_turns": sum(r is False for r in turn_roles),
+        "n_unknown_turns": sum(r is None for r in turn_roles),
+        "prefix_format": bool(LINE_SPLIT.search(full_text)),
+        "n_placeholders": len(ph),
+    }
+    for t in PLACEHOLDER_TYPES:
+        row[f"ph_{t.lower()}"] = 0
+    for t in ph:
+        row[f"ph_{t.lower()}"] += 1
+    row.update(term_counts("bank", customer_text or full_text))
+    row.update(term_counts("pos", hay))
+    row.update(term_counts("neg", hay))
+    return row
+
+class FeatureColumns:
+    """
+    Column-wise accumulator for call_features() rows: one compact array per numeric feature
+    (uint32 lengths, uint16 counts) instead of ~110-key dicts per call, which would dominate
+    03's memory.
+    """
+
+    def __init__(self):
+        self.hashes: List[str] = []
+        self.cols: Dict[str, array] = {}
+
+    def append(self, row: dict):
+        if not self.cols:
+            self.cols = {k: array("I" if k.endswith(("_chars", "_tokens")) else "H") for k in row if k != "hash"}
+        self.hashes.append(row["hash"])
+        for k, col in self.cols.items():
+            col.append(min(int(row[k]), 0xFFFF) if col.typecode == "H" else int(row[k]))
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def to_frame(self) -> pd.DataFrame:
+        dtypes = {"I": np.uint32, "H": np.uint16}
+        df = pd.DataFrame({k: np.frombuffer(col, dtype=dtypes[col.typecode]) for k, col in self.cols.items()})
+        df.insert(0, "hash", self.hashes)
+        if "prefix_format" in df:
+            df["prefix_format"] = df["prefix_format"].astype(bool)
+        return df
+
+def read_features(path: Path = FEATURES, columns=None, parts: Optional[Path] = STREAM_FEATURES) -> Optional[pd.DataFrame]:
+    """The feature table plus the streamed calls' parts, or None when neither exists (older builds)."""
+    from tables import dataset_files, to_pandas
+    import pyarrow.dataset as ds
+    files = dataset_files(path, parts) if parts is not None else [str(p) for p in [path] if Path(p).exists()]
+    if not files:
+        return None
+    return to_pandas(ds.dataset(files, format="parquet").to_table(columns=columns))
@@ -0,0 +1,258 @@
+# cc-banking-intents/scripts/instrument.py
+#
+# Shared run instrumentation for the pipeline scripts.
+#
+#   with RunReport("05_refine_banking_filter") as run:
+#       with run.step("load") as st:
+#           df = pd.read_parquet(run.read(SRC))
+#           st.rows_out = len(df)
+#       ...
+#
+# Stage functions that take an optional `run` fall back to NullReport() (same interface,
+# records nothing) when called on their own, e.g. from a notebook.
+#
+# Each named step records wall/CPU time, rows in/out and bytes read/written; the run adds
+# peak RSS and is written as JSON to logs/run_reports/<stage>_<timestamp>.json.
+# Set CCBI_STACK_SAMPLES=<hz> (e.g. 100) to also sample the main thread and dump
+# flame-graph-compatible collapsed stacks (<report>.folded, for flamegraph.pl / speedscope).
+
+import json, os, resource, sys, threading, time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+BASE = Path(__file__).resolve().parents[1]
+REPORT_DIR = BASE / "logs" / "run_reports"
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0, 1)
+
+def path_size(path) -> int:
+    p = Path(path)
+    if p.is_dir():
+        return sum(f.stat().st_size for f in p.rglob("*") if f.is_file())
+    return p.stat().st_size if p.exists() else 0
+
+class Step:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb = 0.0
+
+    def add(self, rows_in: int = 0, rows_out: int = 0):
+        if rows_in:
+            self.rows_in = (self.rows_in or 0) + rows_in
+        if rows_out:
+            self.rows_out = (self.rows_out or 0) + rows_out
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "peak_rss_mb": self.peak_rss_mb,
+        }
+
+class StackSampler(threading.Thread):
+    """Poor man's sampling profiler: periodically snapshots the main thread's stack."""
+
+    def __init__(self, hz: float, report: "RunReport"):
+        super().__init__(daemon=True, name="ccbi-stack-sampler")
+        self.interval = 1.0 / hz
+        self.report = report
+        self.stacks = Counter()
+        self._halt = threading.Event()
+        self._main_id = threading.main_thread().ident
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self._main_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            step = self.report.current.name if self.report.current else "-"
+            self.stacks[";".join([f"step:{step}"] + names[::-1])] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join(timeout=1.0)
+
+    def dump(self, path: Path):
+        with open(path, "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+class RunReport:
+    def __init__(self, stage: str, report_dir: Path = REPORT_DIR):
+        self.stage = stage
+        self.report_dir = report_dir
+        self.steps = []
+        self._by_name = {}
+        self.current: Optional[Step] = None
+        self.extra = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.status = "running"
+        self._sampler: Optional[StackSampler] = None
+
+    # --- lifecycle ---
+    def __enter__(self) -> "RunReport":
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        hz = os.environ.get("CCBI_STACK_SAMPLES")
+        if hz:
+            self._sampler = StackSampler(float(hz), self)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.status = "ok" if exc_type is None else f"error: {exc_type.__name__}"
+        if exc_type is SystemExit and not exc.code:
+            self.status = "ok"
+        self.finish()
+        return False
+
+    def _get_step(self, name: str) -> Step:
+        # Re-entering a step name accumulates into the same entry, so steps can be
+        # opened per record inside a loop and still report one total.
+        st = self._by_name.get(name)
+        if st is None:
+            st = self._by_name[name] = Step(name)
+            self.steps.append(st)
+        return st
+
+    @contextmanager
+    def step(self, name: str):
+        st = self._get_step(name)
+        prev, self.current = self.current, st
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield st
+        finally:
+            st.wall_s += time.perf_counter() - t0
+            st.cpu_s += time.process_time() - c0
+            st.peak_rss_mb = peak_rss_mb()
+            self.current = prev
+
+    def iter(self, name: str, iterable, rows=None):
+        """
+        Yield from `iterable`, charging the time spent producing each item to step `name`.
+        Each item counts as one row out, or as rows(item) rows (e.g. rows=len for batches).
+        """
+        st = self._get_step(name)
+        it = iter(iterable)
+        while True:
+            t0, c0 = time.perf_counter(), time.process_time()
+            try:
+                item = next(it)
+            except StopIteration:
+                st.peak_rss_mb = peak_rss_mb()
+                return
+            finally:
+                st.wall_s += time.perf_counter() - t0
+                st.cpu_s += time.process_time() - c0
+            st.add(rows_out=rows(item) if rows else 1)
+            yield item
+
+    # --- I/O accounting: wrap paths as they are read/written ---
+    def read(self, path, nbytes: Optional[int] = None):
+        # nbytes: what was actually scanned, when less than the whole file (column projection)
+        n = path_size(path) if nbytes is None else nbytes
+        self.bytes_read += n
+        if self.current:
+            self.current.bytes_read += n
+        return path
+
+    def wrote(self, path):
+        n = path_size(path)
+        self.bytes_written += n
+        if self.current:
+            self.current.bytes_written += n
+        return path
+
+    def note(self, **kw):
+        """Attach free-form stage metrics (counts, ratios) to the report."""
+        self.extra.update(kw)
+
+    def to_dict(self) -> dict:
+        first_in = next((s.rows_in for s in self.steps if s.rows_in is not None), None)
+        last_out = next((s.rows_out for s in reversed(self.steps) if s.rows_out is not None), None)
+        return {
+            "stage": self.stage,
+            "status": self.status,
+            "profile": os.environ.get("CCBI_PROFILE", "full") or "full",
+            "shard": os.environ.get("CCBI_SHARD") or None,
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "cpu_s": round(time.process_time() - self._c0, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "rows_in": first_in,
+            "rows_out": last_out,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "steps": [s.to_dict() for s in self.steps],
+            "extra": self.extra,
+            "argv": sys.argv[1:],
+        }
+
+    def finish(self) -> Path:
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{self.stage}_{self.started:%Y%m%d_%H%M%S}"
+        if os.environ.get("CCBI_SHARD"):         # shards of one stage start in the same second
+            stem += "_shard" + os.environ["CCBI_SHARD"].replace("/", "of")
+        out = self.report_dir / f"{stem}.json"
+        report = self.to_dict()
+        # regex cost stats, when the script registered patterns and CCBI_REGEX_PROFILE is on
+        rp = sys.modules.get("regex_profile")
+        if rp is not None and rp.ENABLED:
+            report["regex"] = rp.stats()
+            rp.print_summary(report["regex"])
+        if self._sampler:
+            self._sampler.stop()
+            folded = self.report_dir / f"{stem}.folded"
+            self._sampler.dump(folded)
+            report["stack_samples"] = str(folded)
+        with open(out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Run report -> {out}")
+        return out
+
+class NullReport(RunReport):
+    """A RunReport that times, sizes and writes nothing, for stage functions called without a run."""
+
+    def __init__(self):
+        super().__init__("-")
+
+    @contextmanager
+    def step(self, name: str):
+        yield Step(name)
+
+    def iter(self, name: str, iterable, rows=None):
+        return iter(iterable)
+
+    def read(self, path, nbytes: Optional[int] = None):
+        return path
+
+    def wrote(self, path):
+        return path
+
+    def note(self, **kw):
+        pass
@@ -0,0 +1,138 @@
+# cc-banking-intents/scripts/overlap.py
+#
+# Run the stages of a generator chain in their own threads, joined by bounded queues, so I/O
+# (fetching the next ZIP), inflating (zlib releases the GIL) and parsing overlap:
+#
+#   with Chain() as chain:
+#       zips = chain.stage("fetch", fetch_zips(src), maxsize=1)          # 1 ZIP ahead
+#       members = chain.stage("inflate", inflate_members(zips), maxsize=512)
+#       for item in chain.consume("parse", members):
+#           ...
+#   chain.report()   # per stage: wall, idle waiting for input (starved), idle blocked on a full queue
+#
+# A full queue blocks its producer (backpressure), so at most `maxsize` items sit between two
+# stages. Items keep their order. An exception in a stage is re-raised in the consumer, and
+# leaving the `with` block early stops the producer threads. With overlap off
+# (Chain(enabled=False)) stage() returns the generator as-is and the chain runs serially.
+
+import queue, threading, time
+from typing import Iterable, Iterator, List, Optional
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+class Lane:
+    """Bounded queue between two stages, timing how long each side waited on the other."""
+
+    def __init__(self, producer: str, maxsize: int, stop: threading.Event):
+        self.producer = producer
+        self.consumer: Optional[str] = None
+        self.q: queue.Queue = queue.Queue(maxsize)
+        self.stop = stop
+        self.items = 0
+        self.put_wait = 0.0       # producer blocked: queue full (backpressure)
+        self.get_wait = 0.0       # consumer starved: queue empty
+
+    def put(self, item):
+        t0 = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                self.q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.put_wait += time.perf_counter() - t0
+
+    def __iter__(self) -> Iterator:
+        while True:
+            t0 = time.perf_counter()
+            item = self.q.get()
+            self.get_wait += time.perf_counter() - t0
+            if item is _DONE:
+                return
+            if isinstance(item, _Failed):
+                raise item.exc
+            self.items += 1
+            yield item
+
+class Chain:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stop = threading.Event()
+        self.lanes: List[Lane] = []
+        self.walls = {}
+        self.threads: List[threading.Thread] = []
+
+    def _run(self, name: str, items: Iterable, lane: Lane):
+        t0 = time.perf_counter()
+        try:
+            for item in items:
+                lane.put(item)
+                if self.stop.is_set():
+                    return
+            lane.put(_DONE)
+        except BaseException as e:
+            lane.put(_Failed(e))
+        finally:
+            self.walls[name] = time.perf_counter() - t0
+
+    def stage(self, name: str, items: Iterable, maxsize: int = 1) -> Iterable:
+        """Produce `items` in a background thread; returns the (bounded) stream of its output."""
+        if not self.enabled:
+            return items
+        if isinstance(items, Lane):
+            items.consumer = name
+        lane = Lane(name, maxsize, self.stop)
+        self.lanes.append(lane)
+        t = threading.Thread(target=self._run, args=(name, items, lane), name=f"chain-{name}", daemon=True)
+        self.threads.append(t)
+        t.start()
+        return lane
+
+    def consume(self, name: str, items: Iterable) -> Iterator:
+        """The last stage, run by the calling thread."""
+        if isinstance(items, Lane):
+            items.consumer = name
+        t0 = time.perf_counter()
+        try:
+            yield from items
+        finally:
+            self.walls[name] = time.perf_counter() - t0
+
+    def report(self) -> dict:
+        """{stage: {wall_s, starved_s, blocked_s, busy_s, items}} in chain order."""
+        out = {}
+        for lane in self.lanes:
+            out.setdefault(lane.producer, {"starved_s": 0.0})["blocked_s"] = lane.put_wait
+            out[lane.producer]["items"] = lane.items
+            if lane.consumer:
+                out.setdefault(lane.consumer, {"blocked_s": 0.0})["starved_s"] = lane.get_wait
+        for name, d in out.items():
+            d.setdefault("blocked_s", 0.0)
+            d.setdefault("starved_s", 0.0)
+            d["wall_s"] = self.walls.get(name, 0.0)
+            d["busy_s"] = max(d["wall_s"] - d["blocked_s"] - d["starved_s"], 0.0)
+            for k in ("wall_s", "starved_s", "blocked_s", "busy_s"):
+                d[k] = round(d[k], 3)
+        return out
+
+    def close(self):
+        self.stop.set()
+        for lane in self.lanes:          # unblock producers waiting on a full queue
+            while True:
+                try:
+                    lane.q.get_nowait()
+                except queue.Empty:
+                    break
+        for t in self.threads:
+            t.join(timeout=1.0)
+
+    def __enter__(self) -> "Chain":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
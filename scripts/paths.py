@@ -0,0 +1,67 @@
+# cc-banking-intents/scripts/paths.py
+#
+# Profile-aware data directories shared by every stage.
+#
+#   full (default)  data/processed/                    the real corpus
+#   dev             data/profiles/dev/processed/       seeded from the full build's 1k sample
+#
+# The profile comes from CCBI_PROFILE (pipeline.py / ccbi.py --profile set it for the stages
+# they run). Hand-edited configs (speaker aliases, keywords, intent overrides) are shared;
+# generated ones (07's intent_mapping_draft.yaml) go to the profile's own configs/ so a dev
+# run never touches the full artifacts.
+#
+# A sharded run (shards.py) sets CCBI_SHARD=i/N: the stage then reads and writes
+# <processed dir>/shards/<i>of<N>/ instead, and the reduce step merges those into the
+# processed dir (BASE_PROC).
+#
+#   from paths import BASE, PROC, TRAIN_DIR, STREAM_DIR, CONF, GEN_CONF
+
+import os
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parents[1]
+CONF = BASE / "configs"
+FULL_PROC = BASE / "data" / "processed"
+
+PROFILES = ("full", "dev")
+PROFILE = os.environ.get("CCBI_PROFILE", "full") or "full"
+if PROFILE not in PROFILES:
+    raise SystemExit(f"CCBI_PROFILE must be one of {PROFILES}, got {PROFILE!r}")
+
+# what the dev profile is seeded from (written by 03 in the full profile)
+DEV_SOURCE = FULL_PROC / "banking_calls_sample_1k.parquet"
+
+def profile_root(profile: str = PROFILE) -> Path:
+    return BASE / "data" / "profiles" / profile
+
+def processed_dir(profile: str = PROFILE) -> Path:
+    return FULL_PROC if profile == "full" else profile_root(profile) / "processed"
+
+def generated_conf_dir(profile: str = PROFILE) -> Path:
+    return CONF if profile == "full" else profile_root(profile) / "configs"
+
+def parse_shard(s: str):
+    """"i/N" -> (i, N), or None for ""."""
+    if not s:
+        return None
+    try:
+        i, n = (int(x) for x in s.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must be i/N, got {s!r}")
+    if not 0 <= i < n:
+        raise ValueError(f"shard must be i/N with 0 <= i < N, got {s!r}")
+    return i, n
+
+def shard_dir(i: int, n: int, profile: str = PROFILE) -> Path:
+    return processed_dir(profile) / "shards" / f"{i:03d}of{n:03d}"
+
+try:
+    SHARD = parse_shard(os.environ.get("CCBI_SHARD", ""))
+except ValueError as e:
+    raise SystemExit(f"CCBI_SHARD: {e}")
+
+BASE_PROC = processed_dir()
+PROC = shard_dir(*SHARD) if SHARD else BASE_PROC
+TRAIN_DIR = PROC / "training"
+STREAM_DIR = PROC / "stream"      # stream_ingest.py's calls/ and features/ parts; 03 never rewrites them
+GEN_CONF = generated_conf_dir()
@@ -0,0 +1,376 @@
+# cc-banking-intents/scripts/pipeline.py
+#
+# Content-hashed DAG runner for the 03..11 scripts.
+#
+# Each stage declares the files it reads and writes. A stage is skipped when its
+# fingerprint (script, every local module it imports directly or indirectly, args, hashes of its inputs)
+# matches the last successful run and its outputs are still the ones that run produced.
+# Inputs produced by an upstream stage are identified by the hash that stage recorded,
+# so in-place steps (10d/11c rewrite the merged table) do not invalidate themselves.
+# Independent stages (e.g. 08/09 and 10b) run concurrently.
+#
+#   python3 scripts/pipeline.py                 # run everything that is stale
+#   python3 scripts/pipeline.py --dry-run       # show what would run
+#   python3 scripts/pipeline.py --targets 11    # only 11 and what it depends on
+#   python3 scripts/pipeline.py --with 11c      # include the optional whitelist step
+#   python3 scripts/pipeline.py --profile dev   # the whole DAG on the 1k sample (paths.py)
+
+import argparse, hashlib, json, os, re, subprocess, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from paths import BASE, CONF, GEN_CONF, PROC, TRAIN_DIR as TRAIN, PROFILE, PROFILES, DEV_SOURCE
+from sources import local_manifest
+
+SCRIPTS = BASE / "scripts"
+LOGS = BASE / "logs" / "pipeline" / PROFILE
+STATE_PATH = PROC / ".pipeline_state.json"
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: List[Path]
+    outputs: List[Path]
+    args: List[str] = field(default_factory=list)
+    optional: bool = False
+
+STAGES = [
+    Stage("03", "03_build_banking_subset.py",
+          [CONF / "speaker_aliases.yaml"],
+          [PROC / "banking_calls.parquet", PROC / "banking_calls_sample_1k.parquet",
+           PROC / "banking_call_features.parquet"]),
+    Stage("04", "04_eda_and_qc.py",
+          [PROC / "banking_calls.parquet", PROC / "banking_call_features.parquet"],
+          [PROC / "banking_spotcheck_200.csv"]),
+    Stage("05", "05_refine_banking_filter.py",
+          [PROC / "banking_calls.parquet", PROC / "banking_call_features.parquet"],
+          [PROC / "banking_calls_refined.parquet"]),
+    Stage("06", "06_intent_discovery_tfidf.py",
+          [PROC / "banking_calls_refined.parquet"],
+          [PROC / "intent_clusters_tfidf.csv", PROC / "intent_clusters_tfidf.json"]),
+    Stage("07", "07_curate_intents.py",
+          [PROC / "intent_clusters_tfidf.csv", PROC / "intent_clusters_tfidf.json",
+           CONF / "intent_mapping_overrides.yaml"],
+          [GEN_CONF / "intent_mapping_draft.yaml", PROC / "intent_catalog.jsonl"]),
+    Stage("08", "08_build_gold_scaffold.py",
+          [PROC / "intent_catalog.jsonl"],
+          [PROC / "gold_answers_todo.csv", PROC / "handoff_intents.csv"]),
+    Stage("09", "09_validate_outputs.py",
+          [PROC / "gold_answers_todo.csv", PROC / "handoff_intents.csv", PROC / "intent_catalog.jsonl"],
+          []),
+    Stage("10", "10_export_training_data.py",
+          [PROC / "intent_catalog.jsonl"],
+          [TRAIN / "utterances_answerable.parquet", TRAIN / "handoff_intents.json"]),
+    Stage("10b", "10b_seed_harvest.py",
+          [PROC / "banking_calls_refined.parquet"],
+          [TRAIN / "seed_harvest.parquet"]),
+    Stage("10c", "10c_merge_seeded.py",
+          [TRAIN / "utterances_answerable.parquet", TRAIN / "seed_harvest.parquet"],
+          [TRAIN / "utterances_answerable.merged.parquet"]),
+    Stage("10d", "10d_topup_targets.py",
+          [TRAIN / "utterances_answerable.merged.parquet", PROC / "banking_calls_refined.parquet"],
+          [TRAIN / "utterances_answerable.merged.parquet"]),
+    Stage("11c", "11c_enforce_answerable_whitelist.py",
+          [TRAIN / "utterances_answerable.merged.parquet"],
+          [TRAIN / "utterances_answerable.merged.parquet"],
+          args=["--no-rebuild"], optional=True),
+    Stage("11e", "11_build_eval_sets.py",
+          [TRAIN / "utterances_answerable.merged.parquet", PROC / "gold_answers_todo.csv"],
+          [TRAIN / "intent_train.parquet", TRAIN / "intent_dev.parquet", TRAIN / "faq_eval.jsonl"]),
+    Stage("11q", "11_quality_report.py",
+          [TRAIN / "intent_train.parquet", TRAIN / "intent_dev.parquet"],
+          []),
+    Stage("11", "11_baseline_intent.py",
+          [TRAIN / "intent_train.parquet", TRAIN / "intent_dev.parquet"],
+          []),
+]
+
+# Non-full profiles seed 03 from the full build's sample instead of the ZIPs
+if PROFILE != "full":
+    STAGES[0].inputs = [DEV_SOURCE]
+# Local mirror for 03 (sources.py): hash its manifest (or the ZIP directory without one)
+elif local_manifest():
+    STAGES[0].inputs.append(local_manifest())
+
+# -----------------------------
+# Hashing
+# -----------------------------
+class Hasher:
+    """sha256 of file contents, cached by (size, mtime) so unchanged files are not re-read."""
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+        self.lock = threading.Lock()
+
+    def file(self, path: Path) -> Optional[str]:
+        if path.is_dir():
+            h = hashlib.sha256()
+            for p in sorted(x for x in path.rglob("*") if x.is_file()):
+                h.update(str(p.relative_to(path)).encode())
+                h.update((self.file(p) or "").encode())
+            return h.hexdigest()
+        if not path.exists():
+            return None
+        st = path.stat()
+        key = str(path)
+        sig = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            hit = self.cache.get(key)
+            if hit and hit["sig"] == sig:
+                return hit["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        with self.lock:
+            self.cache[key] = {"sig": sig, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+IMPORT_PAT = re.compile(r"^\s*(?:from|import)\s+([A-Za-z_]\w*)", re.M)
+
+def code_files(script: str) -> List[Path]:
+    """The stage script plus every local module it reaches through imports, transitively."""
+    path = SCRIPTS / script
+    files, seen, todo = [], {path}, [path]
+    while todo:
+        f = todo.pop()
+        files.append(f)
+        text = f.read_text()
+        for mod in set(IMPORT_PAT.findall(text)):
+            helper = SCRIPTS / f"{mod}.py"
+            if helper.exists() and helper not in seen:
+                seen.add(helper)
+                todo.append(helper)
+    return [path] + sorted(files[1:])
+
+def rel(p: Path) -> str:
+    try:
+        return str(p.relative_to(BASE))
+    except ValueError:
+        return str(p)
+
+# -----------------------------
+# Graph
+# -----------------------------
+def build_graph(stages: List[Stage]) -> Dict[str, Dict[Path, Optional[str]]]:
+    """For every stage: input path -> name of the stage that produces it (None = external)."""
+    producers: Dict[Path, str] = {}
+    graph = {}
+    for st in stages:
+        graph[st.name] = {p: producers.get(p) for p in st.inputs}
+        for p in st.outputs:
+            producers[p] = st.name
+    return graph
+
+def select(stages: List[Stage], graph, targets: List[str]) -> List[Stage]:
+    if not targets:
+        return stages
+    keep, todo = set(), list(targets)
+    while todo:
+        n = todo.pop()
+        if n in keep:
+            continue
+        keep.add(n)
+        todo.extend(d for d in graph[n].values() if d)
+    return [s for s in stages if s.name in keep]
+
+def critical_path(stages: List[Stage], graph, durations: Dict[str, float]):
+    finish, prev = {}, {}
+    for st in stages:   # declaration order is a topological order
+        deps = {d for d in graph[st.name].values() if d and d in finish}
+        best = max(deps, key=lambda d: finish[d], default=None)
+        finish[st.name] = (finish[best] if best else 0.0) + durations.get(st.name, 0.0)
+        prev[st.name] = best
+    if not finish:
+        return [], 0.0
+    end = max(finish, key=finish.get)
+    path = [end]
+    while prev[path[-1]]:
+        path.append(prev[path[-1]])
+    return path[::-1], finish[end]
+
+# -----------------------------
+# Runner
+# -----------------------------
+class Runner:
+    def __init__(self, stages: List[Stage], graph, state: dict, jobs: int, force: set, dry_run: bool):
+        self.stages = {s.name: s for s in stages}
+        self.order = [s.name for s in stages]
+        self.graph = graph
+        self.state = state
+        self.hasher = Hasher(state.setdefault("hash_cache", {}))
+        self.jobs = jobs
+        self.force = force
+        self.dry_run = dry_run
+        self.status: Dict[str, str] = {}
+        self.durations: Dict[str, float] = {}
+
+    def fingerprint(self, st: Stage) -> str:
+        h = hashlib.sha256()
+        for f in code_files(st.script):
+            h.update(f.name.encode())
+            h.update((self.hasher.file(f) or "").encode())
+        h.update(json.dumps(st.args).encode())
+        for p, producer in self.graph[st.name].items():
+            h.update(rel(p).encode())
+            if producer:
+                # the hash the producer recorded, not the file as it is now (in-place stages)
+                rec = self.state["stages"].get(producer, {}).get("outputs", {})
+                h.update((rec.get(rel(p)) or "").encode())
+            else:
+                h.update((self.hasher.file(p) or "missing").encode())
+        return h.hexdigest()
+
+    def is_fresh(self, st: Stage, fp: str) -> bool:
+        rec = self.state["stages"].get(st.name)
+        if not rec or rec.get("fingerprint") != fp or st.name in self.force:
+            return False
+        # outputs must still be what that run wrote (not deleted, not hand-edited),
+        # unless a later in-place stage has legitimately rewritten them
+        for p in st.outputs:
+            owner = self.last_writer(p)
+            if owner == st.name and self.hasher.file(p) != rec["outputs"].get(rel(p)):
+                return False
+            if not p.exists():
+                return False
+        return True
+
+    def last_writer(self, path: Path) -> Optional[str]:
+        owner = None
+        for n in self.order:
+            if path in self.stages[n].outputs:
+                owner = n
+        return owner
+
+    def execute(self, st: Stage) -> str:
+        if self.dry_run and any(self.status.get(d) == "stale" for d in self.graph[st.name].values() if d):
+            # can't know whether upstream outputs will change without running it
+            self.durations[st.name] = 0.0
+            return "stale"
+        fp = self.fingerprint(st)
+        if self.is_fresh(st, fp):
+            self.durations[st.name] = 0.0
+            return "fresh"
+        if self.dry_run:
+            self.durations[st.name] = 0.0
+            return "stale"
+        # An input rewritten in place by a later stage (10d/11c on the merged table) is no
+        # longer what its producer wrote: regenerate it before re-running this stage.
+        for p, producer in self.graph[st.name].items():
+            rec = self.state["stages"].get(producer, {}).get("outputs", {}) if producer else {}
+            if producer and self.hasher.file(p) != rec.get(rel(p)):
+                print(f"[{st.name}] regenerating {rel(p)} via {producer}", flush=True)
+                up = self.stages[producer]
+                up_fp = self.fingerprint(up)
+                t0 = time.perf_counter()
+                ret = self.spawn(up)
+                if ret != 0:
+                    return f"failed (upstream {producer} exit {ret})"
+                self.record(up, up_fp, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        ret = self.spawn(st)
+        dur = time.perf_counter() - t0
+        self.durations[st.name] = dur
+        if ret != 0:
+            return f"failed (exit {ret}, see {rel(LOGS / (st.name + '.log'))})"
+        self.record(st, fp, dur)
+        return "ran"
+
+    def record(self, st: Stage, fp: str, dur: float):
+        self.state["stages"][st.name] = {
+            "fingerprint": fp,
+            "outputs": {rel(p): self.hasher.file(p) for p in st.outputs},
+            "duration_s": round(dur, 3),
+            "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+    def spawn(self, st: Stage) -> int:
+        LOGS.mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ)
+        with open(LOGS / f"{st.name}.log", "w") as log:
+            return subprocess.call([sys.executable, str(SCRIPTS / st.script), *st.args],
+                                   cwd=BASE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    def run(self):
+        pending = list(self.order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for n in list(pending):
+                    deps = {d for d in self.graph[n].values() if d and d in self.stages}
+                    if any(self.status.get(d, "").startswith(("failed", "blocked")) for d in deps):
+                        self.status[n] = "blocked"
+                        pending.remove(n)
+                        print(f"[{n}] blocked by failed upstream")
+                        continue
+                    if all(d in self.status for d in deps):
+                        pending.remove(n)
+                        running[pool.submit(self.execute, self.stages[n])] = n
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    n = running.pop(fut)
+                    try:
+                        self.status[n] = fut.result()
+                    except Exception as e:  # hashing/IO errors should not hang the loop
+                        self.status[n] = f"failed ({e})"
+                    print(f"[{n}] {self.status[n]} ({self.durations.get(n, 0.0):.2f}s)", flush=True)
+
+def load_state() -> dict:
+    if STATE_PATH.exists():
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return {"stages": {}, "hash_cache": {}}
+
+def save_state(state: dict):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_PATH.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    tmp.replace(STATE_PATH)
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the pipeline as a content-hashed DAG.")
+    ap.add_argument("--targets", nargs="*", default=[], help="stage names to bring up to date (default: all)")
+    ap.add_argument("--with", dest="with_optional", nargs="*", default=[], help="optional stages to include (11c)")
+    ap.add_argument("--skip", nargs="*", default=[], help="stages to leave out (e.g. 03 on air-gapped boxes)")
+    ap.add_argument("--force", nargs="*", default=[], help="re-run these stages even if fresh")
+    ap.add_argument("--jobs", type=int, default=max(1, min(4, os.cpu_count() or 1)))
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--profile", choices=PROFILES, default=PROFILE,
+                    help="data profile: full (data/processed) or dev (1k sample, data/profiles/dev)")
+    args = ap.parse_args()
+    if args.profile != PROFILE:
+        # paths are resolved at import time, so restart under the requested profile
+        os.environ["CCBI_PROFILE"] = args.profile
+        os.execv(sys.executable, [sys.executable, str(Path(__file__).resolve())] + sys.argv[1:])
+    print(f"Profile: {PROFILE} ({rel(PROC)})")
+
+    stages = [s for s in STAGES
+              if (not s.optional or s.name in args.with_optional) and s.name not in args.skip]
+    graph = build_graph(stages)
+    stages = select(stages, graph, args.targets)
+
+    state = load_state()
+    runner = Runner(stages, graph, state, args.jobs, set(args.force), args.dry_run)
+    t0 = time.perf_counter()
+    runner.run()
+    wall = time.perf_counter() - t0
+    if not args.dry_run:
+        save_state(state)
+
+    ran = [n for n, s in runner.status.items() if s == "ran"]
+    path, cp = critical_path([s for s in stages if s.name in ran], graph, runner.durations)
+    print(f"\nStages: {len(stages)} | ran: {len(ran)} | fresh: "
+          f"{sum(s == 'fresh' for s in runner.status.values())} | wall {wall:.2f}s "
+          f"| serial sum {sum(runner.durations.values()):.2f}s")
+    if ran:
+        print(f"Critical path: {' -> '.join(path)} ({cp:.2f}s)")
+    if any(s.startswith(("failed", "blocked")) for s in runner.status.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
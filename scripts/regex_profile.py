@@ -0,0 +1,254 @@
+# cc-banking-intents/scripts/regex_profile.py
+#
+# Opt-in cost profiler for the hand-written rule regexes.
+#
+# Scripts register their patterns through `profiled("BANKING_PAT", re.compile(...))` (or
+# `profiled_table("SEEDS", {...})` for per-intent tables). With profiling off this returns
+# the compiled pattern itself, so there is no overhead. With CCBI_REGEX_PROFILE=1 every
+# call is timed, hits are counted, and inputs that take longer than the per-pattern budget
+# (CCBI_REGEX_BUDGET_MS, default 5 ms) are kept as "pathological" samples. The stats land
+# in the run report (see instrument.py).
+#
+# Offline mode replays every registered rule table over a call table (--stress adds a
+# growth test on long near-miss inputs to catch catastrophic backtracking):
+#   python3 scripts/regex_profile.py --corpus data/processed/banking_calls.parquet --stress
+
+import argparse, heapq, importlib, json, os, re, sys, time
+from pathlib import Path
+
+ENABLED = os.environ.get("CCBI_REGEX_PROFILE", "") not in ("", "0")
+BUDGET_MS = float(os.environ.get("CCBI_REGEX_BUDGET_MS", "5"))
+KEEP_SLOW = 5          # worst inputs kept per pattern
+
+_REGISTRY = {}
+
+class PatternStats:
+    def __init__(self, name: str, pattern: str):
+        self.name = name
+        self.pattern = pattern
+        self.calls = 0
+        self.hits = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.chars = 0
+        self.over_budget = 0
+        self.slow = []      # min-heap of (seconds, len, snippet)
+
+    def record(self, elapsed: float, text, hit: bool):
+        self.calls += 1
+        self.total_s += elapsed
+        self.hits += bool(hit)
+        n = len(text) if text is not None else 0
+        self.chars += n
+        if elapsed > self.max_s:
+            self.max_s = elapsed
+        if elapsed * 1000.0 > BUDGET_MS:
+            self.over_budget += 1
+            item = (elapsed, n, str(text)[:160])
+            if len(self.slow) < KEEP_SLOW:
+                heapq.heappush(self.slow, item)
+            else:
+                heapq.heappushpop(self.slow, item)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "pattern": self.pattern,
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.calls, 4) if self.calls else None,
+            "total_ms": round(self.total_s * 1000.0, 3),
+            "mean_us": round(self.total_s / self.calls * 1e6, 3) if self.calls else None,
+            "max_ms": round(self.max_s * 1000.0, 3),
+            "us_per_kchar": round(self.total_s * 1e9 / self.chars, 3) if self.chars else None,
+            "over_budget": self.over_budget,
+            "slow_inputs": [
+                {"ms": round(s * 1000.0, 3), "chars": n, "snippet": snip}
+                for s, n, snip in sorted(self.slow, reverse=True)
+            ],
+        }
+
+class ProfiledPattern:
+    """Drop-in stand-in for a compiled pattern that times every call."""
+
+    def __init__(self, name: str, compiled):
+        self._re = compiled
+        pattern = compiled.pattern
+        if isinstance(pattern, bytes):                  # bytes patterns (03's raw prefilter)
+            pattern = pattern.decode("latin-1")
+        self.stats = _REGISTRY.setdefault(name, PatternStats(name, pattern))
+        self.pattern = compiled.pattern
+        self.flags = compiled.flags
+
+    def _timed(self, fn, text, *args, **kw):
+        t0 = time.perf_counter()
+        res = fn(text, *args, **kw)
+        self.stats.record(time.perf_counter() - t0, text, res)
+        return res
+
+    def search(self, text, *a, **kw):
+        return self._timed(self._re.search, text, *a, **kw)
+
+    def match(self, text, *a, **kw):
+        return self._timed(self._re.match, text, *a, **kw)
+
+    def fullmatch(self, text, *a, **kw):
+        return self._timed(self._re.fullmatch, text, *a, **kw)
+
+    def findall(self, text, *a, **kw):
+        return self._timed(self._re.findall, text, *a, **kw)
+
+    def finditer(self, text, *a, **kw):
+        # materialize so the scan is charged here, not to the consumer's loop
+        return iter(self._timed(lambda t, *x, **y: list(self._re.finditer(t, *x, **y)), text, *a, **kw))
+
+    def split(self, text, *a, **kw):
+        t0 = time.perf_counter()
+        res = self._re.split(text, *a, **kw)
+        self.stats.record(time.perf_counter() - t0, text, len(res) > 1)
+        return res
+
+    def sub(self, repl, text, *a, **kw):
+        t0 = time.perf_counter()
+        res, n = self._re.subn(repl, text, *a, **kw)
+        self.stats.record(time.perf_counter() - t0, text, n)
+        return res
+
+    def subn(self, repl, text, *a, **kw):
+        t0 = time.perf_counter()
+        res = self._re.subn(repl, text, *a, **kw)
+        self.stats.record(time.perf_counter() - t0, text, res[1])
+        return res
+
+def profiled(name: str, compiled):
+    return ProfiledPattern(name, compiled) if ENABLED else compiled
+
+def profiled_table(prefix: str, table: dict) -> dict:
+    """Wrap a {intent: compiled} rule table; entries are reported as PREFIX[intent]."""
+    return {k: profiled(f"{prefix}[{k}]", v) for k, v in table.items()}
+
+def profiled_rules(prefix: str, rules: list) -> list:
+    """Wrap a [(compiled, label), ...] rule list."""
+    return [(profiled(f"{prefix}[{label}]", pat), label) for pat, label in rules]
+
+def stats() -> list:
+    """Per-pattern stats, most expensive first."""
+    return sorted((s.to_dict() for s in _REGISTRY.values() if s.calls),
+                  key=lambda d: d["total_ms"], reverse=True)
+
+def print_summary(rows: list, top: int = 15):
+    if not rows:
+        return
+    print(f"\nRegex cost (top {min(top, len(rows))} of {len(rows)}, budget {BUDGET_MS} ms/call):")
+    print(f"{'pattern':48s} {'calls':>9s} {'hits':>8s} {'total_ms':>10s} {'max_ms':>8s} {'>budget':>8s}")
+    for r in rows[:top]:
+        print(f"{r['name'][:48]:48s} {r['calls']:9d} {r['hits']:8d} {r['total_ms']:10.1f} "
+              f"{r['max_ms']:8.2f} {r['over_budget']:8d}")
+
+# -----------------------------
+# Offline replay over a call table
+# -----------------------------
+# (script module, attributes holding patterns or rule tables, granularity the script applies them at)
+RULE_SOURCES = [
+    ("features", ["BANKING_PAT", "POS", "NEG", "LINE_SPLIT", "PLACEHOLDER"], "call"),   # 03 / 05
+    ("features", ["LINE_PREFIX"], "line"),                                               # 03 (role resolution)
+    ("06_intent_discovery_tfidf", ["FIRST_PERSON", "BANK_TERMS"], "line"),
+    ("06_intent_discovery_tfidf", ["INTENT_RULES"], "line"),
+    ("10b_seed_harvest", ["COMPILED"], "line"),
+    ("10c_merge_seeded", ["COMPILED"], "line"),
+    ("10d_topup_targets", ["PATS"], "line"),
+]
+SENT_SPLIT = re.compile(r"(?<=[\.\?\!])\s+|\n+")
+
+def collect_patterns() -> dict:
+    out = {"call": [], "line": []}
+    for mod_name, attrs, level in RULE_SOURCES:
+        mod = importlib.import_module(mod_name)
+        for attr in attrs:
+            obj = getattr(mod, attr)
+            if isinstance(obj, dict):
+                out[level].extend(obj.values())
+            elif isinstance(obj, list):
+                out[level].extend(p for p, _ in obj)
+            else:
+                out[level].append(obj)
+    return out
+
+# Near-miss filler: lots of partial matches for the `.*`-joined alternations, few full ones
+STRESS_TEXT = "i lost the statement then locked my new login and the pay fee was late "
+STRESS_SIZES = (1_000, 10_000, 100_000)
+
+def stress(patterns: list) -> list:
+    """
+    Time each pattern on growing near-miss inputs. A 10x longer input should cost ~10x;
+    a much larger growth ratio means super-linear (backtracking) behaviour.
+    """
+    rows = []
+    for pat in patterns:
+        times = []
+        for n in STRESS_SIZES:
+            text = (STRESS_TEXT * (n // len(STRESS_TEXT) + 1))[:n]
+            t0 = time.perf_counter()
+            pat.search(text)
+            pat.findall(text)
+            times.append(time.perf_counter() - t0)
+        growth = times[-1] / times[-2] if times[-2] else None
+        rows.append({
+            "pattern": pat.stats.name if isinstance(pat, ProfiledPattern) else pat.pattern,
+            "ms": [round(t * 1000.0, 3) for t in times],
+            "growth_10x": round(growth, 1) if growth else None,
+            "superlinear": bool(growth and growth > 30),
+        })
+    return sorted(rows, key=lambda r: r["ms"][-1], reverse=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay all rule regexes over a call table and rank them by cost.")
+    ap.add_argument("--corpus", type=Path, required=True, help="call table (turns, or customer_text/full_text)")
+    ap.add_argument("--limit", type=int, default=None, help="only the first N calls")
+    ap.add_argument("--out", type=Path, help="write the stats as JSON")
+    ap.add_argument("--stress", action="store_true",
+                    help="also time every pattern on growing near-miss inputs to spot super-linear rules")
+    args = ap.parse_args()
+
+    # The scripts import this file as `regex_profile`, not `__main__`: switch profiling on
+    # through the environment before that import so their patterns get wrapped.
+    os.environ["CCBI_REGEX_PROFILE"] = "1"
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import regex_profile as rp
+    from tables import load_calls, as_text
+
+    patterns = rp.collect_patterns()
+    df = load_calls(args.corpus, ["customer_text", "full_text"], filter=None)
+    if args.limit:
+        df = df.head(args.limit)
+    for cust, full in zip(as_text(df["customer_text"]), as_text(df["full_text"])):
+        for text in (cust, full):
+            if not text:
+                continue
+            for pat in patterns["call"]:
+                pat.search(text)
+            for line in SENT_SPLIT.split(text):
+                line = line.strip()
+                if not line:
+                    continue
+                for pat in patterns["line"]:
+                    pat.search(line)
+
+    rows = rp.stats()
+    rp.print_summary(rows, top=len(rows))
+    report = {"patterns": rows}
+
+    if args.stress:
+        report["stress"] = rp.stress(patterns["call"] + patterns["line"])
+        print(f"\nStress test ({' / '.join(f'{n:,}' for n in STRESS_SIZES)} chars):")
+        for r in report["stress"]:
+            flag = "  <-- super-linear" if r["superlinear"] else ""
+            print(f"{r['pattern'][:48]:48s} {r['ms']} ms  x{r['growth_10x']}{flag}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Wrote:", args.out)
+
+if __name__ == "__main__":
+    main()
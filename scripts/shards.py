@@ -0,0 +1,252 @@
+# cc-banking-intents/scripts/shards.py
+#
+# Sharded runs of the ZIP-scale stages (03 build, 05 refine, 10b seed harvest). CCBI_SHARD=i/N
+# (paths.py) points a stage at data/processed/shards/<i>of<N>/. There, 03 inflates only the ZIP
+# members that hash to shard i (member_shard), so N processes or hosts split the scan. Each
+# shard's call table records every call's position in the single-node scan (`shard_pos` = ZIP
+# index << 32 | member index). The reduce step uses it to put the shard outputs back together
+# byte-identical to a single-node run:
+#
+#   03   shard call tables sorted by shard_pos, then a global first-wins dedupe on `hash`; the
+#        call table, 1k sample, feature table and dedupe-index segments are written as 03 writes
+#        them. Each shard's tables are pruned to the calls kept globally, so the later shard
+#        stages only see those
+#   05   refined shard tables sorted by shard_pos
+#   10b  shard seeds sorted by (shard_pos, line), then the global (intent_id, lowercased
+#        utterance) dedupe 10b does
+#
+#   python3 scripts/shards.py run --n 4                     # 03 -> 05 -> 10b, 4 local workers each
+#   python3 scripts/shards.py run --n 8 --jobs 4 --stages 03
+#   CCBI_SHARD=2/8 python3 scripts/03_build_banking_subset.py   # one shard, e.g. on another host
+#   python3 scripts/shards.py reduce --n 8 --stages 03          # once all 8 shard dirs are in place
+#
+# Worker logs go to logs/shards/. 04 (EDA) and the stages after 10b read the reduced outputs.
+
+import argparse, hashlib, json, os, subprocess, sys, time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from paths import BASE, BASE_PROC, PROFILE, shard_dir
+
+SHARD_POS = "shard_pos"
+SHARD_STATS = "shard.json"         # 03's per-shard counters (checked, kept, prefilter, dedupe)
+LOG_DIR = BASE / "logs" / "shards"
+SCRIPTS = Path(__file__).resolve().parent
+
+def member_shard(zname: str, name: str, n: int) -> int:
+    """Shard of a ZIP member: stable across hosts and Python runs (not hash())."""
+    digest = hashlib.blake2b(f"{zname}/{name}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % n
+
+def scan_pos(zip_index: int, member_index: int) -> int:
+    """Position of a member in the single-node scan (the source's ZIP order, then namelist order)."""
+    return zip_index << 32 | member_index
+
+def shard_dirs(n: int) -> List[Path]:
+    return [shard_dir(i, n) for i in range(n)]
+
+def shard_stats(n: int) -> List[Optional[dict]]:
+    out = []
+    for d in shard_dirs(n):
+        p = d / SHARD_STATS
+        out.append(json.loads(p.read_text()) if p.exists() else None)
+    return out
+
+def live_shards(n: int) -> List[int]:
+    """Shards with calls left after 03 (and its reduce); an empty shard writes no tables."""
+    stats = shard_stats(n)
+    missing = [i for i, s in enumerate(stats) if s is None]
+    if missing:
+        raise SystemExit(f"shards {missing} of {n} have no {SHARD_STATS}; run 03 for them first.")
+    return [i for i, s in enumerate(stats) if s.get("kept_global", s["kept"])]
+
+def stage_module(module: str):
+    import importlib
+    if str(SCRIPTS) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS))
+    return importlib.import_module(module)
+
+def sorted_table(paths: List[Path], by: List[str]):
+    """Concatenated shard tables in single-node order, as one chunk per column."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    table = pa.concat_tables([pq.read_table(p) for p in paths]).combine_chunks()
+    return table.take(pc.sort_indices(table, [(c, "ascending") for c in by])).combine_chunks()
+
+# -----------------------------
+# Reducers
+# -----------------------------
+def reduce_build(n: int, run) -> dict:
+    """03: global call table, sample, features and index segments; prunes the shard tables."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    from tables import to_pandas, write_parquet, arrow_strings
+    from features import FEATURES
+    from dedupe_index import DedupeIndex, INDEX_DIR, keys_from_hex
+    build = stage_module("03_build_banking_subset")
+
+    stats = shard_stats(n)
+    live = live_shards(n)
+    zips = stats[0]["zips"]
+    if any(s["zips"] != zips for s in stats):
+        raise SystemExit("shards scanned different ZIP lists; re-run them against the same source.")
+
+    with run.step("load") as st:
+        parts = {}
+        for i in live:
+            d = shard_dirs(n)[i]
+            table = pq.read_table(run.read(d / "banking_calls.parquet"))
+            ft = pq.read_table(run.read(d / FEATURES.name))
+            if ft.num_rows != table.num_rows:
+                raise SystemExit(f"shard {i}: feature table does not match its call table; re-run it.")
+            parts[i] = (table, ft.append_column(SHARD_POS, table.column(SHARD_POS)))
+        calls = pa.concat_tables([c for c, _ in parts.values()]).combine_chunks()
+        feats = pa.concat_tables([f for _, f in parts.values()]).combine_chunks()
+        order = pc.sort_indices(calls.column(SHARD_POS))
+        calls, feats = calls.take(order), feats.take(order)
+        st.rows_out = calls.num_rows
+
+    with run.step("dedupe") as st:
+        st.rows_in = calls.num_rows
+        seen, keep = set(), []
+        for h in calls.column("hash").to_pylist():
+            keep.append(h not in seen)
+            seen.add(h)
+        keep = pa.array(keep)
+        calls, feats = calls.filter(keep).combine_chunks(), feats.filter(keep).combine_chunks()
+        st.rows_out = calls.num_rows
+
+    with run.step("prune"):
+        # shard tables keep only the globally kept calls (05 / 10b shards read them)
+        kept_pos = calls.column(SHARD_POS)
+        for i, (table, ft) in parts.items():
+            mine = pc.is_in(table.column(SHARD_POS), value_set=kept_pos)
+            d = shard_dirs(n)[i]
+            stats[i]["kept_global"] = pc.sum(mine).as_py() or 0
+            (d / SHARD_STATS).write_text(json.dumps(stats[i], indent=2))
+            if stats[i]["kept_global"] in (0, table.num_rows):
+                continue
+            write_parquet(to_pandas(table.filter(mine)), d / "banking_calls.parquet")
+            write_parquet(to_pandas(ft.filter(mine).drop_columns([SHARD_POS])), d / FEATURES.name)
+
+    with run.step("write") as st:
+        df = to_pandas(calls.drop_columns([SHARD_POS]))
+        build.write_outputs(df, arrow_strings(to_pandas(feats.drop_columns([SHARD_POS]))), run)
+        index = DedupeIndex(INDEX_DIR if build.DEDUPE_INDEX else None, exclude=zips)
+        for zname, hashes in df.groupby("source_zip", observed=True)["hash"]:
+            index.add(keys_from_hex(hashes), zname)
+        for path in index.commit(zips):
+            run.wrote(path)
+        st.rows_out = len(df)
+
+    out = {"shards": n, "live": len(live), "checked": sum(s["checked"] for s in stats),
+           "kept": len(df), "dup_across_shards": int(len(keep) - len(df))}
+    print(f"[03] {n} shards: checked {out['checked']:,} | kept {out['kept']:,} "
+          f"({out['dup_across_shards']:,} duplicates across shards) -> {BASE_PROC / 'banking_calls.parquet'}")
+    return out
+
+def reduce_refine(n: int, run) -> dict:
+    """05: refined shard tables in scan order."""
+    from tables import to_pandas, write_parquet
+    paths = [shard_dirs(n)[i] / "banking_calls_refined.parquet" for i in live_shards(n)]
+    with run.step("load") as st:
+        table = sorted_table([run.read(p) for p in paths], [SHARD_POS])
+        st.rows_out = table.num_rows
+    out = BASE_PROC / "banking_calls_refined.parquet"
+    with run.step("write") as st:
+        write_parquet(to_pandas(table.drop_columns([SHARD_POS])), out)
+        run.wrote(out)
+        st.rows_out = table.num_rows
+    print(f"[05] {len(paths)} shards: refined {table.num_rows:,} calls -> {out}")
+    return {"shards": n, "kept": table.num_rows}
+
+def reduce_harvest(n: int, run) -> dict:
+    """10b: shard seeds in (call, line) order, deduped as one 10b run would."""
+    from tables import to_pandas
+    from training import SEEDS, write_table
+    harvest = stage_module("10b_seed_harvest")
+    paths = [shard_dirs(n)[i] / "training" / SEEDS.name for i in live_shards(n)]
+    with run.step("load") as st:
+        table = sorted_table([run.read(p) for p in paths], [SHARD_POS, harvest.LINE])
+        st.rows_out = table.num_rows
+    with run.step("dedupe") as st:
+        st.rows_in = table.num_rows
+        seeds = harvest.dedupe_seeds(to_pandas(table.drop_columns([SHARD_POS, harvest.LINE])))
+        st.rows_out = len(seeds)
+    SEEDS.parent.mkdir(parents=True, exist_ok=True)
+    with run.step("write") as st:
+        run.wrote(write_table(seeds, SEEDS))
+        st.rows_out = len(seeds)
+    print(f"[10b] {len(paths)} shards: {len(seeds):,} seeds -> {SEEDS}")
+    return {"shards": n, "seeds": len(seeds)}
+
+# stage -> (script, reducer)
+STAGES = {
+    "03": ("03_build_banking_subset", reduce_build),
+    "05": ("05_refine_banking_filter", reduce_refine),
+    "10b": ("10b_seed_harvest", reduce_harvest),
+}
+
+def reduce(stage: str, n: int) -> dict:
+    from instrument import RunReport
+    with RunReport(f"shards_reduce_{stage}") as run:
+        out = STAGES[stage][1](n, run)
+        run.note(**out)
+    return out
+
+# -----------------------------
+# Local driver
+# -----------------------------
+def run_shards(stage: str, n: int, jobs: int, shards: Optional[List[int]] = None) -> Dict[int, float]:
+    """Run one stage for every shard as local processes (at most `jobs` at a time); shard -> wall s."""
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    script = SCRIPTS / f"{STAGES[stage][0]}.py"
+    todo = list(range(n) if shards is None else shards)
+    running, walls, failed = {}, {}, []
+    while todo or running:
+        while todo and len(running) < jobs:
+            i = todo.pop(0)
+            log = open(LOG_DIR / f"{stage}.{i:03d}of{n:03d}.log", "w")
+            env = {**os.environ, "CCBI_SHARD": f"{i}/{n}"}
+            running[i] = (subprocess.Popen([sys.executable, str(script)], env=env, cwd=BASE,
+                                           stdout=log, stderr=subprocess.STDOUT), log, time.perf_counter())
+        time.sleep(0.05)
+        for i, (proc, log, t0) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            log.close()
+            walls[i] = round(time.perf_counter() - t0, 2)
+            if proc.returncode:
+                failed.append(i)
+            del running[i]
+    if failed:
+        raise SystemExit(f"[{stage}] shards {sorted(failed)} failed; see {LOG_DIR}")
+    print(f"[{stage}] {n} shards done; slowest {max(walls.values()):.1f}s (logs: {LOG_DIR})")
+    return walls
+
+def main():
+    ap = argparse.ArgumentParser(description="Sharded 03 / 05 / 10b runs and their reduce step.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the stages' shards as local processes, reducing after each stage")
+    r.add_argument("--n", type=int, required=True, help="number of shards")
+    r.add_argument("--jobs", type=int, default=None, help="concurrent shard processes (default: --n)")
+    r.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    m = sub.add_parser("reduce", help="reduce shard outputs that are already in place")
+    m.add_argument("--n", type=int, required=True)
+    m.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    args = ap.parse_args()
+    if PROFILE != "full":
+        raise SystemExit(f"sharded runs rebuild from the ZIPs; the {PROFILE} profile is seeded by a plain 03 run.")
+    if args.n < 1:
+        raise SystemExit("--n must be >= 1")
+
+    for stage in args.stages:
+        if args.cmd == "run":
+            # an empty shard has no call table for 05 / 10b to read
+            run_shards(stage, args.n, args.jobs or args.n, None if stage == "03" else live_shards(args.n))
+        reduce(stage, args.n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+# cc-banking-intents/scripts/sketches.py
+#
+# Bounded-memory, mergeable summaries for streaming EDA (04_eda_and_qc.py --stream):
+#
+#   HeavyHitters(capacity)  Space-Saving top-k counter. Counts are upper bounds; count - err is a
+#                           guaranteed lower bound. Any item with true frequency > n / capacity is kept.
+#   KLL(k)                  KLL quantile sketch: rank error ~ 1.7/k with O(k) stored values
+#                           (k=200 -> about +-1% rank), plus exact n / min / max / mean.
+#   Reservoir(size)         uniform sample without replacement (Algorithm R).
+#
+# All three are updated one batch at a time, merged with .merge(other), and round-trip through
+# JSON (to_dict / from_dict). Shards can therefore be summarised in separate processes and
+# combined afterwards. Merging is order-independent up to the sketches' own error bounds.
+
+import heapq, math, random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# -----------------------------
+# Heavy hitters (Space-Saving)
+# -----------------------------
+class HeavyHitters:
+    def __init__(self, capacity: int = 5000):
+        self.capacity = capacity
+        self.n = 0                                  # total weight seen
+        self.counts: Dict[str, List[int]] = {}      # item -> [count, err]
+
+    def _floor(self) -> int:
+        # weight an item missing from a full summary may have had (0 while not full)
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(c for c, _ in self.counts.values())
+
+    def update(self, items: Iterable[str]):
+        self.update_counts(Counter(items))
+
+    def update_counts(self, counts: Dict[str, int]):
+        """Fold an exact per-batch Counter in (it is merged as an error-free summary)."""
+        other = HeavyHitters(len(counts) + 1)       # never "full", so its floor is 0
+        other.n = sum(counts.values())
+        other.counts = {k: [int(v), 0] for k, v in counts.items()}
+        self.merge(other)
+
+    def merge(self, other: "HeavyHitters") -> "HeavyHitters":
+        """Mergeable-summaries rule: an item missing on one side counts that side's floor."""
+        f1, f2 = self._floor(), other._floor()
+        merged = {}
+        for item in self.counts.keys() | other.counts.keys():
+            c1, e1 = self.counts.get(item, (f1, f1))
+            c2, e2 = other.counts.get(item, (f2, f2))
+            merged[item] = [c1 + c2, e1 + e2]
+        if len(merged) > self.capacity:
+            keep = heapq.nlargest(self.capacity, merged.items(), key=lambda kv: (kv[1][0], kv[0]))
+            merged = dict(keep)
+        self.counts = merged
+        self.n += other.n
+        return self
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """[(item, count, guaranteed_min)] by descending count (ties by item)."""
+        items = sorted(self.counts.items(), key=lambda kv: (-kv[1][0], kv[0]))[:n]
+        return [(k, c, c - e) for k, (c, e) in items]
+
+    def to_dict(self) -> dict:
+        return {"type": "heavy_hitters", "capacity": self.capacity, "n": self.n, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "HeavyHitters":
+        hh = cls(d["capacity"])
+        hh.n = d["n"]
+        hh.counts = {k: list(v) for k, v in d["counts"].items()}
+        return hh
+
+# -----------------------------
+# Quantiles (KLL)
+# -----------------------------
+class KLL:
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+        self.levels: List[List[float]] = [[]]       # level h holds items of weight 2**h
+        self._rng = random.Random(seed)
+
+    def _capacity(self, h: int) -> int:
+        # top level gets k, lower levels shrink geometrically (c = 2/3)
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(l) for l in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for h, level in enumerate(self.levels):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self.levels):
+                        self.levels.append([])
+                    level.sort()
+                    # an odd item stays behind; the rest is halved with a random offset
+                    keep = [level.pop()] if len(level) % 2 else []
+                    off = self._rng.random() < 0.5
+                    self.levels[h + 1].extend(level[off::2])
+                    self.levels[h] = keep
+                    break
+
+    def update(self, x: float):
+        self.update_many([x])
+
+    def update_many(self, xs: Iterable[float]):
+        xs = [float(x) for x in xs]
+        if not xs:
+            return
+        self.n += len(xs)
+        self.sum += math.fsum(xs)
+        self.min = min(self.min, min(xs))
+        self.max = max(self.max, max(xs))
+        self.levels[0].extend(xs)
+        self._compress()
+
+    def merge(self, other: "KLL") -> "KLL":
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.n:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        weighted = sorted((x, 1 << h) for h, level in enumerate(self.levels) for x in level)
+        total = sum(w for _, w in weighted)
+        target, cum = q * total, 0
+        for x, w in weighted:
+            cum += w
+            if cum >= target:
+                return x
+        return self.max
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.n if self.n else None
+
+    def to_dict(self) -> dict:
+        return {"type": "kll", "k": self.k, "n": self.n, "min": self.min if self.n else None,
+                "max": self.max if self.n else None, "sum": self.sum, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, d: dict, seed: int = 0) -> "KLL":
+        sk = cls(d["k"], seed)
+        sk.n, sk.sum = d["n"], d["sum"]
+        sk.min = d["min"] if d["min"] is not None else math.inf
+        sk.max = d["max"] if d["max"] is not None else -math.inf
+        sk.levels = [list(l) for l in d["levels"]]
+        return sk
+
+# -----------------------------
+# Uniform sample (reservoir)
+# -----------------------------
+class Reservoir:
+    def __init__(self, size: int = 200, seed: int = 42):
+        self.size = size
+        self.n = 0
+        self.items: list = []
+        self._rng = random.Random(seed)
+
+    def update(self, xs: Iterable):
+        for x in xs:
+            self.n += 1
+            if len(self.items) < self.size:
+                self.items.append(x)
+            else:
+                j = self._rng.randrange(self.n)
+                if j < self.size:
+                    self.items[j] = x
+
+    def merge(self, other: "Reservoir") -> "Reservoir":
+        """Uniform sample of the union: draw without replacement, each side weighted by its n."""
+        a, b = self.items[:], other.items[:]
+        self._rng.shuffle(a)
+        self._rng.shuffle(b)
+        na, nb = self.n, other.n
+        out = []
+        while len(out) < self.size and (a or b):
+            if b and (not a or self._rng.random() * (na + nb) >= na):
+                out.append(b.pop())
+                nb -= 1
+            else:
+                out.append(a.pop())
+                na -= 1
+        self.items, self.n = out, self.n + other.n
+        return self
+
+    def to_dict(self) -> dict:
+        return {"type": "reservoir", "size": self.size, "n": self.n, "items": self.items}
+
+    @classmethod
+    def from_dict(cls, d: dict, seed: int = 42) -> "Reservoir":
+        r = cls(d["size"], seed)
+        r.n, r.items = d["n"], list(d["items"])
+        return r
+
+# -----------------------------
+# Stratified sample
+# -----------------------------
+OTHER = ("<other>",)
+
+class StratifiedReservoir:
+    """
+    One reservoir per stratum (e.g. (source_zip, domain)). sample() splits `size` across the
+    strata in proportion to how many items each saw, with at least one per stratum. Memory is
+    bounded by max_strata * size items; strata beyond max_strata share one OTHER reservoir.
+    """
+
+    def __init__(self, size: int = 1000, max_strata: int = 32, seed: int = 42):
+        self.size = size
+        self.max_strata = max_strata
+        self.seed = seed
+        self.strata: Dict[tuple, Reservoir] = {}
+
+    def add(self, key: tuple, item):
+        r = self.strata.get(key)
+        if r is None:
+            if len(self.strata) >= self.max_strata:
+                key = OTHER
+                r = self.strata.get(key)
+            if r is None:
+                r = self.strata[key] = Reservoir(self.size, self.seed + len(self.strata))
+        r.update([item])
+
+    @property
+    def n(self) -> int:
+        return sum(r.n for r in self.strata.values())
+
+    def allocation(self) -> Dict[tuple, int]:
+        """Largest-remainder proportional allocation, >= 1 per stratum, capped at what each holds."""
+        seen = {k: r.n for k, r in self.strata.items()}
+        total = sum(seen.values())
+        size = min(self.size, total)
+        if not size:
+            return {k: 0 for k in seen}
+        alloc = {k: 1 if size >= len(seen) else 0 for k in seen}
+        rest = size - sum(alloc.values())
+        quota = {k: rest * v / total for k, v in seen.items()}
+        for k in seen:
+            alloc[k] += int(quota[k])
+        order = sorted(seen, key=lambda k: (quota[k] - int(quota[k]), seen[k], str(k)), reverse=True)
+        for k in order[:size - sum(alloc.values())]:
+            alloc[k] += 1
+        # a stratum cannot give more than its reservoir holds: hand the excess to the largest ones
+        spare = 0
+        for k in seen:
+            held = len(self.strata[k].items)
+            if alloc[k] > held:
+                spare += alloc[k] - held
+                alloc[k] = held
+        for k in sorted(seen, key=lambda k: (seen[k], str(k)), reverse=True):
+            take = min(spare, len(self.strata[k].items) - alloc[k])
+            alloc[k] += take
+            spare -= take
+        return alloc
+
+    def sample(self) -> List[Tuple[tuple, object]]:
+        rng = random.Random(self.seed)
+        out = []
+        for k, m in sorted(self.allocation().items(), key=lambda kv: str(kv[0])):
+            out.extend((k, x) for x in rng.sample(self.strata[k].items, m))
+        return out
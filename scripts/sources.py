@@ -0,0 +1,360 @@
+# cc-banking-intents/scripts/sources.py
+#
+# Where the raw call-center ZIPs come from.
+#
+#   HubSource      hf_hub_download from the Hugging Face dataset repo (the default; needs network)
+#   MirrorSource   a local mirror with no network access at all: a directory, or an http:// URL
+#                  (e.g. `sources.py serve` on a box inside the air gap), holding the ZIPs and a
+#                  manifest.json with each file's size and sha256
+#
+#   src = get_source(ZIP_FILES)        # CCBI_MIRROR=<dir|url>, else the Hub
+#   for name in src.files():
+#       with zipfile.ZipFile(src.open(name)) as zf: ...
+#   src.summary()                      # bytes fetched / read and throughput, for run.note()
+#
+# Mirror ZIPs are checked against the manifest's sha256 the first time a run fetches them
+# (URL mirrors download into data/mirror_cache/ first, since zipfile needs to seek).
+# A mirror serves the stage's ZIP_FILES, like the Hub would, and a configured ZIP the mirror
+# lacks is an error. CCBI_ZIP_FILES=a.zip,b.zip replaces that list, and CCBI_ZIP_FILES=* takes
+# every ZIP the mirror lists (synthetic corpora). CCBI_ZIP_DIR=<dir> is still accepted: a
+# directory mirror whose manifest is optional, read whole as before (bench_stages.py).
+#
+#   python3 scripts/sources.py manifest <dir>                 # write <dir>/manifest.json
+#   python3 scripts/sources.py mirror <dir> [--files a.zip]   # copy Hub ZIPs into a mirror (online box)
+#   python3 scripts/sources.py verify [<dir|url>]             # check every file against the manifest
+#   python3 scripts/sources.py serve <dir> --port 8765        # local HTTP stand-in for a mirror
+#                                             [--rate 20]     # ... throttled to 20 MB/s (WAN stand-in)
+
+import argparse, hashlib, io, json, os, shutil, sys, time, urllib.parse, urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BASE = Path(__file__).resolve().parents[1]
+REPO_ID = "AIxBlock/92k-real-world-call-center-scripts-english"
+MANIFEST = "manifest.json"
+CACHE_DIR = Path(os.environ.get("CCBI_MIRROR_CACHE", BASE / "data" / "mirror_cache"))
+CHUNK = 1 << 20
+
+def sha256_file(path, counter: Optional["IOStats"] = None) -> str:
+    h = hashlib.sha256()
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK), b""):
+            h.update(chunk)
+            if counter:
+                counter.bytes += len(chunk)
+    if counter:
+        counter.seconds += time.perf_counter() - t0
+    return h.hexdigest()
+
+def is_url(root) -> bool:
+    return str(root).startswith(("http://", "https://"))
+
+# -----------------------------
+# Byte accounting
+# -----------------------------
+class IOStats:
+    def __init__(self):
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {"bytes": self.bytes, "seconds": round(self.seconds, 3),
+                "mb_per_s": round(self.bytes / 1e6 / self.seconds, 1) if self.seconds else None}
+
+class CountingFile(io.RawIOBase):
+    """Seekable read-only file that adds every byte it returns (and the time spent) to an IOStats."""
+
+    def __init__(self, path, stats: IOStats):
+        self._f = open(path, "rb")
+        self._stats = stats
+        self.name = str(path)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._f.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._f.tell()
+
+    def readinto(self, b) -> int:
+        t0 = time.perf_counter()
+        n = self._f.readinto(b)
+        self._stats.seconds += time.perf_counter() - t0
+        self._stats.bytes += n or 0
+        return n
+
+    def read(self, size: int = -1) -> bytes:
+        t0 = time.perf_counter()
+        data = self._f.read(size)
+        self._stats.seconds += time.perf_counter() - t0
+        self._stats.bytes += len(data)
+        return data
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+# -----------------------------
+# Sources
+# -----------------------------
+class Source:
+    backend = "?"
+
+    def __init__(self):
+        self.fetched = IOStats()       # downloaded / checksummed before use
+        self.read = IOStats()          # read through open() while scanning
+        self._paths: Dict[str, Path] = {}
+
+    def files(self) -> List[str]:
+        raise NotImplementedError
+
+    def _fetch(self, name: str) -> Path:
+        raise NotImplementedError
+
+    def fetch(self, name: str) -> Path:
+        """Local path of one ZIP (downloaded / verified once per run)."""
+        if name not in self._paths:
+            self._paths[name] = Path(self._fetch(name))
+        return self._paths[name]
+
+    def open(self, name: str) -> CountingFile:
+        return CountingFile(self.fetch(name), self.read)
+
+    def summary(self) -> dict:
+        return {"backend": self.backend, "files": len(self._paths),
+                "fetched": self.fetched.to_dict(), "read": self.read.to_dict()}
+
+    def print_summary(self):
+        s = self.summary()
+        for k in ("fetched", "read"):
+            d = s[k]
+            if d["bytes"]:
+                rate = f" ({d['mb_per_s']} MB/s)" if d["mb_per_s"] else ""
+                print(f"[{s['backend']}] {k} {d['bytes'] / 1e6:,.1f} MB in {d['seconds']:.2f}s{rate}")
+
+class HubSource(Source):
+    backend = "hub"
+
+    def __init__(self, files: Sequence[str], repo_id: str = REPO_ID):
+        super().__init__()
+        self.repo_id = repo_id
+        self._files = list(files)
+
+    def files(self) -> List[str]:
+        return list(self._files)
+
+    def _fetch(self, name: str) -> Path:
+        from huggingface_hub import hf_hub_download
+        t0 = time.perf_counter()
+        path = Path(hf_hub_download(self.repo_id, filename=name, repo_type="dataset"))
+        self.fetched.seconds += time.perf_counter() - t0
+        self.fetched.bytes += path.stat().st_size
+        return path
+
+class MirrorSource(Source):
+    def __init__(self, root, verify: bool = True, require_manifest: bool = True,
+                 cache_dir: Path = CACHE_DIR, files: Optional[Sequence[str]] = None):
+        """files: the ZIPs to serve, in this order (None: everything the mirror lists)."""
+        super().__init__()
+        self.wanted = list(files) if files else None
+        self.root = str(root).rstrip("/") if is_url(root) else Path(root)
+        self.backend = "mirror-http" if is_url(root) else "mirror-dir"
+        self.verify = verify
+        self.cache_dir = cache_dir
+        self.manifest = self._load_manifest(require_manifest)
+
+    def _url(self, name: str) -> str:
+        return f"{self.root}/{urllib.parse.quote(name)}"
+
+    def _load_manifest(self, required: bool) -> Optional[dict]:
+        if is_url(self.root):
+            with urllib.request.urlopen(self._url(MANIFEST)) as r:
+                return json.loads(r.read())
+        path = self.root / MANIFEST
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        if required:
+            raise SystemExit(f"No {MANIFEST} in mirror {self.root} (create one: python3 scripts/sources.py manifest {self.root})")
+        return None
+
+    def listed(self) -> List[str]:
+        """Every ZIP in the manifest (or, without one, the directory)."""
+        if self.manifest is not None:
+            return [f["name"] for f in self.manifest["files"]]
+        return sorted(p.name for p in self.root.glob("*.zip"))
+
+    def files(self) -> List[str]:
+        listed = self.listed()
+        if self.wanted is None:
+            return listed
+        have = set(listed)
+        missing = [n for n in self.wanted if n not in have]
+        if missing:
+            raise SystemExit(f"Mirror {self.root} lacks configured ZIP(s) {missing} "
+                             f"(add them to the mirror, or set CCBI_ZIP_FILES)")
+        return list(self.wanted)
+
+    def entry(self, name: str) -> Optional[dict]:
+        if self.manifest is None:
+            return None
+        for f in self.manifest["files"]:
+            if f["name"] == name:
+                return f
+        raise KeyError(f"{name} is not in the mirror manifest")
+
+    def _check(self, path: Path, name: str):
+        e = self.entry(name)
+        if e is None or not self.verify:
+            return
+        if path.stat().st_size != e["size"]:
+            raise ValueError(f"{name}: size {path.stat().st_size} != manifest {e['size']}")
+        if sha256_file(path, self.fetched) != e["sha256"]:
+            raise ValueError(f"{name}: sha256 does not match the mirror manifest")
+
+    def _fetch(self, name: str) -> Path:
+        if not is_url(self.root):
+            path = self.root / name
+            self._check(path, name)
+            return path
+
+        e = self.entry(name)
+        local = self.cache_dir / e["sha256"][:16] / name
+        if local.exists() and local.stat().st_size == e["size"]:
+            self._check(local, name)
+            return local
+        local.parent.mkdir(parents=True, exist_ok=True)
+        tmp = local.with_suffix(local.suffix + ".part")
+        h = hashlib.sha256()
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(self._url(name)) as r, open(tmp, "wb") as out:
+            for chunk in iter(lambda: r.read(CHUNK), b""):
+                h.update(chunk)
+                out.write(chunk)
+                self.fetched.bytes += len(chunk)
+        self.fetched.seconds += time.perf_counter() - t0
+        if h.hexdigest() != e["sha256"]:
+            tmp.unlink()
+            raise ValueError(f"{name}: sha256 does not match the mirror manifest")
+        tmp.replace(local)
+        return local
+
+def zip_files(default_files: Sequence[str]) -> Optional[List[str]]:
+    """CCBI_ZIP_FILES (comma-separated; "*" for all a mirror lists, None) or the stage's list."""
+    env = os.environ.get("CCBI_ZIP_FILES", "").strip()
+    if env == "*":
+        return None
+    return [z.strip() for z in env.split(",") if z.strip()] if env else list(default_files)
+
+def get_source(default_files: Sequence[str]) -> Source:
+    """
+    CCBI_MIRROR (dir or URL) -> MirrorSource over the stage's ZIPs; CCBI_ZIP_DIR (legacy) ->
+    the whole directory; else the Hub. An empty default_files (01's sniffing) means every ZIP.
+    """
+    verify = os.environ.get("CCBI_MIRROR_VERIFY", "1") != "0"
+    files = zip_files(default_files)
+    mirror = os.environ.get("CCBI_MIRROR")
+    if mirror:
+        return MirrorSource(mirror, verify=verify, files=files)
+    zip_dir = os.environ.get("CCBI_ZIP_DIR")
+    if zip_dir:
+        files = files if os.environ.get("CCBI_ZIP_FILES") else None
+        return MirrorSource(zip_dir, verify=verify, require_manifest=False, files=files)
+    if files is None:
+        raise SystemExit("CCBI_ZIP_FILES=* needs a mirror (CCBI_MIRROR or CCBI_ZIP_DIR) to list")
+    return HubSource(files)
+
+def local_manifest() -> Optional[Path]:
+    """The manifest (or ZIP directory) a local mirror would read, for pipeline input hashing."""
+    root = os.environ.get("CCBI_MIRROR") or os.environ.get("CCBI_ZIP_DIR")
+    if not root or is_url(root):
+        return None
+    m = Path(root) / MANIFEST
+    return m if m.exists() else Path(root)
+
+# -----------------------------
+# Mirror maintenance
+# -----------------------------
+def write_manifest(root: Path, names: Optional[Sequence[str]] = None, repo_id: str = REPO_ID) -> Path:
+    """Hash `names` (default: every ZIP in root). Entries already in the manifest for other ZIPs
+    still on disk are kept, so a mirror can be filled one ZIP at a time."""
+    out = root / MANIFEST
+    names = list(names) if names else sorted(p.name for p in root.glob("*.zip"))
+    kept = []
+    if out.exists():
+        with open(out) as f:
+            kept = [e for e in json.load(f)["files"] if e["name"] not in names and (root / e["name"]).exists()]
+    files = kept + [{"name": n, "size": (root / n).stat().st_size, "sha256": sha256_file(root / n)} for n in names]
+    files.sort(key=lambda e: e["name"])
+    with open(out, "w") as f:
+        json.dump({"repo_id": repo_id, "files": files}, f, indent=2)
+    return out
+
+def serve(root: Path, port: int, host: str = "127.0.0.1", rate_mb_s: Optional[float] = None):
+    """Static HTTP server for a mirror directory; rate_mb_s throttles each response (WAN stand-in)."""
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(SimpleHTTPRequestHandler):
+        def copyfile(self, source, outputfile):
+            if not rate_mb_s:
+                return super().copyfile(source, outputfile)
+            chunk = 64 * 1024
+            for block in iter(lambda: source.read(chunk), b""):
+                outputfile.write(block)
+                time.sleep(len(block) / (rate_mb_s * 1e6))
+
+        def log_message(self, *args):
+            pass
+
+    handler = partial(Handler, directory=str(root))
+    with ThreadingHTTPServer((host, port), handler) as httpd:
+        limit = f", {rate_mb_s} MB/s per response" if rate_mb_s else ""
+        print(f"Serving mirror {root} at http://{host}:{httpd.server_address[1]}/{limit}", flush=True)
+        httpd.serve_forever()
+
+def main():
+    ap = argparse.ArgumentParser(description="Local mirror of the raw call-center ZIPs.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    m = sub.add_parser("manifest", help="write manifest.json for a directory of ZIPs")
+    m.add_argument("dir", type=Path)
+    mi = sub.add_parser("mirror", help="download ZIPs from the Hub into a mirror directory")
+    mi.add_argument("dir", type=Path)
+    mi.add_argument("--files", nargs="+", required=True)
+    v = sub.add_parser("verify", help="check every mirror file against its manifest")
+    v.add_argument("root", nargs="?", default=os.environ.get("CCBI_MIRROR"))
+    s = sub.add_parser("serve", help="serve a mirror directory over HTTP")
+    s.add_argument("dir", type=Path)
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--rate", type=float, default=None, help="throttle to this many MB/s per response")
+    args = ap.parse_args()
+
+    if args.cmd == "manifest":
+        print(f"Wrote {write_manifest(args.dir)}")
+    elif args.cmd == "mirror":
+        args.dir.mkdir(parents=True, exist_ok=True)
+        hub = HubSource(args.files)
+        for name in args.files:
+            shutil.copyfile(hub.fetch(name), args.dir / name)
+        print(f"Wrote {write_manifest(args.dir, args.files)}")
+        hub.print_summary()
+    elif args.cmd == "verify":
+        if not args.root:
+            sys.exit("verify needs a mirror (argument or CCBI_MIRROR)")
+        src = MirrorSource(args.root)
+        for name in src.files():
+            src.fetch(name)
+            print(f"ok  {name}")
+        src.print_summary()
+    elif args.cmd == "serve":
+        serve(args.dir, args.port, args.host, args.rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# cc-banking-intents/scripts/stream_ingest.py
+#
+# Streaming ingestion: watch a drop directory for per-call JSON files (one call per file, the
+# records a dataset ZIP holds as members) and run each through 03's per-call path as it lands.
+# That path is build_call(): speaker extraction, banking filter, dedupe against the persistent
+# index and this session, role resolution into `turns`, and the feature row. Kept calls are
+# written in micro-batches, as Parquet parts next to the batch outputs:
+#
+#   <processed dir>/stream/calls/part-<session>-<seq>.parquet      rows as in banking_calls.parquet
+#   <processed dir>/stream/features/part-<session>-<seq>.parquet   rows as in banking_call_features.parquet
+#   <processed dir>/dedupe_index/stream-<sha>.<session>-<seq>.npy  the part's keys (dedupe_index.py)
+#
+# A part is written when CCBI_STREAM_BATCH calls are pending, or CCBI_STREAM_LINGER seconds after
+# the oldest pending call arrived, so a call is on disk within about LINGER + POLL seconds of
+# landing. The watcher hands file paths to the worker through a queue of CCBI_STREAM_QUEUE
+# entries. During a burst the backlog therefore waits on disk, and memory is bounded by the
+# queue and one micro-batch. Once its part is written, a file moves to <drop>/done/
+# (<drop>/failed/ if it is not valid JSON). Producers should write elsewhere and rename into
+# the drop directory, so a half-written file is never read.
+#
+#   python3 scripts/stream_ingest.py watch /srv/drop              # until Ctrl-C
+#   python3 scripts/stream_ingest.py watch /srv/drop --once       # drain what is there, then exit
+#   python3 scripts/stream_ingest.py compact                      # fold the parts into one per directory
+#
+# The streamed calls stay a dataset of their own. 03 rewrites banking_calls.parquet from the ZIPs
+# and would drop them, while their dedupe-index segment keeps the same calls out of the ZIP build.
+# 04 and 05 read the batch table and stream/calls together (tables.dataset_files), and
+# features.read_features adds stream/features, so everything downstream of 05 sees both.
+# `compact` only merges the many small parts into one, in place, and folds the per-part dedupe-index
+# segments into stream-<sha>.npy (dedupe_index.merge): every DedupeIndex maps each segment file and
+# seen() probes them one by one, so lookups would otherwise slow down with every part ever written.
+
+import argparse, asyncio, os, time, uuid
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import orjson
+import pandas as pd
+
+from instrument import RunReport
+from paths import PROC, STREAM_DIR
+from calls import TURNS, TurnColumns
+from features import STREAM_FEATURES, FeatureColumns
+from tables import arrow_strings, write_parquet, read_parquet
+import dedupe_index
+from dedupe_index import DedupeIndex, INDEX_DIR, keys_from_hex, segment_name, sort_keys, write_keys
+
+CALLS_DIR = STREAM_DIR / "calls"
+FEATURES_DIR = STREAM_FEATURES                # read by features.read_features
+SOURCE = "stream"             # source_zip of streamed calls, and their dedupe-index segment
+
+BATCH = int(os.environ.get("CCBI_STREAM_BATCH", "512"))          # calls per part, at most
+LINGER = float(os.environ.get("CCBI_STREAM_LINGER", "1.0"))      # s a pending call waits for its batch to fill
+QUEUE = int(os.environ.get("CCBI_STREAM_QUEUE", "1024"))         # file paths queued for the worker
+POLL = float(os.environ.get("CCBI_STREAM_POLL", "0.2"))          # s between drop-directory scans
+
+def build_module():
+    from training import stage
+    return stage("03_build_banking_subset")
+
+def read_record(path: Path) -> Optional[dict]:
+    try:
+        rec = orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return rec if isinstance(rec, dict) else None
+
+# -----------------------------
+# Micro-batches
+# -----------------------------
+class MicroBatch:
+    """Kept calls (and all files seen) since the last part was written."""
+
+    def __init__(self):
+        self.rows: List[dict] = []
+        self.turns = TurnColumns()
+        self.feats = FeatureColumns()
+        self.files: List[Tuple[Path, float, bool]] = []      # (path, arrival, parsed)
+        self.opened: Optional[float] = None                  # monotonic time of the oldest file
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+class Streamer:
+    def __init__(self, drop: Path, run: RunReport, once: bool = False):
+        self.drop = drop
+        self.run = run
+        self.once = once
+        self.build = build_module()
+        self.index = DedupeIndex(INDEX_DIR if self.build.DEDUPE_INDEX else None)
+        self.session = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.seq = 0
+        self.batch = MicroBatch()
+        self.queued = set()
+        self.latency = deque(maxlen=100_000)      # s from a file landing to its part being written
+        self.files = self.kept = self.failed = 0
+
+    # --- watcher: drop directory -> queue ---
+    async def watch(self, queue: asyncio.Queue):
+        while True:
+            found = 0
+            for entry in sorted(os.scandir(self.drop), key=lambda e: e.name):
+                if not entry.name.endswith(".json") or not entry.is_file() or entry.path in self.queued:
+                    continue
+                self.queued.add(entry.path)
+                found += 1
+                await queue.put((Path(entry.path), entry.stat().st_mtime))   # blocks while the queue is full
+            if self.once and not found:
+                await queue.put(None)
+                return
+            await asyncio.sleep(POLL)
+
+    # --- worker: queue -> build_call -> micro-batch -> part ---
+    async def work(self, queue: asyncio.Queue):
+        while True:
+            timeout = None
+            if self.batch.opened is not None:
+                timeout = max(self.batch.opened + LINGER - time.monotonic(), 0.0)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self.flush()
+                continue
+            if item is None:
+                await self.flush()
+                return
+            path, arrived = item
+            rec = await asyncio.to_thread(read_record, path)
+            self.add(path, arrived, rec)
+            if len(self.batch) >= BATCH:
+                await self.flush()
+
+    def add(self, path: Path, arrived: float, rec: Optional[dict]):
+        b = self.batch
+        if b.opened is None:
+            b.opened = time.monotonic()
+        b.files.append((path, arrived, rec is not None))
+        self.files += 1
+        if rec is None:
+            self.failed += 1
+            return
+        call = self.build.build_call(self.run, self.index, SOURCE, path.name, rec)
+        if call is None:
+            return
+        row, resolved, feat = call
+        b.rows.append(row)
+        b.turns.append(resolved)
+        b.feats.append(feat)
+
+    async def flush(self):
+        b, self.batch = self.batch, MicroBatch()
+        if not len(b):
+            return
+        with self.run.step("flush") as st:
+            written = await asyncio.to_thread(self.write_part, b)
+            st.add(rows_in=len(b), rows_out=len(b.rows))
+        for path in written:
+            self.run.wrote(path)
+        await asyncio.to_thread(self.retire, b)
+        now = time.time()
+        self.latency.extend(now - arrived for _, arrived, _ in b.files)
+        self.kept += len(b.rows)
+        if not written:          # nothing kept: the files are retired, but there is no part
+            return
+        lat = self.latency_summary()
+        print(f"[stream] part {self.seq:05d}: {len(b)} files, {len(b.rows)} kept | "
+              f"latency p50 {lat['p50_s']:.2f}s p95 {lat['p95_s']:.2f}s | totals {self.files:,} files, {self.kept:,} kept")
+        self.seq += 1
+
+    def write_part(self, b: MicroBatch) -> List[Path]:
+        if not b.rows:
+            return []
+        name = f"part-{self.session}-{self.seq:05d}"
+        df = arrow_strings(pd.DataFrame(b.rows))
+        df.insert(df.columns.get_loc("hash"), TURNS, pd.arrays.ArrowExtensionArray(b.turns.to_arrow()))
+        out = []
+        for d, frame in ((CALLS_DIR, df), (FEATURES_DIR, arrow_strings(b.feats.to_frame()))):
+            d.mkdir(parents=True, exist_ok=True)
+            tmp = d / f".{name}.parquet.tmp"          # readers of the directory never see a partial part
+            write_parquet(frame, tmp, row_group_size=None)
+            os.replace(tmp, d / f"{name}.parquet")
+            out.append(d / f"{name}.parquet")
+        if self.index.root is not None:
+            path = self.index.root / f"{segment_name(SOURCE)}.{self.session}-{self.seq:05d}.npy"
+            self.index.root.mkdir(parents=True, exist_ok=True)
+            write_keys(sort_keys(keys_from_hex(df["hash"])), path)
+            out.append(path)
+        return out
+
+    def retire(self, b: MicroBatch):
+        for sub, ok in (("done", True), ("failed", False)):
+            files = [p for p, _, parsed in b.files if parsed is ok]
+            if files:
+                (self.drop / sub).mkdir(exist_ok=True)
+            for p in files:
+                try:
+                    os.replace(p, self.drop / sub / p.name)
+                except FileNotFoundError:     # removed by someone else since the scan
+                    pass
+                self.queued.discard(str(p))
+
+    def latency_summary(self) -> dict:
+        lat = sorted(self.latency)
+        if not lat:
+            return {"p50_s": 0.0, "p95_s": 0.0, "max_s": 0.0}
+        pick = lambda q: round(lat[min(int(q * len(lat)), len(lat) - 1)], 3)
+        return {"p50_s": pick(0.50), "p95_s": pick(0.95), "max_s": round(lat[-1], 3)}
+
+    async def serve(self):
+        queue: asyncio.Queue = asyncio.Queue(QUEUE)
+        watcher = asyncio.create_task(self.watch(queue))
+        try:
+            await self.work(queue)
+        finally:
+            watcher.cancel()
+            await self.flush()
+
+    def summary(self) -> dict:
+        return {"drop": str(self.drop), "session": self.session, "parts": self.seq, "files": self.files,
+                "kept": self.kept, "failed": self.failed, "latency": self.latency_summary(),
+                "batch": BATCH, "linger_s": LINGER, "queue": QUEUE, "poll_s": POLL}
+
+# -----------------------------
+# Compaction
+# -----------------------------
+COMPACTED = "part-0-compacted.parquet"     # sorts before the session parts (part-<timestamp>-...)
+
+def compact(run: RunReport) -> int:
+    """Merge the stream parts, in order, into one part per directory (calls/, features/),
+    then fold the parts' dedupe-index segments."""
+    with run.step("merge_index") as st:
+        folded = dedupe_index.merge(INDEX_DIR) if INDEX_DIR.exists() else {}
+        st.rows_out = sum(folded.values())
+    if folded:
+        print(f"Folded dedupe-index parts -> {', '.join(f'{k}.npy' for k in folded)}")
+    parts = sorted(p.name for p in CALLS_DIR.glob("part-*.parquet")) if CALLS_DIR.exists() else []
+    if len(parts) < 2:
+        print(f"Nothing to compact under {CALLS_DIR}")
+        return 0
+    n = 0
+    for d in (CALLS_DIR, FEATURES_DIR):
+        with run.step("compact") as st:
+            df = pd.concat([read_parquet(run.read(d / p)) for p in parts], ignore_index=True)
+            tmp = d / f".{COMPACTED}.tmp"
+            write_parquet(df, tmp)
+            # replaced before the old parts go: a crash in between leaves duplicates, never a gap
+            os.replace(tmp, d / COMPACTED)
+            run.wrote(d / COMPACTED)
+            for p in parts:
+                if p != COMPACTED:
+                    (d / p).unlink()
+            st.rows_out = n = len(df)
+    print(f"Compacted {len(parts)} part(s), {n:,} calls -> {CALLS_DIR / COMPACTED}")
+    return n
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming ingestion of per-call JSON files from a drop directory.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("watch", help="ingest files as they land in the drop directory")
+    w.add_argument("drop", type=Path)
+    w.add_argument("--once", action="store_true", help="exit once the directory has been drained")
+    sub.add_parser("compact", help="merge the stream parts into one part per directory, "
+                                   "and their dedupe-index segments into one")
+    args = ap.parse_args()
+
+    PROC.mkdir(parents=True, exist_ok=True)
+    if args.cmd == "compact":
+        with RunReport("stream_compact") as run:
+            run.note(calls=compact(run))
+        return
+    if not args.drop.is_dir():
+        raise SystemExit(f"{args.drop} is not a directory")
+    with RunReport("stream_ingest") as run:
+        streamer = Streamer(args.drop, run, once=args.once)
+        print(f"[stream] watching {args.drop} (batch {BATCH}, linger {LINGER}s, queue {QUEUE}) -> {CALLS_DIR}")
+        try:
+            asyncio.run(streamer.serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            run.note(stream=streamer.summary())
+            print(f"[stream] {streamer.files:,} files, {streamer.kept:,} kept, {streamer.failed} failed, "
+                  f"{streamer.seq} part(s); latency {streamer.latency_summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# cc-banking-intents/scripts/tables.py
+#
+# Dtype policy for the call and training tables.
+#
+# Text columns (customer_text / agent_text / full_text / utterance) are kept as Arrow-backed
+# strings instead of Python objects, and Parquet dictionary columns come back as categoricals.
+# Nested columns (the call tables' `turns`, see calls.py) stay Arrow lists (pd.ArrowDtype).
+# A transcript-heavy frame then takes roughly its on-disk size in RAM, and the vectorized text
+# ops the stages use (.str.lower/.strip/.len/.contains) run on Arrow compute.
+#
+#   from tables import read_parquet, arrow_strings, text_or_fallback, dedupe_key
+#
+# Utterance rows are keyed by a stable int64 (KEY, stored as the training tables' `row_id`):
+# blake2b over the intent id and the casefolded, stripped utterance. It is computed once, when
+# a stage creates the rows, and carried along. Duplicates, per-intent caps and train/dev
+# leakage compare these keys, not intent||utterance strings.
+#
+# CCBI_DTYPES=object switches back to Python-object strings (the old behaviour), so peak
+# memory can be compared on the same tree: bench_stages.py --dtypes object|arrow.
+#
+# Call tables are read through load_calls / iter_calls: a stage declares the columns it uses
+# (projection), filters are pushed into the Parquet scan (source_zip prunes row groups by their
+# statistics; a text-length range is tested on the stored full_chars), and iter_calls yields
+# bounded record batches. customer_text / agent_text / full_text are views of the nested `turns`
+# column (calls.py), built in Arrow for the batches read. The default filter comes from the environment, so
+# every stage can be pointed at a slice without new flags:
+#   CCBI_SOURCE_ZIPS=a.zip,b.zip  CCBI_MIN_CHARS=200  CCBI_MAX_CHARS=20000
+
+import hashlib, json, os
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from calls import TURNS, VIEWS, plan_columns, add_views, view_turns
+
+POLICY = os.environ.get("CCBI_DTYPES", "arrow")
+
+BATCH_ROWS = 20_000          # rows per batch from iter_calls
+ROW_GROUP_ROWS = 20_000      # row-group size for call tables (keeps row-group stats selective)
+
+# NaN-as-missing Arrow strings (the pandas 3 default "str"): row code that does
+# `r.get("customer_text") or ""` keeps working, unlike with pd.NA.
+try:
+    STRING = pd.StringDtype("pyarrow", na_value=np.nan)    # pandas >= 2.3
+except TypeError:
+    STRING = pd.StringDtype("pyarrow_numpy")                # pandas 2.1 / 2.2
+
+def _nested_mapper(t: pa.DataType):
+    if pa.types.is_list(t) or pa.types.is_large_list(t) or pa.types.is_struct(t):
+        return pd.ArrowDtype(t)
+    return None
+
+def _types_mapper(t: pa.DataType):
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return STRING
+    return _nested_mapper(t)
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    if POLICY == "object":
+        df = table.to_pandas(types_mapper=_nested_mapper)
+        for c in df.columns:
+            if pd.api.types.is_string_dtype(df[c]) and not isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype(object)
+        return df
+    return table.to_pandas(types_mapper=_types_mapper)
+
+def read_parquet(path, columns=None) -> pd.DataFrame:
+    """pd.read_parquet under the dtype policy (strings Arrow-backed, dictionaries categorical)."""
+    return to_pandas(pq.read_table(path, columns=columns))
+
+def arrow_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert object/str columns of a frame built in Python (lists of dicts) to the policy dtype."""
+    if POLICY == "object":
+        return df
+    for c in df.columns:
+        if df[c].dtype == object or (pd.api.types.is_string_dtype(df[c]) and df[c].dtype != STRING
+                                     and not isinstance(df[c].dtype, pd.CategoricalDtype)):
+            df[c] = df[c].astype(STRING)
+    return df
+
+def as_text(s: pd.Series) -> pd.Series:
+    """A column as policy strings with missing values as ""."""
+    return s.astype(object if POLICY == "object" else STRING).fillna("")
+
+def text_or_fallback(df: pd.DataFrame, primary: str = "customer_text", fallback: str = "full_text") -> pd.Series:
+    """`primary` where non-empty, else `fallback` (the customer_text -> full_text rule)."""
+    p = as_text(df[primary])
+    return p.where(p.str.len() > 0, as_text(df[fallback]))
+
+def turns_or_fallback(df: pd.DataFrame, primary: str = "customer_text", fallback: str = "full_text"):
+    """
+    text_or_fallback() by turn: per call, [(turn index, text)] of the turns its chosen view
+    joins, so lines split out of them can be traced to their turn. None for a flat call table
+    (no `turns` column).
+    """
+    if TURNS not in df or not isinstance(df[TURNS].dtype, pd.ArrowDtype):
+        return None
+    use = (as_text(df[primary]).str.len() > 0).to_numpy()
+    return view_turns(pa.array(df[TURNS].array), VIEWS[primary], VIEWS[fallback], use)
+
+def call_lines(df: pd.DataFrame, split: Callable[[str], Iterable[str]]) -> Iterator[Tuple[int, Optional[int], str]]:
+    """(row, turn index, line) for the lines split() takes from each call's text_or_fallback() text, in order."""
+    by_turn = turns_or_fallback(df)
+    if by_turn is None:               # flat call table: no turn to point at
+        by_turn = [[(None, text)] for text in text_or_fallback(df)]
+    for k, turns in enumerate(by_turn):
+        for i, text in turns:
+            for line in split(text):
+                yield k, i, line
+
+# -----------------------------
+# Utterance keys
+# -----------------------------
+KEY = "row_id"
+TURN_INDEX = "turn_index"
+PROVENANCE = ["source_zip", "file_name", TURN_INDEX]   # call (and turn) a harvested utterance came from
+
+def utterance_key(intent: str, utterance: str) -> int:
+    """Stable int64 of one (intent, utterance): blake2b-8 over the intent id and the casefolded, stripped text."""
+    digest = hashlib.blake2b(f"{intent}\x1f{utterance.lower().strip()}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+def utterance_keys(intents, utterances) -> np.ndarray:
+    """utterance_key() of each row (missing values as "")."""
+    intents, utterances = as_text(pd.Series(intents)).tolist(), as_text(pd.Series(utterances)).tolist()
+    return np.fromiter(map(utterance_key, intents, utterances), dtype=np.int64, count=len(intents))
+
+def dedupe_key(df: pd.DataFrame) -> pd.Series:
+    """The per-intent duplicate key of each row: the stored KEY column, else utterance_keys()."""
+    if KEY in df and df[KEY].dtype == np.int64:
+        return df[KEY]
+    return pd.Series(utterance_keys(df["intent_id"], df["utterance"]), index=df.index, name=KEY)
+
+def with_key(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with a KEY column (computed unless the rows already carry one)."""
+    return df.assign(**{KEY: dedupe_key(df)})
+
+def write_parquet(df: pd.DataFrame, path, row_group_size: Optional[int] = ROW_GROUP_ROWS):
+    """Call-table writer: bounded row groups so filters can skip whole groups."""
+    nested = [c for c in df.columns if isinstance(df[c].dtype, pd.ArrowDtype) and _nested_mapper(df[c].dtype.pyarrow_dtype)]
+    if not nested:
+        df.to_parquet(path, index=False, row_group_size=row_group_size)
+        return path
+    # pandas cannot parse its own dtype string for nested Arrow columns on read: record them as
+    # object columns (to_pandas maps them back to pd.ArrowDtype)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = json.loads(table.schema.metadata[b"pandas"])
+    for col in meta["columns"]:
+        if col["name"] in nested:
+            col["numpy_type"] = "object"
+    table = table.replace_schema_metadata({**table.schema.metadata, b"pandas": json.dumps(meta).encode()})
+    pq.write_table(table, path, row_group_size=row_group_size)
+    return path
+
+# -----------------------------
+# Call-table loader
+# -----------------------------
+def call_filter(source_zips: Optional[Sequence[str]] = None, min_chars: Optional[int] = None,
+                max_chars: Optional[int] = None, length_col: str = "full_chars",
+                hashes: Optional[Sequence[str]] = None):
+    """
+    Arrow dataset expression for a source_zip set, a character-length range and/or a set of
+    call hashes (e.g. the calls a feature-table predicate kept), or None for no filter.
+    length_col is a stored length (*_chars) or a text column to measure.
+    """
+    length = ds.field(length_col) if length_col.endswith("_chars") else pc.utf8_length(ds.field(length_col))
+    expr, parts = None, []
+    if source_zips:
+        parts.append(ds.field("source_zip").isin(list(source_zips)))
+    if hashes is not None:
+        parts.append(ds.field("hash").isin(list(hashes)))
+    if min_chars is not None:
+        parts.append(length >= min_chars)
+    if max_chars is not None:
+        parts.append(length <= max_chars)
+    for p in parts:
+        expr = p if expr is None else expr & p
+    return expr
+
+def env_filter(hashes: Optional[Sequence[str]] = None):
+    """call_filter from CCBI_SOURCE_ZIPS / CCBI_MIN_CHARS / CCBI_MAX_CHARS (plus `hashes`)."""
+    zips = [z for z in os.environ.get("CCBI_SOURCE_ZIPS", "").split(",") if z.strip()]
+    lo, hi = os.environ.get("CCBI_MIN_CHARS"), os.environ.get("CCBI_MAX_CHARS")
+    return call_filter([z.strip() for z in zips] or None,
+                       int(lo) if lo else None, int(hi) if hi else None, hashes=hashes)
+
+def dataset_files(path, parts_dir) -> list:
+    """
+    A batch table plus the Parquet parts under parts_dir (stream_ingest.py writes them next to
+    03's tables), as one file list: every reader here takes it like a single path.
+    """
+    files = [str(path)] if Path(path).exists() else []
+    return files + [str(p) for p in sorted(Path(parts_dir).glob("part-*.parquet"))]
+
+def projected_bytes(path, columns: Optional[Sequence[str]] = None) -> int:
+    """Compressed bytes of just these columns, from the Parquet footer (for run.read accounting)."""
+    if isinstance(path, (list, tuple)):
+        return sum(projected_bytes(p, columns) for p in path)
+    pf = pq.ParquetFile(path)
+    md = pf.metadata
+    if columns is not None:
+        columns = set(plan_columns(pf.schema_arrow, columns)[0])
+    total = 0
+    for i in range(md.num_row_groups):
+        rg = md.row_group(i)
+        for j in range(rg.num_columns):
+            col = rg.column(j)
+            if columns is None or col.path_in_schema.split(".")[0] in columns:
+                total += col.total_compressed_size
+    return total
+
+def count_calls(path, filter="env") -> int:
+    """Rows of a call table matching the filter (row-group statistics and a scan of the filter columns only)."""
+    expr = env_filter() if isinstance(filter, str) and filter == "env" else filter
+    return ds.dataset(path, format="parquet").count_rows(filter=expr)
+
+def load_calls(path, columns: Sequence[str], filter="env") -> pd.DataFrame:
+    """Projected, filtered call table as one frame (use iter_calls to stream)."""
+    expr = env_filter() if isinstance(filter, str) and filter == "env" else filter
+    dset = ds.dataset(path, format="parquet")
+    read, views = plan_columns(dset.schema, columns)
+    return to_pandas(add_views(dset.to_table(columns=read, filter=expr), columns, views))
+
+def row_group_shard(path, shard: Tuple[int, int], filter=None) -> list:
+    """Row-group fragments i, i+n, i+2n, ... of a call table (shard = (i, n))."""
+    i, n = shard
+    frags = [rg for frag in ds.dataset(path, format="parquet").get_fragments(filter=filter)
+             for rg in frag.split_by_row_group(filter=filter)]
+    return frags[i::n]
+
+def iter_calls(path, columns: Sequence[str], filter="env", batch_rows: int = BATCH_ROWS,
+               shard: Optional[Tuple[int, int]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Projected, filtered call table as DataFrame batches of at most `batch_rows` rows.
+    shard=(i, n) reads only every n-th row group starting at i, so n processes cover the table.
+    """
+    expr = env_filter() if isinstance(filter, str) and filter == "env" else filter
+    dset = ds.dataset(path, format="parquet")
+    read, views = plan_columns(dset.schema, columns)
+    if shard is None:
+        batches = dset.to_batches(columns=read, filter=expr, batch_size=batch_rows)
+    else:
+        batches = (b for frag in row_group_shard(path, shard, expr)
+                   for b in frag.to_batches(columns=read, filter=expr, batch_size=batch_rows))
+    for batch in batches:
+        if batch.num_rows:
+            yield to_pandas(add_views(pa.Table.from_batches([batch]), columns, views))
+
+def frames(calls) -> Iterator[pd.DataFrame]:
+    """A DataFrame, or an iterable of DataFrame batches (iter_calls), as an iterator of frames."""
+    return iter([calls]) if isinstance(calls, pd.DataFrame) else iter(calls)
@@ -0,0 +1,185 @@
+# cc-banking-intents/scripts/training.py
+#
+# Library API for the training-data stages (10 -> 10b -> 10c -> 10d -> 11c -> 11_build_eval_sets).
+# Each stage exposes a DataFrame-in / DataFrame-out function; the numbered scripts are thin
+# file wrappers around them. `run_chain()` runs the whole sequence in one process and only
+# writes the final artifacts, instead of each stage writing CSV/JSON and the next one
+# re-parsing it (and 11c starting a fresh interpreter for the splits).
+#
+#   python3 scripts/training.py                      # chain, final artifacts only
+#   python3 scripts/training.py --keep-intermediate  # also write the per-stage files
+#   python3 scripts/training.py --no-whitelist       # skip 11c (as the pipeline does by default)
+#   python3 scripts/training.py --export csv json    # CSV/JSON copies of the Parquet tables
+#
+#   from training import export_utterances, harvest_seeds, merge_seeded, ...
+#
+# Stage modules are imported lazily (their names start with digits, so via importlib).
+#
+# Training tables are Parquet (see write_table): `intent_id`/`intent_name` are dictionary-encoded
+# and every row carries a stable `row_id`. CSV / JSON copies for bot tooling are produced on
+# demand with `--export csv json`.
+
+import argparse, importlib, json, sys
+from pathlib import Path
+from paths import PROC, TRAIN_DIR
+
+CATALOG = PROC / "intent_catalog.jsonl"
+CALLS = PROC / "banking_calls_refined.parquet"
+CALL_COLUMNS = ["source_zip", "file_name", "turns", "customer_text", "full_text"]   # what 10b / 10d read from CALLS
+GOLD = PROC / "gold_answers_todo.csv"
+
+# canonical training tables (Parquet, under TRAIN_DIR)
+UTTERANCES = TRAIN_DIR / "utterances_answerable.parquet"         # 10
+SEEDS = TRAIN_DIR / "seed_harvest.parquet"                       # 10b
+MERGED = TRAIN_DIR / "utterances_answerable.merged.parquet"      # 10c/10d/11c
+INTENT_TRAIN = TRAIN_DIR / "intent_train.parquet"                # 11_build_eval_sets
+INTENT_DEV = TRAIN_DIR / "intent_dev.parquet"
+TABLES = [UTTERANCES, SEEDS, MERGED, INTENT_TRAIN, INTENT_DEV]
+
+DICT_COLUMNS = ("intent_id", "intent_name", "source_zip")
+
+def stage(module: str):
+    scripts = str(Path(__file__).resolve().parent)
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+    return importlib.import_module(module)
+
+def json_pack(df) -> list:
+    """Utterance table -> [{intent_id, name, samples:[...]}] grouped by intent."""
+    pack = []
+    for iid, g in df.groupby("intent_id", observed=True):
+        pack.append({"intent_id": iid, "name": g["intent_name"].iloc[0], "samples": g["utterance"].tolist()})
+    return pack
+
+# -----------------------------
+# Table I/O
+# -----------------------------
+def write_table(df, path: Path) -> Path:
+    """
+    Write a training table as Parquet: the utterance key first (`row_id`, tables.KEY; kept
+    when the rows carry it), intent and source columns dictionary-encoded.
+    """
+    from tables import arrow_strings, dedupe_key, KEY
+    keys = dedupe_key(df).to_numpy()
+    df = df.drop(columns=[KEY], errors="ignore").reset_index(drop=True)
+    df.insert(0, KEY, keys)
+    for c in DICT_COLUMNS:
+        if c in df:
+            df[c] = df[c].astype(str).astype("category")
+    df = arrow_strings(df)
+    df.to_parquet(path, index=False, compression="zstd")
+    return path
+
+def read_table(path: Path, columns=None):
+    """Read a training table; intent columns come back as pandas categoricals."""
+    from tables import read_parquet
+    return read_parquet(path, columns=columns)
+
+def export_text(path: Path, formats=("csv",)) -> list:
+    """CSV (and, for intent tables, the grouped JSON pack) next to a Parquet table."""
+    df = read_table(path)
+    out = []
+    if "csv" in formats:
+        out.append(path.with_suffix(".csv"))
+        df.to_csv(out[-1], index=False)
+    if "json" in formats and "intent_name" in df:
+        out.append(path.with_suffix(".json"))
+        with open(out[-1], "w") as f:
+            json.dump(json_pack(df), f, indent=2)
+    return out
+
+# -----------------------------
+# Stage functions
+# -----------------------------
+def export_utterances(intents: list, run=None):
+    return stage("10_export_training_data").export_utterances(intents, run)
+
+def harvest_seeds(calls, run=None):
+    return stage("10b_seed_harvest").harvest_seeds(calls, run)
+
+def merge_seeded(base_df, seeds, run=None):
+    return stage("10c_merge_seeded").merge_seeded(base_df, seeds, run)
+
+def topup_targets(base_df, calls, run=None):
+    return stage("10d_topup_targets").topup_targets(base_df, calls, run)
+
+def enforce_whitelist(df, run=None):
+    return stage("11c_enforce_answerable_whitelist").enforce_whitelist(df, run)
+
+def split_eval(df, run=None):
+    return stage("11_build_eval_sets").split_eval(df, run)
+
+# -----------------------------
+# In-memory chain
+# -----------------------------
+def run_chain(whitelist: bool = True, keep_intermediate: bool = False) -> dict:
+    import pandas as pd
+    from instrument import RunReport
+    from tables import load_calls, projected_bytes
+
+    TRAIN_DIR.mkdir(parents=True, exist_ok=True)
+    m10 = stage("10_export_training_data")
+    m11e = stage("11_build_eval_sets")
+
+    with RunReport("training_chain") as run:
+        with run.step("load") as st:
+            intents = m10.load_catalog(run.read(CATALOG))
+            calls = load_calls(run.read(CALLS, projected_bytes(CALLS, CALL_COLUMNS)), CALL_COLUMNS)
+            gold = pd.read_csv(run.read(GOLD))
+            st.rows_out = len(calls)
+
+        # one report per stage, so stage timings stay comparable with the file-based runs
+        with RunReport("10_export_training_data") as r:
+            utter = export_utterances(intents, r)
+            r.note(chained=True)
+        with RunReport("10b_seed_harvest") as r:
+            seeds = harvest_seeds(calls, r)
+            r.note(chained=True)
+        with RunReport("10c_merge_seeded") as r:
+            merged = merge_seeded(utter, seeds, r)
+            r.note(chained=True)
+        with RunReport("10d_topup_targets") as r:
+            merged = topup_targets(merged, calls, r)
+            r.note(chained=True)
+        if whitelist:
+            with RunReport("11c_enforce_answerable_whitelist") as r:
+                merged = enforce_whitelist(merged, r)
+                r.note(chained=True)
+        with RunReport("11_build_eval_sets") as r:
+            train_df, dev_df = split_eval(merged, r)
+            m11e.write_eval_sets(train_df, dev_df, m11e.faq_eval_records(gold), r)
+            r.note(chained=True)
+
+        with run.step("write") as st:
+            with open(m10.OUT_HANDOFF, "w") as f:
+                json.dump(m10.handoff_list(intents), f, indent=2)
+            run.wrote(m10.OUT_HANDOFF)
+            run.wrote(write_table(merged, MERGED))
+            if keep_intermediate:
+                run.wrote(write_table(utter, UTTERANCES))
+                run.wrote(write_table(seeds, SEEDS))
+            st.rows_out = len(merged)
+        run.note(whitelist=whitelist, keep_intermediate=keep_intermediate,
+                 utterances=len(utter), seeds=len(seeds), merged=len(merged),
+                 train=len(train_df), dev=len(dev_df))
+    print("Wrote:", MERGED, "| rows:", len(merged))
+    return {"utterances": utter, "seeds": seeds, "merged": merged, "train": train_df, "dev": dev_df}
+
+def main():
+    ap = argparse.ArgumentParser(description="Run stages 10 -> 11_build_eval_sets in one process.")
+    ap.add_argument("--no-whitelist", action="store_true", help="skip 11c_enforce_answerable_whitelist")
+    ap.add_argument("--keep-intermediate", action="store_true",
+                    help="also write utterances_answerable.parquet and seed_harvest.parquet")
+    ap.add_argument("--export", nargs="+", choices=["csv", "json"],
+                    help="only write CSV/JSON copies of the existing Parquet tables (no chain run)")
+    args = ap.parse_args()
+    if args.export:
+        for path in TABLES:
+            if path.exists():
+                for out in export_text(path, args.export):
+                    print("Wrote:", out)
+        return
+    run_chain(whitelist=not args.no_whitelist, keep_intermediate=args.keep_intermediate)
+
+if __name__ == "__main__":
+    main()
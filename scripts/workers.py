@@ -0,0 +1,256 @@
+# cc-banking-intents/scripts/workers.py
+#
+# Process pool over call-table batches that hands data to workers through shared memory instead
+# of pickles. Sending a pandas frame of transcripts to a ProcessPoolExecutor pickles every string
+# on the way in and the result on the way out, which costs about as much as the work itself.
+# Here a batch is written once, as an Arrow IPC stream, into a multiprocessing.shared_memory
+# block. The worker receives a small Handle (block name, size, kind) and maps the block. Its
+# Arrow buffers, and the pandas Arrow-backed columns built on them, point into the block without
+# a copy. Results come back the same way. A block is unlinked as soon as the other side has
+# mapped it, and unmapped when the last Arrow buffer using it is freed.
+#
+#   from workers import ArrowPool
+#   with ArrowPool(workers=4) as pool:
+#       for out in pool.imap(fn, batches):    # fn(batch) -> DataFrame / pa.Table, results in order
+#           ...
+#   pool.report()     # time spent encoding / decoding / in fn, bytes handed over
+#
+# `batches` are DataFrames (e.g. tables.iter_calls) or pa.Tables, and fn gets the same kind.
+# fn must be picklable (a module-level function).
+# CCBI_WORKERS sets the default pool size (1 = run fn in-process, no pool).
+# CCBI_SHM=0 sends pickled frames instead, so both transports can be compared on a real stage.
+#
+#   python3 scripts/workers.py bench [--calls PATH] [--workers 2]   # shared memory vs pickle
+
+import argparse, ctypes, os, pickle, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+WORKERS = int(os.environ.get("CCBI_WORKERS", "1"))
+SHM = os.environ.get("CCBI_SHM", "1") != "0"
+
+@dataclass
+class Handle:
+    """A batch in shared memory: what crosses the process boundary instead of the data."""
+    name: str
+    size: int
+    kind: str          # "pandas" | "arrow": what the reader gets back
+    rows: int
+
+# -----------------------------
+# Shared-memory blocks
+# -----------------------------
+class _Mapping:
+    """Keeps a block mapped while Arrow buffers point into it (their `base`)."""
+
+    def __init__(self, shm: SharedMemory):
+        self.shm = shm
+
+    def __del__(self):
+        self.shm.close()
+
+def _table(batch) -> pa.Table:
+    if isinstance(batch, pd.DataFrame):
+        return pa.Table.from_pandas(batch, preserve_index=False)
+    return batch if isinstance(batch, pa.Table) else pa.Table.from_batches([batch])
+
+def _write(table: pa.Table, sink) -> None:
+    # the writer and its sink are released on return, so the block can be closed afterwards
+    with pa.ipc.new_stream(sink, table.schema) as w:
+        w.write_table(table)
+
+def put(batch) -> Handle:
+    """Write a DataFrame / Arrow table into a new shared-memory block."""
+    table = _table(batch)
+    sizer = pa.MockOutputStream()
+    _write(table, sizer)
+    size = sizer.size()
+    shm = SharedMemory(create=True, size=max(size, 1))
+    _write(table, pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)))
+    shm.close()
+    return Handle(shm.name, size, "pandas" if isinstance(batch, pd.DataFrame) else "arrow", table.num_rows)
+
+def get(handle: Handle, unlink: bool = True):
+    """Map a block (no copy) and read it back as a DataFrame / Arrow table; unlinks its name."""
+    shm = SharedMemory(handle.name)
+    if unlink:           # the mapping stays valid; the block is freed once it is unmapped
+        shm.unlink()
+    addr = ctypes.addressof(ctypes.c_char.from_buffer(shm.buf))
+    buf = pa.foreign_buffer(addr, handle.size, base=_Mapping(shm))
+    table = pa.ipc.open_stream(buf).read_all()
+    if handle.kind == "pandas":
+        from tables import to_pandas
+        return to_pandas(table)
+    return table
+
+def _rows(x) -> int:
+    return len(x) if isinstance(x, pd.DataFrame) else x.num_rows
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def _run_shm(fn: Callable, handle: Handle):
+    t0 = time.perf_counter()
+    batch = get(handle)
+    t1 = time.perf_counter()
+    out = fn(batch)
+    t2 = time.perf_counter()
+    res = put(out)
+    t3 = time.perf_counter()
+    return res, {"decode_in_s": t1 - t0, "fn_s": t2 - t1, "encode_out_s": t3 - t2}
+
+def _run_pickle(fn: Callable, data: bytes):
+    t0 = time.perf_counter()
+    batch = pickle.loads(data)
+    t1 = time.perf_counter()
+    out = fn(batch)
+    t2 = time.perf_counter()
+    res = pickle.dumps(out, protocol=pickle.HIGHEST_PROTOCOL)
+    t3 = time.perf_counter()
+    return res, {"decode_in_s": t1 - t0, "fn_s": t2 - t1, "encode_out_s": t3 - t2}
+
+# -----------------------------
+# Pool
+# -----------------------------
+class ArrowPool:
+    def __init__(self, workers: int = WORKERS, shm: bool = SHM, inflight: Optional[int] = None):
+        """
+        workers <= 1 runs fn in the calling process. `inflight` bounds the batches handed
+        over and not yet collected (default 2 per worker), so memory stays bounded.
+        """
+        self.workers = workers
+        self.shm = shm
+        self.inflight = inflight or 2 * max(workers, 1)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        if workers > 1:
+            self.pool = ProcessPoolExecutor(workers, mp_context=get_context("fork" if sys.platform == "linux" else "spawn"))
+        self.stats = {k: 0.0 for k in ("encode_in_s", "decode_in_s", "fn_s", "encode_out_s", "decode_out_s")}
+        self.bytes_in = self.bytes_out = self.batches = 0
+
+    def _submit(self, fn: Callable, batch):
+        t0 = time.perf_counter()
+        if self.shm:
+            h = put(batch)
+            self.bytes_in += h.size
+            fut = self.pool.submit(_run_shm, fn, h)
+        else:
+            data = pickle.dumps(batch, protocol=pickle.HIGHEST_PROTOCOL)
+            self.bytes_in += len(data)
+            fut = self.pool.submit(_run_pickle, fn, data)
+        self.stats["encode_in_s"] += time.perf_counter() - t0
+        return fut
+
+    def _collect(self, fut):
+        res, times = fut.result()
+        for k, v in times.items():
+            self.stats[k] += v
+        t0 = time.perf_counter()
+        if self.shm:
+            self.bytes_out += res.size
+            out = get(res)
+        else:
+            self.bytes_out += len(res)
+            out = pickle.loads(res)
+        self.stats["decode_out_s"] += time.perf_counter() - t0
+        self.batches += 1
+        return out
+
+    def imap(self, fn: Callable, batches: Iterable) -> Iterator:
+        """fn over each batch in the workers; results in input order."""
+        if self.pool is None:
+            for batch in batches:
+                t0 = time.perf_counter()
+                out = fn(batch)
+                self.stats["fn_s"] += time.perf_counter() - t0
+                self.batches += 1
+                yield out
+            return
+        pending = []
+        try:
+            for batch in batches:
+                pending.append(self._submit(fn, batch))
+                if len(pending) >= self.inflight:
+                    yield self._collect(pending.pop(0))
+            while pending:
+                yield self._collect(pending.pop(0))
+        finally:
+            for fut in pending:             # abandoned early: let the workers finish, free the results
+                try:
+                    self._collect(fut)
+                except Exception:
+                    pass
+
+    def report(self) -> dict:
+        """Seconds spent handing batches over (encode/decode, both directions) vs in fn."""
+        out = {k: round(v, 3) for k, v in self.stats.items()}
+        out["overhead_s"] = round(sum(v for k, v in self.stats.items() if k != "fn_s"), 3)
+        out.update(workers=self.workers, transport="shm" if self.shm else "pickle", batches=self.batches,
+                   mb_in=round(self.bytes_in / 2**20, 1), mb_out=round(self.bytes_out / 2**20, 1))
+        return out
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self) -> "ArrowPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+def text_lengths(df: pd.DataFrame) -> pd.DataFrame:
+    """Benchmark task: trivial per-call work, so the hand-over cost dominates."""
+    return pd.DataFrame({"customer_chars": df["customer_text"].str.len(), "full_chars": df["full_text"].str.len()})
+
+def echo(df: pd.DataFrame) -> pd.DataFrame:
+    """Benchmark task: the batch itself comes back (results as large as the input)."""
+    return df
+
+def bench(calls: Path, workers: int, batch_rows: int) -> list:
+    from tables import iter_calls
+    columns = ["source_zip", "file_name", "customer_text", "full_text"]
+    batches = list(iter_calls(calls, columns, filter=None, batch_rows=batch_rows))
+    rows = []
+    for fn in (text_lengths, echo):
+        for shm in (False, True):
+            with ArrowPool(workers, shm=shm) as pool:
+                t0 = time.perf_counter()
+                n = sum(_rows(out) for out in pool.imap(fn, batches))
+                wall = time.perf_counter() - t0
+                rows.append({"task": fn.__name__, "rows": n, "wall_s": round(wall, 3), **pool.report()})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared-memory Arrow worker pool.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="hand-over cost of shared memory vs pickled frames")
+    b.add_argument("--calls", type=Path, default=None, help="call table (default: the processed banking_calls.parquet)")
+    b.add_argument("--workers", type=int, default=2)
+    b.add_argument("--batch-rows", type=int, default=20_000)
+    args = ap.parse_args()
+
+    if args.calls is None:
+        from paths import PROC
+        args.calls = PROC / "banking_calls.parquet"
+    if not args.calls.exists():
+        sys.exit(f"{args.calls} not found (03 writes it)")
+    cols = ("task", "transport", "rows", "wall_s", "encode_in_s", "decode_in_s", "fn_s", "encode_out_s",
+            "decode_out_s", "overhead_s", "mb_in", "mb_out")
+    print(" ".join(f"{c:>12s}" for c in cols))
+    for r in bench(args.calls, args.workers, args.batch_rows):
+        print(" ".join(f"{r[c]:>12}" for c in cols))
+
+if __name__ == "__main__":
+    main()